@@ -754,6 +754,98 @@ function addChildren(parent: Node, innerUpdate: (Edit[] | string)): void {
     }
 }
 
+// Compact patch (see tree-matching/treematching/compact_patch.py):
+// {v: version, s: string table, e: records}, decoded into the JSON objects
+// of the plain patch, in the same order.
+const DELETE = 0, INSERT_ELEMENT = 1, INSERT_TEXT = 2, MOVE = 3, MERGE_ELEMENT = 4, MERGE_TEXT = 5;
+
+function decodeString(table: string[], value: (number | string)): string {
+    // an int is an index in the string table
+    return typeof value === 'number' ? table[value] : value;
+}
+
+function decodecpid(encoded: number[], previous: number[]): number[] {
+    // encoded[0] = length of the prefix shared with the previous cpid
+    return previous.slice(0, encoded[0]).concat(encoded.slice(1));
+}
+
+function decodeAttrs(table: string[], flat: any[]): object {
+    let attrs: any = {};
+    for (let i = 0; i < flat.length; i += 2) {
+        let value: any = flat[i + 1];
+        if (Array.isArray(value))
+            value = value.map(function(item) { return decodeString(table, item); });
+        else if (value != null)
+            value = decodeString(table, value);
+        attrs[decodeString(table, flat[i])] = value;
+    }
+    return attrs;
+}
+
+function decodeChildren(table: string[], encoded: any): (Edit[] | string) {
+    if (!Array.isArray(encoded)) // content of the only (Text) child
+        return decodeString(table, encoded);
+    let children: any[] = [];
+    for (let i = 0; i < encoded.length; i++) {
+        let child: any = encoded[i];
+        if (!Array.isArray(child)) { // TextContent
+            children.push({ c: decodeString(table, child) });
+            continue;
+        }
+        let decoded: any = { n: decodeString(table, child[0]), attrs: decodeAttrs(table, child[1]) };
+        if (child.length > 2)
+            decoded.c = decodeChildren(table, child[2]);
+        children.push(decoded);
+    }
+    return children;
+}
+
+function decodePatch(patch: any): Edit[] {
+    if (!patch.hasOwnProperty('v')) // plain patch
+        return patch.edits;
+    let table: string[] = patch.s;
+    let edits: Edit[] = [];
+    let lastcpid: number[] = [];
+    for (let i = 0; i < patch.e.length; i++) {
+        let record: any[] = patch.e[i];
+        let cpid: number[] = decodecpid(record[1], lastcpid);
+        lastcpid = cpid;
+        let edit: any;
+        switch (record[0]) {
+            case DELETE:
+                edit = { type: 'Delete', cpid: cpid, tag_name: decodeString(table, record[2]) };
+                if (record.length > 3)
+                    edit.content = decodeString(table, record[3]);
+                break;
+            case INSERT_ELEMENT:
+                edit = { cpid: cpid, i: record[2], n: decodeString(table, record[3]),
+                         attrs: decodeAttrs(table, record[4]) };
+                if (record.length > 5)
+                    edit.c = decodeChildren(table, record[5]);
+                break;
+            case INSERT_TEXT:
+                edit = { cpid: cpid, i: record[2], c: decodeString(table, record[3]) };
+                break;
+            case MOVE:
+                edit = { cpid: cpid, np: decodecpid(record[2], cpid), j: record[3] };
+                break;
+            case MERGE_ELEMENT:
+                edit = { cpid: cpid, n: decodeString(table, record[2]),
+                         attrs: decodeAttrs(table, record[3]) };
+                break;
+            case MERGE_TEXT:
+                edit = { cpid: cpid };
+                if (record.length > 2)
+                    edit.c = decodeString(table, record[2]);
+                break;
+            default:
+                throw 'Unknown kind of record in the compact patch: ' + record[0];
+        }
+        edits.push(edit);
+    }
+    return edits;
+}
+
 function applyJsonUpdates(): void {
     // This function applies as much of edits as it can on the current DOM,
     // it also takes the applied edits out of the global list (jsonUpdates).
@@ -843,7 +935,7 @@ let updateXHR: XMLHttpRequest = new XMLHttpRequest();
 // updateXHR.addEventListener("load", update_callback);
 updateXHR.onload = function(): void {
     // console.log('Got back the update');
-    jsonUpdates = updateXHR.response.edits;
+    jsonUpdates = decodePatch(updateXHR.response);
     applyJsonUpdates();
 };
 updateXHR.open('GET', 'update.json', true);
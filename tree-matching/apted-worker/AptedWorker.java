@@ -0,0 +1,80 @@
+/* MIT License
+ *
+ * Copyright (c) 2019 Shaghayegh Mardani
+ *
+ * Permission is hereby granted, free of charge, to any person obtaining a copy
+ * of this software and associated documentation files (the "Software"), to deal
+ * in the Software without restriction, including without limitation the rights
+ * to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+ * copies of the Software, and to permit persons to whom the Software is
+ * furnished to do so, subject to the following conditions:
+ *
+ * The above copyright notice and this permission notice shall be included in all
+ * copies or substantial portions of the Software.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ * IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+ * FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+ * AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+ * LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+ * OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+ * SOFTWARE.
+ */
+
+import java.io.BufferedReader;
+import java.io.ByteArrayOutputStream;
+import java.io.FileDescriptor;
+import java.io.FileOutputStream;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.nio.charset.StandardCharsets;
+import java.util.jar.JarFile;
+
+/**
+ * Long-lived html-apted worker, so that a JVM is not started per pair of pages.
+ * It runs the command line of the jar (its Main-Class) once per request:
+ *     java -cp html-apted.jar AptedWorker.java html-apted.jar
+ * (single-file source launch, Java 11+). Protocol over stdin/stdout:
+ * a request is one line "first.tree\tsecond.tree"; the response is a line
+ * "OK n" or "ERROR n" followed by n bytes (UTF-8): the output of the jar
+ * (distance and mappings, as with -f first.tree second.tree -m) or the error.
+ * The Python client (run_apted.AptedWorker) passes named pipes as .tree files.
+ * The worker exits when stdin is closed.
+ */
+public class AptedWorker {
+
+    public static void main(String[] args) throws Exception {
+        String mainClass;
+        try (JarFile jar = new JarFile(args[0])) {
+            mainClass = jar.getManifest().getMainAttributes().getValue("Main-Class");
+        }
+        Method aptedMain = Class.forName(mainClass).getMethod("main", String[].class);
+
+        PrintStream out = new PrintStream(new FileOutputStream(FileDescriptor.out), false, "UTF-8");
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        String request;
+        while ((request = in.readLine()) != null) {
+            String[] files = request.split("\t");
+            ByteArrayOutputStream captured = new ByteArrayOutputStream();
+            PrintStream capture = new PrintStream(captured, true, "UTF-8");
+            String status = "OK";
+            System.setOut(capture);
+            System.setErr(capture);
+            try {
+                aptedMain.invoke(null, (Object) new String[] {"-f", files[0], files[1], "-m"});
+            } catch (InvocationTargetException | RuntimeException e) {
+                Throwable cause = e instanceof InvocationTargetException ? e.getCause() : e;
+                status = "ERROR";
+                captured.reset();
+                capture.print(cause);
+            }
+            capture.flush();
+            byte[] response = captured.toByteArray();
+            out.print(status + " " + response.length + "\n");
+            out.write(response);
+            out.flush();
+        }
+    }
+}
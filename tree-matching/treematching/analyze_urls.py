@@ -22,12 +22,13 @@
 
 from sys import argv, exit
 from typing import List, Union
-from bs4 import BeautifulSoup
 from bs4.element import Tag, NavigableString, Doctype
+from html_strip import make_soup
+from traversal import preorder
 
-def parse_html(html_file_handle):
+def parse_html(html_file_handle, parser = 'html5lib'):
     # returns the soup object of tree's root
-    soup_obj = BeautifulSoup(html_file_handle, 'html5lib')
+    soup_obj = make_soup(html_file_handle, parser)
     new_content = []
     top_most_html = None
     for child in soup_obj.contents:
@@ -45,44 +46,47 @@ def parse_html(html_file_handle):
         return new_content[0]
 
 
+def _searched_children(soup_tag: Union[Tag, NavigableString]) -> List:
+    # If <noscript> should only have one Text child.
+    if isinstance(soup_tag, NavigableString) or soup_tag.name == 'noscript':
+        return []
+    return soup_tag.contents
+
 def list_uris(soup_tag: Union[Tag, NavigableString],
                 uris_so_far: List[str]) -> str:
-    if isinstance(soup_tag, NavigableString):
-        return ''
-    # If <noscript> should only have one Text child.
-    if soup_tag.name == 'noscript':
-        return ''
     base_url : str = ''
-    found_uri: str = ''
-    if soup_tag.name == 'link' and \
-        soup_tag.attrs.get('href'):
-        found_uri = soup_tag.attrs['href']
-    elif soup_tag.name == 'script' and \
+    for soup_tag in preorder(soup_tag, _searched_children):
+        if isinstance(soup_tag, NavigableString) or soup_tag.name == 'noscript':
+            continue
+        found_uri: str = ''
+        if soup_tag.name == 'link' and \
+            soup_tag.attrs.get('href'):
+            found_uri = soup_tag.attrs['href']
+        elif soup_tag.name == 'script' and \
+                soup_tag.attrs.get('src'):
+            found_uri = soup_tag.attrs['src']
+        elif soup_tag.name == 'img' and \
             soup_tag.attrs.get('src'):
-        found_uri = soup_tag.attrs['src']
-    elif soup_tag.name == 'img' and \
-        soup_tag.attrs.get('src'):
-        found_uri = soup_tag.attrs['src']
-        # <source> <video> <audio>
-    elif soup_tag.name == 'base' and \
-        soup_tag.attrs.get('href'):
-        base_url = soup_tag.attrs['href']
-    if found_uri != '' and \
-        not found_uri.startswith('data') and \
-        not found_uri.startswith('android-app:') and \
-        not found_uri.startswith('ios-app:'):
-        uris_so_far.append(found_uri.strip())
-    for child in soup_tag.contents:
-        base_url += list_uris(child, uris_so_far)
+            found_uri = soup_tag.attrs['src']
+            # <source> <video> <audio>
+        elif soup_tag.name == 'base' and \
+            soup_tag.attrs.get('href'):
+            base_url += soup_tag.attrs['href']
+        if found_uri != '' and \
+            not found_uri.startswith('data') and \
+            not found_uri.startswith('android-app:') and \
+            not found_uri.startswith('ios-app:'):
+            uris_so_far.append(found_uri.strip())
     return base_url
 
 
 if __name__ == '__main__':
     if len(argv) < 3:
-        exit(f'Usage: python3.7 {argv[0]} html_file main_url')
+        exit(f'Usage: python3.7 {argv[0]} html_file main_url [parser]')
 
     html_file: str = argv[1]
     main_url: str = argv[2]
+    parser: str = argv[3] if len(argv) > 3 else 'html5lib'
 
     # throws an exception if main url does not have :
     if main_url.find(':') == -1:
@@ -95,7 +99,7 @@ if __name__ == '__main__':
 
     resource_uris: List[str] = []
     with open(html_file, 'r') as html_handle:
-        soup_root = parse_html(html_handle)
+        soup_root = parse_html(html_handle, parser)
         list_uris(soup_root, resource_uris)
 
     for uri in resource_uris:
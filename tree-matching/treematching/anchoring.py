@@ -0,0 +1,241 @@
+# MIT License
+
+# Copyright (c) 2019 Shaghayegh Mardani
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import logging
+from collections import Counter
+from typing import List, Tuple, Dict
+
+from node import Node, Element, Text
+from tree import Tree
+from traversal import postorder
+
+logger = logging.getLogger(__name__)
+
+def ordered_pairs(candidates: List[Tuple[Node, Node]]) -> List[Tuple[Node, Node]]:
+    """Keeps the largest subset of the candidate pairs (of disjoint nodes)
+    whose second nodes are in the same left-to-right (post) order as their
+    first nodes, i.e. a longest increasing subsequence. Crossing pairs
+    cannot all be part of a tree mapping."""
+    candidates.sort(key=lambda pair: pair[0].post_id)
+    # tails[k]: index of the candidate ending the best subsequence of length k+1
+    tails: List[int] = []
+    previous: List[int] = []
+    for index, (_, partner) in enumerate(candidates):
+        low, high = 0, len(tails)
+        while low < high:
+            middle = (low + high) // 2
+            if candidates[tails[middle]][1].post_id < partner.post_id:
+                low = middle + 1
+            else:
+                high = middle
+        previous.append(tails[low - 1] if low > 0 else -1)
+        if low == len(tails):
+            tails.append(index)
+        else:
+            tails[low] = index
+    ordered: List[Tuple[Node, Node]] = []
+    index = tails[-1] if tails else -1
+    while index >= 0:
+        ordered.append(candidates[index])
+        index = previous[index]
+    ordered.reverse()
+    return ordered
+
+def collapse_tree(root: Node, placeholders: Dict[int, str], name: str, tindex: int,
+                  keep_root: bool = False) -> Tuple[Tree, List[Node]]:
+    """Returns a copy of the subtree of root as a Tree, where the nodes in
+    placeholders (by id(), except root if keep_root) are replaced by leaves
+    named after them, and the original node of each copied node by (copied)
+    post id. Attributes are shared with the original nodes."""
+    originals: Dict[int, Node] = {}
+    def collapsed(node: Node) -> bool:
+        return id(node) in placeholders and not (keep_root and node is root)
+    def copy_node(node: Node, index: int, parent: Element) -> Node:
+        if collapsed(node):
+            node_copy = Element(placeholders[id(node)], index, parent)
+        elif isinstance(node, Element):
+            node_copy = Element(node.name, index, parent, node.attrs)
+        else:
+            node_copy = Text(index, parent, node.content)
+        originals[id(node_copy)] = node
+        return node_copy
+
+    root_copy: Node = copy_node(root, 0, None)
+    stack: List[Tuple[Node, Node]] = [(root, root_copy)]
+    while stack:
+        original, node_copy = stack.pop()
+        if collapsed(original) or not isinstance(original, Element):
+            continue
+        children_copy: List[Node] = []
+        for index, child in enumerate(original.children):
+            child_copy: Node = copy_node(child, index, node_copy)
+            children_copy.append(child_copy)
+            stack.append((child, child_copy))
+        if children_copy:
+            node_copy.children = children_copy
+    collapsed_tree = Tree(name, root_copy, tindex)
+    return collapsed_tree, [None] + [originals[id(node)] for node in collapsed_tree.nodes[1:]]
+
+def consistent_pairs(first: Tree, second: Tree, partners: List[int]) -> List[Tuple[Node, Node]]:
+    """Given partners (post ids of the second tree by post id of the first
+    tree, 0 if none), keeps a subset of these pairs which is a valid tree
+    mapping: top-down from the (virtual) pair of roots, the highest matched
+    nodes of the first subtree whose partners are in the second subtree (and
+    not nested in each other) are kept if they are in the same order
+    (see ordered_pairs), and so on within each kept pair."""
+    kept: List[Tuple[Node, Node]] = []
+    second_leftmost = second.leftmost_leaves
+    contexts: List[Tuple[List[Node], int, int]] = [([first.root], 1, len(second) + 1)]
+    while contexts:
+        roots, low, high = contexts.pop()
+        # highest matched nodes below roots with partners in [low, high)
+        candidates: List[Tuple[Node, Node]] = []
+        stack: List[Node] = list(reversed(roots))
+        while stack:
+            node: Node = stack.pop()
+            partner: int = partners[node.post_id]
+            if partner and low <= partner < high:
+                candidates.append((node, second.nodes[partner]))
+            elif isinstance(node, Element):
+                stack.extend(reversed(node.children))
+        previous: int = 0
+        for source, target in ordered_pairs(candidates):
+            if second_leftmost[target.post_id] <= previous:
+                continue # nested in the previous partner
+            previous = target.post_id
+            kept.append((source, target))
+            if isinstance(source, Element):
+                contexts.append((source.children, second_leftmost[target.post_id], target.post_id))
+    return kept
+
+class SubtreeAnchors:
+    """Identical subtrees which are unique in both trees (anchors), found by
+    their subtree hashes. Both trees are collapsed, i.e. copied with each
+    anchor replaced by a single placeholder leaf, named after the anchor.
+    A placeholder can only be matched with its partner (names differ
+    otherwise), so the tree edit distance can run on the (much smaller)
+    collapsed trees, and expand_mappings() gives the mappings of the original
+    trees: every node of an anchor is merged with the same node of its partner.
+    """
+    def __init__(self, first: Tree, second: Tree, min_size: int = 2):
+        self.first: Tree = first
+        self.second: Tree = second
+        # anchor roots of both trees (by id()) -> placeholder name
+        self._placeholders: Dict[int, str] = {}
+        self.num_of_anchored_nodes: int = 0
+        # placeholder name -> (anchor root, partner root)
+        self._anchors: Dict[str, Tuple[Node, Node]] = {}
+        self._find_anchors(min_size)
+        self.first_collapsed: Tree
+        self.second_collapsed: Tree
+        self._recollapse()
+
+    def _recollapse(self) -> None:
+        # _originals: collapsed post id -> node of the original tree
+        # (anchor root for a placeholder).
+        self.first_collapsed, self._first_originals = collapse_tree(self.first.root, self._placeholders,
+                                                                    self.first.name, self.first.tindex)
+        self.second_collapsed, self._second_originals = collapse_tree(self.second.root, self._placeholders,
+                                                                      self.second.name, self.second.tindex)
+        logger.info(f'{len(self._placeholders)//2} anchors with {self.num_of_anchored_nodes} nodes, '
+                    f'collapsed sizes: {len(self.first_collapsed)}, {len(self.second_collapsed)}')
+
+    def _find_anchors(self, min_size: int) -> None:
+        first_counts: Counter = Counter(node.subtree_hash() for node in self.first.nodes[1:])
+        second_counts: Counter = Counter(node.subtree_hash() for node in self.second.nodes[1:])
+        second_unique: Dict[int, Node] = {node.subtree_hash(): node for node in self.second.nodes[1:]
+                                          if second_counts[node.subtree_hash()] == 1}
+        # Top-down, so that only the largest anchors are kept. Since anchors are
+        # unique in both trees, partners of disjoint anchors are disjoint too.
+        candidates: List[Tuple[Node, Node]] = []
+        stack: List[Node] = [self.first.root]
+        while stack:
+            node: Node = stack.pop()
+            subtree_hash: int = node.subtree_hash()
+            size: int = node.post_id - self.first.leftmost_leaves[node.post_id] + 1
+            if size >= min_size and first_counts[subtree_hash] == 1 and \
+               subtree_hash in second_unique:
+                candidates.append((node, second_unique[subtree_hash]))
+            elif size > 1:
+                stack.extend(node.children)
+        # Crossing (moved) anchors are dropped: the edit distance would rather
+        # delete and insert their (cheap) placeholders than match them.
+        for node, partner in ordered_pairs(candidates):
+            name: str = f'fawkes-anchor-{len(self._anchors)}'
+            self._anchors[name] = (node, partner)
+            self._placeholders[id(node)] = name
+            self._placeholders[id(partner)] = name
+            self.num_of_anchored_nodes += partner.post_id - \
+                self.second.leftmost_leaves[partner.post_id] + 1
+
+    def release_split_anchors(self, mappings: List[Tuple[int, int]]) -> bool:
+        """Anchors are only a heuristic: in a few cases (e.g. when an anchor
+        has moved relative to its surroundings) the edit distance of the
+        collapsed trees deletes and inserts a placeholder instead of matching
+        it with its partner, which is way cheaper than doing the same with the
+        whole anchored subtrees. Given the mappings between the collapsed trees,
+        releases those anchors (re-collapsing both trees without them) and
+        returns whether there were any, so that the caller can run the edit
+        distance again."""
+        split: List[str] = []
+        for first_id, second_id in mappings:
+            name: str = self._placeholders.get(id(self._first_originals[first_id])) \
+                if first_id else None
+            if name is not None and (not second_id or name != self._placeholders.get(
+                    id(self._second_originals[second_id]))):
+                split.append(name)
+        for name in split:
+            node, partner = self._anchors.pop(name)
+            del self._placeholders[id(node)]
+            del self._placeholders[id(partner)]
+            self.num_of_anchored_nodes -= partner.post_id - \
+                self.second.leftmost_leaves[partner.post_id] + 1
+        if split:
+            self._recollapse()
+        return bool(split)
+
+    def expand_mappings(self, mappings: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Given the mappings (pairs of post ids, 0 for insert/delete) between
+        the collapsed trees, returns the corresponding mappings between the
+        original trees. Placeholders expand to all the nodes of their anchors.
+        """
+        result: List[Tuple[int, int]] = []
+        for first_id, second_id in mappings:
+            source: Node = self._first_originals[first_id]
+            target: Node = self._second_originals[second_id]
+            source_name: str = self._placeholders.get(id(source)) if source else None
+            target_name: str = self._placeholders.get(id(target)) if target else None
+            if source_name is None and target_name is None:
+                result.append((source.post_id if source else 0,
+                               target.post_id if target else 0))
+            elif source_name == target_name:
+                result.extend((s.post_id, t.post_id)
+                              for s, t in zip(postorder(source), postorder(target)))
+            else:
+                # a split anchor (see release_split_anchors): both sides
+                # are deleted/inserted as a whole
+                if source is not None:
+                    deleted = postorder(source) if source_name is not None else [source]
+                    result.extend((s.post_id, 0) for s in deleted)
+                if target is not None:
+                    inserted = postorder(target) if target_name is not None else [target]
+                    result.extend((0, t.post_id) for t in inserted)
+        return result
@@ -0,0 +1,101 @@
+# MIT License
+
+# Copyright (c) 2019 Shaghayegh Mardani
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import sys, io, json, time, argparse, logging
+from typing import List, NamedTuple
+
+from tree import Tree
+from edit_sequence import EditSequence
+from run_apted import get_apted_edits, TED_ENGINES
+
+# Checks that collapsing identical unique subtrees before the tree edit
+# distance (get_anchored_mappings) gives the same outputs as running it on
+# the whole trees (--no-anchors): same total cost, same json patch and same
+# common tree, for each pair of pages. Exits with status 1 otherwise.
+#     python3 treematching/anchoring_conformance.py [--engine NAME] first_html second_html [first_html second_html ...]
+
+class Outputs(NamedTuple):
+    """Outputs of run_apted.py for a pair of pages, with or without anchors."""
+    total_cost: int
+    # or the error raised generating it
+    json_patch: str
+    common_html: str
+
+def matching_outputs(first_path: str, second_path: str, anchored: bool, engine: str,
+                     parser: str = 'html5lib') -> Outputs:
+    with open(first_path, 'r') as first_file, open(second_path, 'r') as second_file:
+        first: Tree = Tree.from_file(first_file, 1, parser)
+        second: Tree = Tree.from_file(second_file, 2, parser)
+    edits: EditSequence = get_apted_edits(first, second, anchored = anchored, engine = engine)
+    try:
+        json_patch: str = json.dumps(edits.generate_json_update(first))
+    except Exception as error: # known issues of the patch generation itself
+        json_patch = f'failed: {error!r}'
+    # consumes the edits: last
+    total_cost: int = edits.total_cost
+    html_buffer = io.StringIO()
+    edits.generate_common_tree(first).root.print_html(html_buffer)
+    return Outputs(total_cost, json_patch, html_buffer.getvalue())
+
+def output_differences(anchored: Outputs, whole: Outputs) -> List[str]:
+    differences: List[str] = []
+    if anchored.total_cost != whole.total_cost:
+        differences.append(f'total cost {anchored.total_cost} vs {whole.total_cost}')
+    for name, left, right in zip(Outputs._fields[1:], anchored[1:], whole[1:]):
+        if left != right:
+            position: int = next((index for index, (left_char, right_char) in enumerate(zip(left, right))
+                                  if left_char != right_char), min(len(left), len(right)))
+            differences.append(f'{name.replace("_", " ")} differs at character {position}: '
+                               f'{left[position:position+40]!r} vs {right[position:position+40]!r}')
+    return differences
+
+
+if __name__ == '__main__':
+
+    arg_parser = argparse.ArgumentParser(
+        usage = 'python3 treematching/anchoring_conformance.py [--engine NAME] first_html second_html [first_html second_html ...]')
+    arg_parser.add_argument('pages', nargs = '+')
+    arg_parser.add_argument('--engine', default = 'apted', choices = TED_ENGINES)
+    arg_parser.add_argument('--parser', default = 'html5lib')
+    args = arg_parser.parse_args()
+    if len(args.pages) % 2 != 0:
+        arg_parser.error('expects pairs of pages')
+    logging.disable(logging.WARNING)
+    sys.setrecursionlimit(10000) # deep pages
+
+    all_match = True
+    for first_path, second_path in zip(args.pages[::2], args.pages[1::2]):
+        start = time.perf_counter()
+        anchored: Outputs = matching_outputs(first_path, second_path, True, args.engine, args.parser)
+        anchored_time = time.perf_counter() - start
+        start = time.perf_counter()
+        whole: Outputs = matching_outputs(first_path, second_path, False, args.engine, args.parser)
+        whole_time = time.perf_counter() - start
+        differences: List[str] = output_differences(anchored, whole)
+        times: str = f'anchored {anchored_time:.2f}s, whole trees {whole_time:.2f}s, cost {anchored.total_cost}'
+        if differences:
+            all_match = False
+            print(f'{first_path} -> {second_path}: DIFFERENT ({times})')
+            for difference in differences:
+                print(f'    {difference}')
+        else:
+            print(f'{first_path} -> {second_path}: OK ({times})')
+    sys.exit(0 if all_match else 1)
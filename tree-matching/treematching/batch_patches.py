@@ -0,0 +1,169 @@
+# MIT License
+
+# Copyright (c) 2019 Shaghayegh Mardani
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import sys, os, gc, time, argparse, logging, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
+from typing import List, Tuple, Callable, NamedTuple, Union
+
+from tree import Tree
+from tree_builder import PARSER_BACKENDS
+from edit_sequence import EditSequence
+from compact_patch import dump_patch
+from run_apted import AptedWorker, get_apted_edits, get_gumtree_edits, TED_ENGINES, MATCHERS
+
+logger = logging.getLogger(__name__)
+
+# Patches of many snapshots of a page against the same static template,
+# which is parsed once and shared (read-only) by the worker processes:
+#     python3 treematching/batch_patches.py template_html out_dir target_html [target_html ...] [--processes N]
+# Each patch is the update.json of run_apted.py template_html target_html
+# out_path json, written to out_dir as the name of the target with .json.
+
+# Matches the template with a target, in the given jar worker (if any)
+Matcher = Callable[[Tree, Tree, AptedWorker], EditSequence]
+
+class PatchResult(NamedTuple):
+    target_path: str
+    patch_path: str
+    # size of the patch in bytes, or the error raised generating it
+    size: Union[int, str]
+    seconds: float
+
+def load_template(template_path: str, parser: str = 'html5lib') -> Tree:
+    """Parses the template, and computes everything which is otherwise
+    computed lazily on its nodes (fingerprints, subtree hashes, cpids),
+    so that the forked workers only read the template: its memory pages
+    stay shared with the parent process (copy-on-write)."""
+    with open(template_path, 'r') as template_file:
+        template: Tree = Tree.from_file(template_file, 1, parser)
+    template.fingerprints()
+    for node in template.nodes[1:]:
+        node.subtree_hash()
+        node.id
+    return template
+
+def matcher(name: str = 'ted', engine: str = 'apted', attributes: bool = False) -> Matcher:
+    """See run_apted.MATCHERS and TED_ENGINES."""
+    if name == 'gumtree':
+        return lambda template, target, worker: get_gumtree_edits(template, target, attributes)
+    return lambda template, target, worker: get_apted_edits(
+        template, target, engine=engine, worker=worker if engine == 'apted' else None,
+        attributes=attributes)
+
+# (template, matcher, parser, compact) of the current batch, set before
+# forking the workers, which inherit it instead of receiving a (pickled) copy.
+_BATCH: Tuple[Tree, Matcher, str, bool] = None
+# jar worker of the current process (see _start_worker)
+_worker: AptedWorker = None
+
+def _start_worker() -> None:
+    global _worker
+    _worker = AptedWorker() # started on first use
+    Finalize(_worker, _worker.close, exitpriority=10)
+
+def _generate_patch(target_path: str, patch_path: str) -> PatchResult:
+    template, match, parser, compact = _BATCH
+    start: float = time.perf_counter()
+    try:
+        with open(target_path, 'r') as target_file:
+            target: Tree = Tree.from_file(target_file, 2, parser)
+        # generate_json_update works on a copy of the template
+        update: dict = match(template, target, _worker).generate_json_update(template)
+        with open(patch_path, 'w') as patch_file:
+            dump_patch(update, patch_file, compact)
+        size: Union[int, str] = os.path.getsize(patch_path)
+    except Exception as error: # e.g. known issues of the patch generation
+        logger.warning(f'{target_path}: {error!r}')
+        size = repr(error)
+    return PatchResult(target_path, patch_path, size, time.perf_counter() - start)
+
+def generate_patches(template: Tree, target_paths: List[str], out_dir: str,
+                     processes: int = 1, match: Matcher = None,
+                     parser: str = 'html5lib', compact: bool = False) -> List[PatchResult]:
+    """Generates the patches of the given targets against the (loaded, see
+    load_template) template into out_dir, in the given number of forked
+    processes (in the compact encoding if compact, see compact_patch).
+    Results are in the order of the targets."""
+    global _BATCH
+    match = match or matcher()
+    patch_paths: List[str] = [os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0] + '.json')
+                              for path in target_paths]
+    if len(set(patch_paths)) != len(patch_paths):
+        raise ValueError('Targets must have different file names')
+    _BATCH = (template, match, parser, compact)
+    try:
+        if processes == 1:
+            _start_worker()
+            try:
+                return [_generate_patch(target_path, patch_path)
+                        for target_path, patch_path in zip(target_paths, patch_paths)]
+            finally:
+                _worker.close()
+        # Objects tracked by the garbage collector are not scanned (nor
+        # their pages written) by the collections of the workers.
+        gc.freeze()
+        with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('fork'),
+                                 initializer=_start_worker) as executor:
+            return list(executor.map(_generate_patch, target_paths, patch_paths))
+    finally:
+        gc.unfreeze()
+        _BATCH = None
+
+
+if __name__ == '__main__':
+
+    arg_parser = argparse.ArgumentParser(
+        usage = 'python3 treematching/batch_patches.py template_html out_dir target_html [target_html ...] [--processes N] [--parser NAME] [--matcher NAME] [--engine NAME] [--attribute-costs] [--compact]')
+    arg_parser.add_argument('template_html')
+    arg_parser.add_argument('out_dir')
+    arg_parser.add_argument('target_html', nargs = '+')
+    arg_parser.add_argument('--processes', type = int, default = os.cpu_count(),
+                            help = 'number of worker processes (default: one per core)')
+    arg_parser.add_argument('--parser', default = 'html5lib', choices = PARSER_BACKENDS)
+    arg_parser.add_argument('--matcher', default = 'ted', choices = MATCHERS)
+    arg_parser.add_argument('--engine', default = 'apted', choices = TED_ENGINES)
+    arg_parser.add_argument('--attribute-costs', action = 'store_true')
+    arg_parser.add_argument('--compact', action = 'store_true',
+                            help = 'write the patches in the compact encoding (see compact_patch.py)')
+    args = arg_parser.parse_args()
+    if args.processes < 1:
+        arg_parser.error('--processes must be positive')
+    if args.attribute_costs and args.engine != 'python' and args.matcher == 'ted':
+        arg_parser.error('--attribute-costs requires --engine python or --matcher gumtree')
+    logging.disable(logging.INFO)
+    sys.setrecursionlimit(10000) # deep pages
+
+    os.makedirs(args.out_dir, exist_ok = True)
+    start: float = time.perf_counter()
+    template: Tree = load_template(args.template_html, args.parser)
+    load_time: float = time.perf_counter() - start
+    results: List[PatchResult] = generate_patches(
+        template, args.target_html, args.out_dir, args.processes,
+        matcher(args.matcher, args.engine, args.attribute_costs), args.parser, args.compact)
+    elapsed: float = time.perf_counter() - start
+    for result in results:
+        size_text: str = f'{result.size} bytes' if isinstance(result.size, int) else f'failed: {result.size:.60}'
+        print(f'{result.target_path}: {size_text} ({result.seconds:.2f}s)')
+    failed: int = sum(not isinstance(result.size, int) for result in results)
+    print(f'{len(results) - failed} patches ({failed} failed) in {elapsed:.2f}s, template loaded in '
+          f'{load_time:.2f}s: {len(results) / elapsed:.2f} patches/s with {args.processes} processes')
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,127 @@
+# MIT License
+
+# Copyright (c) 2019 Shaghayegh Mardani
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import sys, io, gc, time, random, logging
+from collections import Counter
+from typing import Callable, List, Tuple
+
+from tree import Tree
+from tree_builder import parse_html
+from gumtree import GumTreeMatcher
+from edit_sequence import EditSequence
+from run_apted import edits_from_mappings, get_template_and_patch
+
+# Scaling benchmark of EditSequence.generate_json_update, on the edits which
+# patch a template into a synthetic page with a lot of churn (a fifth of the
+# items are deleted, inserted, changed or wrapped in a new element, which
+# moves their link). Run with:
+#     python3 treematching/benchmark_json_update.py [max_edits]
+# For a linear shadow apply the time per edit stays (roughly) the same as
+# the number of edits grows. The last column is the time per edit to sort
+# the (shuffled) edits, as EditSequence does before generating the patch.
+
+def list_item(key: int, group: int) -> str:
+    link: str = f'<a href="/{key}">item {key}</a>'
+    if group == 8: # wrapped in a new element: a move in the patch
+        link = f'<b>{link}</b>'
+    return f'<li class="c{group % 5}">{link} <span>{key % 7}</span></li>'
+
+def wide_list(items: List[Tuple[int, int]]) -> str:
+    """All the items as the children of a single <ul>."""
+    return '<html><head></head><body><ul>' + \
+        ''.join(list_item(key, group) for key, group in items) + '</ul></body></html>'
+
+def sections(items: List[Tuple[int, int]]) -> str:
+    """Like a news page: sections of (at most) 20 articles each."""
+    html: List[str] = ['<html><head></head><body>']
+    for start in range(0, len(items), 20):
+        html.append(f'<section id="s{start}"><h2>section {start}</h2><ul>')
+        html.extend(list_item(key, group) for key, group in items[start:start+20])
+        html.append('</ul></section>')
+    html.append('</body></html>')
+    return ''.join(html)
+
+def churn(items: List[Tuple[int, int]], rng: random.Random,
+          rate: float = 0.2) -> List[Tuple[int, int]]:
+    changed: List[Tuple[int, int]] = []
+    for key, group in items:
+        dice: float = rng.random()
+        if dice < rate / 4: # deleted
+            continue
+        if dice < 2 * rate / 4: # a new item inserted before
+            changed.append((rng.randrange(10**6), 9))
+        elif dice < 3 * rate / 4: # attribute changed
+            group = (group + 1) % 5
+        elif dice < rate: # link wrapped
+            group = 8
+        changed.append((key, group))
+    return changed
+
+def time_it(function: Callable, repeat: int = 3) -> float:
+    best: float = float('inf')
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def patch_edits(make_page: Callable, num_of_items: int) -> Tuple[Tree, EditSequence]:
+    """Template and the edits patching it into the second page."""
+    rng = random.Random(num_of_items)
+    items: List[Tuple[int, int]] = [(rng.randrange(10**6), rng.randrange(5))
+                                    for _ in range(num_of_items)]
+    first = Tree('first', parse_html(io.StringIO(make_page(items))), 1)
+    second = Tree('second', parse_html(io.StringIO(make_page(churn(items, rng)))), 2)
+    edits: EditSequence = edits_from_mappings(first, second,
+                                              GumTreeMatcher(first, second).mappings())
+    _, template, patch = get_template_and_patch(first, second, edits)
+    return template, patch
+
+def run(name: str, make_page: Callable, max_edits: int) -> None:
+    print(f'{name}: microseconds per edit')
+    print(f'{"edits":>8} {"inserts":>8} {"moves":>8} {"seconds":>8} {"us/edit":>8} {"sort":>8}')
+    for num_of_edits in (1000, 2000, 5000, 10000, 20000, 50000, 100000):
+        if num_of_edits > max_edits:
+            break
+        # about 5 edits per item
+        template, patch = patch_edits(make_page, num_of_edits // 5)
+        # the (large) heap of the matching is left out of garbage collections
+        gc.collect()
+        gc.freeze()
+        seconds: float = time_it(lambda: patch.generate_json_update(template))
+        shuffled: List = list(patch.edits)
+        random.Random(num_of_edits).shuffle(shuffled)
+        sort_seconds: float = time_it(lambda: EditSequence(shuffled).edits)
+        gc.unfreeze()
+        update = patch.generate_json_update(template)
+        counts: Counter = Counter(type(edit).__name__ for edit in patch.edits)
+        moves: int = sum(1 for edit in update['edits'] if 'np' in edit)
+        print(f'{len(patch.edits):>8} {counts["Insert"]:>8} {moves:>8} '
+              f'{seconds:>8.2f} {seconds*1e6/len(patch.edits):>8.2f} '
+              f'{sort_seconds*1e6/len(patch.edits):>8.2f}')
+
+
+if __name__ == '__main__':
+
+    logging.disable(logging.CRITICAL)
+    max_edits: int = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    run('wide list', wide_list, max_edits)
+    run('sections', sections, max_edits)
@@ -0,0 +1,172 @@
+# MIT License
+
+# Copyright (c) 2019 Shaghayegh Mardani
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import sys, os, json, time, copy, random, html, tempfile, argparse, logging
+from typing import List, Tuple, Dict, Callable, Union
+
+from tree import Tree
+from edit_sequence import EditSequence
+from top_down import TopDownMatcher
+from run_apted import get_apted_edits, get_gumtree_edits, edits_from_mappings
+from benchmark_ted import jar_available
+
+# Wall time of the matching and size of the patch (update.json) with the
+# gumtree (and top-down) matchers vs. the tree edit distance, which is
+# html-apted or, if the jar has not been built, the python engine (also
+# decomposed into pinned regions, with one process per core).
+#     python3 treematching/benchmark_matchers.py [--synthetic NODES]... [first_html second_html ...]
+# As in fawkes-example.sh, the first run builds the template (common tree) of
+# both pages, and the second one the patch from the template to the second
+# page. Synthetic pages are random news-like pages of about NODES nodes,
+# and a second version with changed, deleted, inserted and moved parts.
+
+SyntheticNode = Union[str, Tuple[str, Dict[str, str], List]]
+
+WORDS: List[str] = ['breaking', 'news', 'market', 'weather', 'sports', 'election', 'today',
+                    'video', 'live', 'update', 'report', 'world', 'local', 'tech', 'health']
+
+def _text(rng: random.Random) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 6)))
+
+def _item(rng: random.Random) -> SyntheticNode:
+    # 5 nodes
+    return ('li', {'class': rng.choice(['story', 'story top', 'ad'])},
+            [('a', {'href': f'/article/{rng.randrange(10**6)}'}, [_text(rng)]), ('span', {}, [_text(rng)])])
+
+def synthetic_sections(nodes: int, rng: random.Random) -> List[SyntheticNode]:
+    sections: List[SyntheticNode] = []
+    count: int = 0
+    while count < nodes:
+        items: List[SyntheticNode] = [_item(rng) for _ in range(rng.randint(3, 20))]
+        sections.append(('div', {'class': 'section', 'id': f'section-{len(sections)}'},
+                         [('h2', {}, [_text(rng)]), ('ul', {}, items)]))
+        count += 5 + 5 * len(items)
+    return sections
+
+def mutated_sections(sections: List[SyntheticNode], rng: random.Random,
+                     rate: float = 0.05) -> List[SyntheticNode]:
+    """A later version: texts and classes of some items changed, some
+    items deleted or inserted, and some sections moved."""
+    sections = copy.deepcopy(sections)
+    for _, _, (_, (_, _, items)) in sections:
+        for index in range(len(items) - 1, -1, -1):
+            draw: float = rng.random()
+            if draw < rate:
+                items[index][2][1][2][0] = _text(rng)
+            elif draw < 1.5 * rate:
+                del items[index]
+            elif draw < 2 * rate:
+                items.insert(index, _item(rng))
+            elif draw < 2.2 * rate:
+                items[index][1]['class'] = 'story updated'
+    for _ in range(int(len(sections) * rate) + 1):
+        sections.insert(rng.randrange(len(sections)), sections.pop(rng.randrange(len(sections))))
+    return sections
+
+def render(node: SyntheticNode) -> str:
+    if isinstance(node, str):
+        return html.escape(node)
+    name, attrs, children = node
+    attrs_html: str = ''.join(f' {key}="{html.escape(value)}"' for key, value in attrs.items())
+    return f'<{name}{attrs_html}>' + ''.join(map(render, children)) + f'</{name}>'
+
+def render_page(sections: List[SyntheticNode]) -> str:
+    return '<!DOCTYPE html><html><head><title>synthetic</title></head><body>' + \
+        ''.join(map(render, sections)) + '</body></html>'
+
+def load(path: str, tindex: int) -> Tree:
+    with open(path, 'r') as html_file:
+        return Tree.from_file(html_file, tindex)
+
+def patch(first_path: str, second_path: str, match: Callable[[Tree, Tree], EditSequence],
+          out_dir: str) -> Tuple[float, int, Union[int, str]]:
+    """Returns the time spent matching (both runs), the cost of the edits
+    of the patch and its size in bytes (or the error, if it failed)."""
+    first: Tree = load(first_path, 1)
+    second: Tree = load(second_path, 2)
+    start: float = time.perf_counter()
+    edits: EditSequence = match(first, second)
+    elapsed: float = time.perf_counter() - start
+    template_path: str = os.path.join(out_dir, 'template.html')
+    try:
+        edits.generate_common_tree(first).print_html_in_file(template_path)
+        template: Tree = load(template_path, 1)
+        second = load(second_path, 2)
+        start = time.perf_counter()
+        edits = match(template, second)
+        elapsed += time.perf_counter() - start
+        size: Union[int, str] = len(json.dumps(edits.generate_json_update(template)))
+    except Exception as error: # known issues of the patch generation itself
+        size = f'failed: {error!r:.60}'
+    return elapsed, edits.total_cost, size
+
+def ted(first: Tree, second: Tree) -> EditSequence:
+    return get_apted_edits(first, second, engine='apted' if jar_available() else 'python')
+
+def ted_regions(first: Tree, second: Tree) -> EditSequence:
+    return get_apted_edits(first, second, engine='apted' if jar_available() else 'python',
+                           processes=os.cpu_count())
+
+def top_down(first: Tree, second: Tree) -> EditSequence:
+    edits: EditSequence = edits_from_mappings(first, second, TopDownMatcher(first, second).mappings())
+    edits.algorithm = 'top-down'
+    return edits
+
+MATCHERS: Dict[str, Callable[[Tree, Tree], EditSequence]] = {
+    'ted': ted, 'ted-regions': ted_regions, 'gumtree': get_gumtree_edits, 'top-down': top_down}
+
+
+if __name__ == '__main__':
+
+    arg_parser = argparse.ArgumentParser(
+        usage = 'python3 treematching/benchmark_matchers.py [--synthetic NODES]... [--seed N] [--no-ted] [first_html second_html ...]')
+    arg_parser.add_argument('pages', nargs = '*')
+    arg_parser.add_argument('--synthetic', type = int, action = 'append', default = [],
+                            help = 'size (in nodes) of a pair of synthetic pages, can be repeated')
+    arg_parser.add_argument('--seed', type = int, default = 0)
+    arg_parser.add_argument('--no-ted', action = 'store_true',
+                            help = 'skip the tree edit distance (e.g. on very large pages)')
+    args = arg_parser.parse_args()
+    if len(args.pages) % 2 != 0 or not (args.pages or args.synthetic):
+        arg_parser.error('expects pairs of pages and/or synthetic sizes')
+    logging.disable(logging.WARNING)
+    sys.setrecursionlimit(10000) # deep pages
+
+    if not args.no_ted and not jar_available():
+        print('html-apted jar not found, using the python engine for ted')
+    matchers: List[str] = [name for name in MATCHERS if not (args.no_ted and name.startswith('ted'))]
+    with tempfile.TemporaryDirectory(prefix='benchmark-matchers-') as out_dir:
+        pairs: List[Tuple[str, str]] = list(zip(args.pages[::2], args.pages[1::2]))
+        rng = random.Random(args.seed)
+        for nodes in args.synthetic:
+            sections: List[SyntheticNode] = synthetic_sections(nodes, rng)
+            paths: List[str] = [os.path.join(out_dir, f'synthetic-{nodes}-{version}.html') for version in (0, 1)]
+            for path, version in zip(paths, (sections, mutated_sections(sections, rng))):
+                with open(path, 'w') as page:
+                    page.write(render_page(version))
+            pairs.append(tuple(paths))
+        for first_path, second_path in pairs:
+            print(f'{os.path.basename(first_path)} ({len(load(first_path, 1))} x {len(load(second_path, 2))} nodes)')
+            for name in matchers:
+                elapsed, cost, size = patch(first_path, second_path, MATCHERS[name], out_dir)
+                size_text: str = f'{size:>10} bytes' if isinstance(size, int) else size
+                print(f'{name:>11} {elapsed:>10.2f} s cost {cost:>6} {size_text}')
@@ -0,0 +1,115 @@
+# MIT License
+
+# Copyright (c) 2019 Shaghayegh Mardani
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import io, gc, json, random, argparse, tracemalloc
+from typing import Dict, List, Tuple
+
+from tree import Tree
+from recorded_html import main_html
+
+# Memory benchmark: bytes retained per node by a Tree built from a page
+# (nodes, cpids and the post order arrays; the parser's garbage is freed).
+#     python3 treematching/benchmark_memory.py [html_file ...] [--recording DIR]... [--save FILE] [--baseline FILE]
+# --recording runs the top-level HTML of a mahimahi recording, e.g.
+# examples/yahoo/record/v0 (see recorded_html.py). Synthetic pages are
+# always run. The "before" column is only filled in from a file saved with
+# --save by this same script in another checkout (copy it there if it is
+# older), on the same pages:
+#     python3 treematching/benchmark_memory.py --recording ../examples/yahoo/record/v0 --save before.json
+#     (in the other checkout, then in this one:)
+#     python3 treematching/benchmark_memory.py --recording ../examples/yahoo/record/v0 --baseline before.json
+
+_TAGS = ['div', 'span', 'a', 'li', 'p', 'img', 'ul', 'section']
+_ATTRS = [{}, {}, {'class': 'item card'}, {'id': 'x'},
+          {'class': 'nav', 'href': '/path'}, {'src': '/img.png', 'alt': 'a'}]
+
+def synthetic_page(num_elements: int, seed: int = 0) -> str:
+    """Random page with about num_elements elements, nested up to 30 levels."""
+    rnd = random.Random(seed)
+    pieces: List[str] = ['<html><head><title>t</title></head><body>']
+    open_tags: List[str] = []
+    for i in range(num_elements):
+        if open_tags and (len(open_tags) > 30 or rnd.random() < 0.35):
+            pieces.append(f'</{open_tags.pop()}>')
+        tag: str = rnd.choice(_TAGS)
+        attrs: str = ''.join(f' {k}="{v}"' for k, v in rnd.choice(_ATTRS).items())
+        if tag == 'img':
+            pieces.append(f'<img{attrs}>')
+        else:
+            pieces.append(f'<{tag}{attrs}>text {i % 97}')
+            open_tags.append(tag)
+    pieces.extend(f'</{tag}>' for tag in reversed(open_tags))
+    pieces.append('</body></html>')
+    return ''.join(pieces)
+
+def retained_bytes(html_file) -> Tuple[int, int]:
+    """Returns (number of nodes, bytes retained by the Tree built from the
+    given file), computing cpids of all nodes like the matching does."""
+    gc.collect()
+    tracemalloc.start()
+    before: int = tracemalloc.get_traced_memory()[0]
+    tree: Tree = Tree.from_file(html_file)
+    for node in tree.nodes[1:]:
+        node.id
+    gc.collect()
+    after: int = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return len(tree), after - before
+
+def report(name: str, html_file, baseline: Dict[str, float],
+           results: Dict[str, float]) -> None:
+    nodes, size = retained_bytes(html_file)
+    results[name] = size / nodes
+    before: str = f'{baseline[name]:>8.0f}' if name in baseline else f'{"-":>8}'
+    print(f'{name:>30} {nodes:>8} {size/1024:>10.0f} {before} {size/nodes:>8.0f}')
+
+
+if __name__ == '__main__':
+
+    arg_parser = argparse.ArgumentParser(
+        usage = 'python3 treematching/benchmark_memory.py [html_file ...] [--recording DIR]... [--save FILE] [--baseline FILE]')
+    arg_parser.add_argument('html_file', nargs = '*')
+    arg_parser.add_argument('--recording', action = 'append', default = [],
+                            help = 'mahimahi recording directory, can be repeated')
+    arg_parser.add_argument('--save', help = 'write the bytes per node of each page to FILE (json)')
+    arg_parser.add_argument('--baseline', help = 'compare with the bytes per node saved in FILE')
+    args = arg_parser.parse_args()
+    baseline: Dict[str, float] = {}
+    if args.baseline:
+        with open(args.baseline, 'r') as baseline_file:
+            baseline.update(json.load(baseline_file))
+
+    results: Dict[str, float] = {}
+    print(f'{"page":>30} {"nodes":>8} {"KiB":>10} {"before":>8} {"now":>8} (bytes/node)')
+    for html_path in args.html_file:
+        with open(html_path, 'r') as html_file_handle:
+            report(html_path, html_file_handle, baseline, results)
+    for recorded_dir in args.recording:
+        html_file = io.StringIO(main_html(recorded_dir))
+        html_file.name = recorded_dir
+        report(recorded_dir, html_file, baseline, results)
+    for num_elements in [2000, 20000]:
+        html_file = io.StringIO(synthetic_page(num_elements))
+        html_file.name = f'synthetic-{num_elements}'
+        report(html_file.name, html_file, baseline, results)
+    if args.save:
+        with open(args.save, 'w') as save_file:
+            json.dump(results, save_file)
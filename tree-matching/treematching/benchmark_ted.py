@@ -0,0 +1,78 @@
+# MIT License
+
+# Copyright (c) 2019 Shaghayegh Mardani
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import sys, os, time, resource, tracemalloc
+from typing import Tuple
+
+from tree import Tree
+from ted import TreeEditDistance
+from run_apted import get_apted_mappings
+from config import apted_path
+
+# Wall time and peak memory of the tree edit distance (mappings only), with
+# the in-process engine vs. the html-apted jar (a JVM per pair).
+#     python3 treematching/benchmark_ted.py first_html second_html [...]
+# Files are taken in pairs. The jar is skipped if it has not been built (see
+# README). Peak memory of the JVM is the max RSS of child processes so far.
+
+def python_engine(first: Tree, second: Tree) -> Tuple[float, int, float]:
+    # timed without tracemalloc, which slows the DP loops down a lot.
+    start: float = time.perf_counter()
+    ted = TreeEditDistance(first, second)
+    ted.mappings()
+    elapsed: float = time.perf_counter() - start
+    tracemalloc.start()
+    TreeEditDistance(first, second).mappings()
+    peak: int = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, ted.distance()
+
+def jvm_engine(first: Tree, second: Tree) -> Tuple[float, int]:
+    start: float = time.perf_counter()
+    get_apted_mappings(first, second)
+    elapsed: float = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux
+    peak: int = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+    return elapsed, peak
+
+def jar_available() -> bool:
+    current_dir: str = os.path.dirname(os.path.abspath(__file__))
+    return os.path.exists(os.path.join(current_dir, '..', apted_path))
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) < 3 or len(sys.argv) % 2 == 0:
+        sys.exit('Usage: python3 treematching/benchmark_ted.py first_html second_html [...]')
+
+    with_jvm: bool = jar_available()
+    if not with_jvm:
+        print(f'{apted_path} not found, only running the python engine')
+    for first_path, second_path in zip(sys.argv[1::2], sys.argv[2::2]):
+        with open(first_path, 'r') as first_file, open(second_path, 'r') as second_file:
+            first: Tree = Tree.from_file(first_file, 1)
+            second: Tree = Tree.from_file(second_file, 2)
+        elapsed, peak, distance = python_engine(first, second)
+        print(f'{first_path} ({len(first)} x {len(second)} nodes, distance {distance})')
+        print(f'{"python":>10} {elapsed:>10.2f} s {peak/2**20:>10.1f} MiB')
+        if with_jvm:
+            elapsed, peak = jvm_engine(first, second)
+            print(f'{"jvm":>10} {elapsed:>10.2f} s {peak/2**20:>10.1f} MiB')
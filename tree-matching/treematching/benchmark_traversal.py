@@ -0,0 +1,101 @@
+# MIT License
+
+# Copyright (c) 2019 Shaghayegh Mardani
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import sys, io, time
+from typing import Callable, List
+
+from bs4 import BeautifulSoup
+
+from node import Node, Element, Text
+from tree import Tree
+from run_apted import compatible_repr_node
+
+# Benchmark of the tree walks on synthetic deeply nested trees, which used to
+# hit the recursion limit. Run with the default recursion limit:
+#     python3 treematching/benchmark_traversal.py [max_depth]
+# For a linear walk the time per node stays (roughly) the same as depth doubles.
+# (str(tree) is left out: its output itself grows with depth * nodes.)
+
+def chain(depth: int) -> Element:
+    """<div> nested depth times, with a text at the bottom."""
+    root = Element('html', 0, None, {}, [])
+    current: Element = root
+    for level in range(depth):
+        child = Element('div', 0, current, {'class': [f'l{level}']}, [])
+        current.children = [child]
+        current = child
+    current.children = [Text(0, current, 'leaf')]
+    return root
+
+def comb(depth: int) -> Element:
+    """Like chain, but every <div> also has an <img> as its first child,
+    i.e. a skewed tree with a leaf hanging off each level."""
+    root = Element('html', 0, None, {}, [])
+    current: Element = root
+    for level in range(depth):
+        leaf = Element('img', 0, current, {'src': f'/{level}.png'}, [])
+        child = Element('div', 1, current, {}, [])
+        current.children = [leaf, child]
+        current = child
+    current.children = [Text(0, current, 'leaf')]
+    return root
+
+def time_it(function: Callable, repeat: int = 3) -> float:
+    best: float = float('inf')
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run(name: str, make_root: Callable, depths: List[int]) -> None:
+    print(f'{name}: microseconds per node')
+    print(f'{"depth":>8} {"nodes":>8} {"build":>8} {"copy":>8} {"html":>8} '
+          f'{"repr":>8} {"count":>8} {"uris":>8} {"soup":>8}')
+    for depth in depths:
+        root: Element = make_root(depth)
+        timings: List[float] = []
+        tree: Tree = None
+        def build():
+            nonlocal tree
+            tree = Tree(name, root, 1)
+        timings.append(time_it(build))
+        timings.append(time_it(lambda: tree.deepcopy_tree()))
+        timings.append(time_it(lambda: tree.root.print_html(io.StringIO())))
+        timings.append(time_it(lambda: compatible_repr_node(tree.root, io.StringIO())))
+        timings.append(time_it(lambda: tree.root.num_of_nodes()))
+        timings.append(time_it(lambda: tree.root.list_uris([])))
+        html = io.StringIO()
+        tree.root.print_html(html)
+        soup = BeautifulSoup(html.getvalue(), 'html.parser')
+        timings.append(time_it(lambda: Node.from_soup_tag(soup.contents[0], 0)))
+        size: int = len(tree)
+        print(f'{depth:>8} {size:>8} ' +
+              ' '.join(f'{t*1e6/size:>8.2f}' for t in timings))
+
+
+if __name__ == '__main__':
+
+    max_depth: int = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    depths: List[int] = [max_depth // 8, max_depth // 4, max_depth // 2, max_depth]
+    print(f'recursion limit: {sys.getrecursionlimit()}')
+    run('chain', chain, depths)
+    run('comb', comb, depths)
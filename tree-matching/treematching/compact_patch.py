@@ -0,0 +1,299 @@
+# MIT License
+
+# Copyright (c) 2019 Shaghayegh Mardani
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import sys, json, gzip, subprocess
+from collections import Counter
+from typing import Any, Dict, IO, List, Tuple, Union
+
+# Compact encoding of the json patch (update.json, see
+# EditSequence.generate_json_update), decoded by the JS patcher before
+# applying the edits. The patch becomes {"v": 1, "s": strings, "e": records}:
+# - strings is a table of the tag names, attribute keys and values, and texts
+#   which are repeated enough to be worth it. Wherever the patch has one of
+#   these strings, the compact patch has either the string itself or its
+#   index in the table (an int).
+# - each record is an array, starting with its kind (see below). The cpid of
+#   a record is [k, ...] where k is the length of the prefix it shares with
+#   the cpid of the previous record, followed by the rest of it. The new
+#   parent of a move is given the same way, relative to the cpid of the move.
+# - attributes are a flat array [key, value, key, value, ...], where a value
+#   is a string, an array of strings (class) or null (removed).
+# - children of an Insert (c) are either a text (the only child) or an array
+#   of children: a text, or [tag, attributes(, children)] for an element.
+# Decoding gives back exactly the same patch (same keys in the same order).
+# Size comparison (raw, gzip and brotli) on some patches:
+#     python3 treematching/compact_patch.py update.json [update.json ...]
+
+VERSION = 1
+
+DELETE, INSERT_ELEMENT, INSERT_TEXT, MOVE, MERGE_ELEMENT, MERGE_TEXT = range(6)
+
+# keys of the records of each kind, in the order of get_json()
+RECORD_KEYS: Dict[Tuple[str, ...], int] = {
+    ('type', 'cpid', 'tag_name'): DELETE,
+    ('type', 'cpid', 'tag_name', 'content'): DELETE,
+    ('cpid', 'i', 'n', 'attrs'): INSERT_ELEMENT,
+    ('cpid', 'i', 'n', 'attrs', 'c'): INSERT_ELEMENT,
+    ('cpid', 'i', 'c'): INSERT_TEXT,
+    ('cpid', 'np', 'j'): MOVE,
+    ('cpid', 'n', 'attrs'): MERGE_ELEMENT,
+    ('cpid',): MERGE_TEXT,
+    ('cpid', 'c'): MERGE_TEXT,
+}
+
+def is_compact(patch: Dict) -> bool:
+    return 'v' in patch
+
+def _strings(edits: List[Dict]) -> Counter:
+    """Occurrences of the strings which may be replaced by the table."""
+    counts: Counter = Counter()
+    stack: List[Dict] = list(edits)
+    while stack:
+        edit: Dict = stack.pop()
+        for key in ('tag_name', 'content', 'n'):
+            if key in edit:
+                counts[edit[key]] += 1
+        for key, value in edit.get('attrs', {}).items():
+            counts[key] += 1
+            if isinstance(value, str):
+                counts[value] += 1
+            elif isinstance(value, list):
+                counts.update(value)
+        children = edit.get('c')
+        if isinstance(children, str):
+            counts[children] += 1
+        elif children is not None:
+            stack.extend(children)
+    return counts
+
+def _string_table(edits: List[Dict]) -> List[str]:
+    """Strings which take fewer bytes once in the table and then as indices,
+    most frequent first (smallest indices)."""
+    table: List[str] = []
+    for string, count in sorted(_strings(edits).items(), key=lambda item: -item[1]):
+        if count < 2:
+            break
+        size: int = len(json.dumps(string))
+        if count * (size - len(str(len(table)))) > size + 1:
+            table.append(string)
+    return table
+
+class _Encoder:
+    def __init__(self, table: List[str]):
+        self.indices: Dict[str, int] = {string: i for i, string in enumerate(table)}
+        self.last_cpid: List[int] = []
+
+    def string(self, string: str) -> Union[int, str]:
+        return self.indices.get(string, string)
+
+    def path(self, cpid: List[int], previous: List[int]) -> List[int]:
+        shared: int = 0
+        for index, other in zip(cpid, previous):
+            if index != other:
+                break
+            shared += 1
+        return [shared] + cpid[shared:]
+
+    def attrs(self, attrs: Dict) -> List:
+        flat: List = []
+        for key, value in attrs.items():
+            flat.append(self.string(key))
+            if isinstance(value, str):
+                flat.append(self.string(value))
+            elif isinstance(value, list):
+                flat.append([self.string(item) for item in value])
+            elif value is None:
+                flat.append(None)
+            else:
+                raise ValueError(f'Unexpected value of attribute {key}: {value!r}')
+        return flat
+
+    def children(self, children: Union[str, List[Dict]]) -> Union[int, str, List]:
+        if isinstance(children, str):
+            return self.string(children)
+        encoded: List = []
+        for child in children:
+            keys: Tuple[str, ...] = tuple(child)
+            if keys == ('c',) and isinstance(child['c'], str):
+                encoded.append(self.string(child['c']))
+            elif keys == ('n', 'attrs'):
+                encoded.append([self.string(child['n']), self.attrs(child['attrs'])])
+            elif keys == ('n', 'attrs', 'c'):
+                encoded.append([self.string(child['n']), self.attrs(child['attrs']),
+                                self.children(child['c'])])
+            else:
+                raise ValueError(f'Unexpected child in the patch: {keys}')
+        return encoded
+
+    def record(self, edit: Dict) -> List:
+        keys: Tuple[str, ...] = tuple(edit)
+        kind: int = RECORD_KEYS.get(keys)
+        if kind is None or (kind == DELETE and edit['type'] != 'Delete'):
+            raise ValueError(f'Unexpected edit in the patch: {keys}')
+        cpid: List[int] = edit['cpid']
+        record: List = [kind, self.path(cpid, self.last_cpid)]
+        self.last_cpid = cpid
+        if kind == DELETE:
+            record.append(self.string(edit['tag_name']))
+            if 'content' in edit:
+                record.append(self.string(edit['content']))
+        elif kind == INSERT_ELEMENT:
+            record += [edit['i'], self.string(edit['n']), self.attrs(edit['attrs'])]
+            if 'c' in edit:
+                record.append(self.children(edit['c']))
+        elif kind == INSERT_TEXT:
+            record += [edit['i'], self.string(edit['c'])]
+        elif kind == MOVE:
+            record += [self.path(edit['np'], cpid), edit['j']]
+        elif kind == MERGE_ELEMENT:
+            record += [self.string(edit['n']), self.attrs(edit['attrs'])]
+        elif 'c' in edit: # MERGE_TEXT
+            record.append(self.string(edit['c']))
+        return record
+
+def encode_patch(patch: Dict) -> Dict:
+    """Compact encoding of the json patch (see above)."""
+    edits: List[Dict] = patch['edits']
+    table: List[str] = _string_table(edits)
+    encoder = _Encoder(table)
+    return {'v': VERSION, 's': table, 'e': [encoder.record(edit) for edit in edits]}
+
+class _Decoder:
+    def __init__(self, table: List[str]):
+        self.table: List[str] = table
+        self.last_cpid: List[int] = []
+
+    def string(self, value: Union[int, str]) -> str:
+        return self.table[value] if isinstance(value, int) else value
+
+    def path(self, encoded: List[int], previous: List[int]) -> List[int]:
+        # always a new list: the patcher shifts cpids in place
+        return previous[:encoded[0]] + encoded[1:]
+
+    def attrs(self, flat: List) -> Dict:
+        attrs: Dict = {}
+        for index in range(0, len(flat), 2):
+            value: Any = flat[index+1]
+            if isinstance(value, list):
+                value = [self.string(item) for item in value]
+            elif value is not None:
+                value = self.string(value)
+            attrs[self.string(flat[index])] = value
+        return attrs
+
+    def children(self, encoded: Union[int, str, List]) -> Union[str, List[Dict]]:
+        if not isinstance(encoded, list):
+            return self.string(encoded)
+        children: List[Dict] = []
+        for child in encoded:
+            if not isinstance(child, list):
+                children.append({'c': self.string(child)})
+                continue
+            decoded: Dict = {'n': self.string(child[0]), 'attrs': self.attrs(child[1])}
+            if len(child) > 2:
+                decoded['c'] = self.children(child[2])
+            children.append(decoded)
+        return children
+
+    def record(self, record: List) -> Dict:
+        kind: int = record[0]
+        cpid: List[int] = self.path(record[1], self.last_cpid)
+        self.last_cpid = cpid
+        if kind == DELETE:
+            edit: Dict = {'type': 'Delete', 'cpid': cpid, 'tag_name': self.string(record[2])}
+            if len(record) > 3:
+                edit['content'] = self.string(record[3])
+        elif kind == INSERT_ELEMENT:
+            edit = {'cpid': cpid, 'i': record[2], 'n': self.string(record[3]),
+                    'attrs': self.attrs(record[4])}
+            if len(record) > 5:
+                edit['c'] = self.children(record[5])
+        elif kind == INSERT_TEXT:
+            edit = {'cpid': cpid, 'i': record[2], 'c': self.string(record[3])}
+        elif kind == MOVE:
+            edit = {'cpid': cpid, 'np': self.path(record[2], cpid), 'j': record[3]}
+        elif kind == MERGE_ELEMENT:
+            edit = {'cpid': cpid, 'n': self.string(record[2]), 'attrs': self.attrs(record[3])}
+        elif kind == MERGE_TEXT:
+            edit = {'cpid': cpid}
+            if len(record) > 2:
+                edit['c'] = self.string(record[2])
+        else:
+            raise ValueError(f'Unknown kind of record: {kind}')
+        return edit
+
+def decode_patch(patch: Dict) -> Dict:
+    """Reference decoder: the json patch which the JS patcher applies, given
+    either a compact or a plain patch."""
+    if not is_compact(patch):
+        return patch
+    if patch['v'] != VERSION:
+        raise ValueError(f'Unsupported version of compact patch: {patch["v"]}')
+    decoder = _Decoder(patch['s'])
+    return {'edits': [decoder.record(record) for record in patch['e']]}
+
+def dump_patch(patch: Dict, patch_file: IO, compact: bool = False) -> None:
+    """Writes the json patch, in the compact encoding if compact."""
+    if compact:
+        json.dump(encode_patch(patch), patch_file, separators=(',', ':'))
+    else:
+        json.dump(patch, patch_file)
+
+def brotli_size(data: bytes) -> int:
+    """Size once compressed like make_fawkes_default does (brotli CLI, or
+    the brotli package if installed)."""
+    try:
+        import brotli
+        return len(brotli.compress(data))
+    except ImportError:
+        return len(subprocess.run(['brotli', '-c'], input=data, stdout=subprocess.PIPE,
+                                  check=True).stdout)
+
+def compare_sizes(patch_path: str) -> Tuple[List[int], List[int]]:
+    """(raw, gzip, brotli) sizes of the plain and the compact patch."""
+    with open(patch_path, 'r') as patch_file:
+        patch: Dict = json.load(patch_file)
+    plain: bytes = json.dumps(patch).encode()
+    compact: Dict = encode_patch(patch)
+    if json.dumps(decode_patch(compact)) != json.dumps(patch):
+        raise ValueError(f'{patch_path}: the compact patch does not decode to the same patch')
+    compact_bytes: bytes = json.dumps(compact, separators=(',', ':')).encode()
+    return tuple([len(data), len(gzip.compress(data, 9)), brotli_size(data)]
+                 for data in (plain, compact_bytes))
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) < 2:
+        print(f'usage: {sys.argv[0]} update.json [update.json ...]', file=sys.stderr)
+        sys.exit(2)
+    print(f'{"patch":<40} {"raw":>9} {"compact":>9} {"gzip":>8} {"compact":>8} {"brotli":>8} {"compact":>8}')
+    totals: List[int] = [0] * 6
+    for path in sys.argv[1:]:
+        plain_sizes, compact_sizes = compare_sizes(path)
+        sizes: List[int] = [size for pair in zip(plain_sizes, compact_sizes) for size in pair]
+        totals = [total + size for total, size in zip(totals, sizes)]
+        print(f'{path[-40:]:<40} {sizes[0]:>9} {sizes[1]:>9} {sizes[2]:>8} {sizes[3]:>8} '
+              f'{sizes[4]:>8} {sizes[5]:>8}')
+    if len(sys.argv) > 2:
+        print(f'{"total":<40} {totals[0]:>9} {totals[1]:>9} {totals[2]:>8} {totals[3]:>8} '
+              f'{totals[4]:>8} {totals[5]:>8} '
+              f'({100 * (totals[4] - totals[5]) / totals[4]:.1f}% smaller after brotli)')
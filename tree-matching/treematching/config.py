@@ -23,4 +23,6 @@
 # Global variables for html-apted and js-patcher library paths
 # from parent directory (python package)
 patcher_path = "../js-patcher/built/patcher.js"
-apted_path = "../html-apted/html-apted/build/libs/html-apted.jar"
\ No newline at end of file
+apted_path = "../html-apted/html-apted/build/libs/html-apted.jar"
+# long-lived html-apted worker (see run_apted.AptedWorker)
+apted_worker_path = "apted-worker/AptedWorker.java"
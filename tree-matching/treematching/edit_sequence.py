@@ -21,9 +21,11 @@
 # SOFTWARE.
 
 import logging, json
-from typing import List, Dict, Union
+from operator import attrgetter
+from typing import List, Dict, Tuple, Union
 
 from tree import Tree
+from shadow_tree import ShadowTree
 from edits import Edit, Delete, Insert, Merge
 
 logger = logging.getLogger(__name__)
@@ -35,44 +37,93 @@ def _is_direct_parent(parent: Dict, next_edit: Dict) -> bool:
         next_edit['cpid'][-1] == parent.get('i') # parent might not have i
 
 
+_sort_key = attrgetter('sort_key')
+
+class _Concat:
+    """Inner node of the rope of edits of an EditSequence, whose leaves are
+    tuples of edits. Ropes are never modified, so they can be shared."""
+    __slots__ = ('left', 'right')
+
+    def __init__(self, left: 'Rope', right: 'Rope'):
+        self.left: Rope = left
+        self.right: Rope = right
+
+Rope = Union[Tuple[Edit, ...], _Concat]
+
+def _flatten(rope: Rope) -> List[Edit]:
+    """Edits of the rope from left to right, without recursion."""
+    edits: List[Edit] = []
+    stack: List[Rope] = [rope]
+    while stack:
+        node: Rope = stack.pop()
+        if isinstance(node, tuple):
+            edits.extend(node)
+        else:
+            stack.append(node.right)
+            stack.append(node.left)
+    return edits
+
+
 class EditSequence:
+    """Edits with their total cost. Appending to a sequence shares its edits
+    (a rope) instead of copying them; the edits are only collected and
+    sorted when they are first read (self.edits).
+    """
     # Not passing [] as a default argument because of: https://docs.python-guide.org/writing/gotchas/
     def __init__(self, edits: List[Edit] = None, cost: int = -1):
         self.edits_json_list: List[Dict] = []
         self.total_cost: int = cost
+        # matching algorithm which produced the edits, if known (see run_apted)
+        self.algorithm: str = None
+        # sorted edits, once materialized
+        self._edits: List[Edit] = None
         if edits is None:
-            self.edits = []
+            self._rope: Rope = ()
             self.total_cost = 0
         else:
-            self.edits: List[Edit] = sorted(edits)
+            self._rope: Rope = tuple(edits)
             if cost == -1:
                 self.total_cost = 0
-                for e in self.edits:
+                for e in self._rope:
                     self.total_cost += e.cost()
 
+    @property
+    def edits(self) -> List[Edit]:
+        if self._edits is None:
+            self._edits = sorted(_flatten(self._rope), key=_sort_key)
+        return self._edits
+
+    @edits.setter
+    def edits(self, edits: List[Edit]) -> None:
+        """Expects the edits to be sorted already."""
+        self._edits = edits
+        self._rope = tuple(edits)
+
     @classmethod
     def append(cls, left_subtree: 'EditSequence', recent_edits: Union[Edit, 'EditSequence']):
         """Creates a new instance of EditSequence by adding the recent_edits to
-        the previous edit sequence (left_subtree, before this point).
+        the previous edit sequence (left_subtree, before this point), in O(1):
+        neither of them is copied nor sorted.
         recent_edits could be just one Edit or another EditSequence, therefore we need to check
         the type of parameter passed into the function.
         Attn: For now, we are NOT optimizing consecutive delete or insert costs.
         therefore we are computing total_cost beforehand, instead of on-the-fly.
         #TODO: consider optimizing consecutive deletes/inserts
         """
-        # on purpose shallow copy; no need to deep copy all edit elements
-        new_edits: List[Edit] = left_subtree.edits.copy()
         new_total_cost: int = left_subtree.total_cost
         if isinstance(recent_edits, Edit):
-            new_edits.append(recent_edits)
+            new_rope: Rope = _Concat(left_subtree._rope, (recent_edits,))
             new_total_cost += recent_edits.cost()
         elif isinstance(recent_edits, EditSequence):
-            new_edits.extend(recent_edits.edits)
+            new_rope: Rope = _Concat(left_subtree._rope, recent_edits._rope)
             new_total_cost += recent_edits.total_cost
         else:
             raise TypeError('This method expects an object of type either Edit or EditSequence!')
 
-        return cls(new_edits, new_total_cost)
+        sequence: EditSequence = cls()
+        sequence._rope = new_rope
+        sequence.total_cost = new_total_cost
+        return sequence
 
     def __str__(self):
         return f'cost = {self.total_cost}, edits = [{", ".join(map(str, self.edits))}]'
@@ -92,22 +143,36 @@ class EditSequence:
         self.edits = filtered
 
 
-    def _minimize_json(self, index: int) -> None:
-        parent: Dict = self.edits_json_list[index]
-        next_index = index+1
-        while next_index < len(self.edits_json_list) and \
-            _is_direct_parent(parent, self.edits_json_list[next_index]):
-            self._minimize_json(next_index)
-            parent_content: List = parent.get('c')
-            if parent_content is None:
-                parent['c'] = []
-            child_json: Dict = self.edits_json_list[next_index]
-            del child_json['cpid']
-            del child_json['i']
-            parent['c'].append(child_json)
-            # removes this edit from the list => next_index refers to the next edit not seen so far
-            del self.edits_json_list[next_index]
+    def _minimize_json(self) -> None:
+        """Nests each Insert into the Insert of its direct parent (children
+        array 'c'), in a single pass: records are visited in order, with the
+        chain of records they may still be nested into kept on a stack.
+        """
+        minimized: List[Dict] = []
+        # nesting[k+1] is nested in nesting[k]; nesting[0] is a top-level record
+        nesting: List[Dict] = []
+        for edit_json in self.edits_json_list:
+            while nesting and not _is_direct_parent(nesting[-1], edit_json):
+                self._close_json(nesting)
+            if nesting:
+                parent: Dict = nesting[-1]
+                if parent.get('c') is None:
+                    parent['c'] = []
+                parent['c'].append(edit_json)
+            else:
+                minimized.append(edit_json)
+            nesting.append(edit_json)
+        while nesting:
+            self._close_json(nesting)
+        self.edits_json_list = minimized
 
+    @staticmethod
+    def _close_json(nesting: List[Dict]) -> None:
+        """Pops the last record of the stack, which has no more children."""
+        parent: Dict = nesting.pop()
+        if nesting: # nested: position is given by the parent and the order
+            del parent['cpid']
+            del parent['i']
         # further minimization: if parent (element) has only one TextContent child
         # then remove the children array (first 'c' value) and replace it
         # with just the content string
@@ -132,7 +197,10 @@ class EditSequence:
         # map_iterator = map(lambda e: e.get_json(), sorted(self.edits))
         # self.edits_json_list = list(map_iterator)
         self.edits_json_list = []
-        subject: Tree = source.deepcopy_tree()
+        # Only the structure of the source tree matters here; cpids of its
+        # nodes are computed on demand, the edits being applied in one ordered
+        # pass from left to right (see ShadowTree).
+        subject: ShadowTree = ShadowTree(source)
         for edit in self.edits:
             move_json: Dict = edit.shadow_apply(subject)
             if move_json:
@@ -141,11 +209,7 @@ class EditSequence:
                 self.edits_json_list.append(edit.get_json())
 
         # minimizing json output by merging some edits in one json object
-        i = 0
-        # _minimize_json() might shrink edits_json_list => check len() each call
-        while i < len(self.edits_json_list):
-            self._minimize_json(i)
-            i += 1
+        self._minimize_json()
 
         json_rep = {'edits': self.edits_json_list}
         return json_rep
@@ -163,8 +227,9 @@ class EditSequence:
         # Deleting all <script>...</script>s which are below another edit.
         # Basically every script-related edit, besides starting Merges
         # with 0-cost (if any) is transformed to Delete.
+        edits: List[Edit] = self.edits
         delete_scripts: bool = False
-        for (index, edit) in enumerate(self.edits):
+        for (index, edit) in enumerate(edits):
             if not delete_scripts:
                 if edit.cost() == 0: # Only a Merge cost can be 0
                     continue;
@@ -175,19 +240,20 @@ class EditSequence:
             # go on and transform edit to Delete if needed.
             if edit.source.name == 'script':
                 if isinstance(edit, Merge):
-                    self.edits[index] = Delete(edit.source) # Merge -> Delete
+                    edits[index] = Delete(edit.source) # Merge -> Delete
                     # Check if script has a content which should be next update.
-                    if index+1 < len(self.edits) and \
-                       self.edits[index+1].source.parent == edit.source:
-                        self.edits[index+1] = Delete(self.edits[index+1].source)
+                    if index+1 < len(edits) and \
+                       edits[index+1].source.parent == edit.source:
+                        edits[index+1] = Delete(edits[index+1].source)
                 else: #already a Delete edit on a script
-                    if index+1 < len(self.edits):
-                        next_edit: Edit = self.edits[index+1]
+                    if index+1 < len(edits):
+                        next_edit: Edit = edits[index+1]
                         # if next edit is about content of this script
                         if next_edit.source.parent.id == edit.source.id:
                             assert(isinstance(next_edit, Delete))
 
         # Note: self.edits are sorted beforehand.
+        self.edits = edits # the rope is updated with the transformed edits
         common_tree: Tree = source.deepcopy_tree()
         for edit in self.edits:
             edit.apply(common_tree)
@@ -0,0 +1,116 @@
+# MIT License
+
+# Copyright (c) 2019 Shaghayegh Mardani
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import sys, time, random, logging
+from typing import List, Union
+
+from edits import Edit
+from edit_sequence import EditSequence
+from benchmark_json_update import patch_edits, sections
+
+# Checks that EditSequence, whose appends share the edits in a rope, gives
+# the same sequences as appending eagerly (copying and sorting the edits at
+# each append, see EagerEditSequence): the edits of synthetic patches are
+# shuffled and appended by random chains of single edits and of other
+# sequences, the same chain for both. The sorted edits must be the same
+# objects in the same order, with the same total cost. Exits with status 1
+# otherwise.
+#     python3 treematching/edit_sequence_conformance.py [num_of_chains]
+
+class EagerEditSequence:
+    """EditSequence before the rope: the edits are copied and sorted again
+    by each append."""
+    def __init__(self, edits: List[Edit] = None, cost: int = -1):
+        self.total_cost: int = cost
+        if edits is None:
+            self.edits: List[Edit] = []
+            self.total_cost = 0
+        else:
+            self.edits = sorted(edits)
+            if cost == -1:
+                self.total_cost = sum(edit.cost() for edit in self.edits)
+
+    @classmethod
+    def append(cls, left_subtree: 'EagerEditSequence',
+               recent_edits: Union[Edit, 'EagerEditSequence']) -> 'EagerEditSequence':
+        new_edits: List[Edit] = left_subtree.edits.copy()
+        new_total_cost: int = left_subtree.total_cost
+        if isinstance(recent_edits, Edit):
+            new_edits.append(recent_edits)
+            new_total_cost += recent_edits.cost()
+        else:
+            new_edits.extend(recent_edits.edits)
+            new_total_cost += recent_edits.total_cost
+        return cls(new_edits, new_total_cost)
+
+def random_chain(cls, edits: List[Edit], rng: random.Random):
+    """Appends the edits in order: either a prefix given to the constructor
+    followed by single appends, or (for longer runs) two sequences built the
+    same way and appended to each other. The edits of the sequences being
+    built are sometimes read (cached) in between."""
+    if len(edits) > 50 and rng.random() < 0.5:
+        middle: int = rng.randrange(1, len(edits))
+        left = random_chain(cls, edits[:middle], rng)
+        return cls.append(left, random_chain(cls, edits[middle:], rng))
+    start: int = rng.randrange(len(edits) + 1)
+    sequence = cls(edits[:start]) if start else cls()
+    for edit in edits[start:]:
+        sequence = cls.append(sequence, edit)
+        if rng.random() < 0.01:
+            sequence.edits
+    return sequence
+
+
+if __name__ == '__main__':
+
+    logging.disable(logging.CRITICAL)
+    num_of_chains: int = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    all_match = True
+    for chain in range(num_of_chains):
+        # edits of two patches, many of them with the same cpids: their
+        # order is then the order of the appends (the sort is stable).
+        edits: List[Edit] = [edit for num_of_items in (100 * (chain % 5 + 1), 100 * (chain % 5 + 1) + 50)
+                             for edit in patch_edits(sections, num_of_items)[1].edits]
+        random.Random(chain).shuffle(edits)
+        start = time.perf_counter()
+        shared: EditSequence = random_chain(EditSequence, edits, random.Random(chain))
+        shared_edits: List[Edit] = shared.edits
+        shared_time = time.perf_counter() - start
+        start = time.perf_counter()
+        eager: EagerEditSequence = random_chain(EagerEditSequence, edits, random.Random(chain))
+        eager_time = time.perf_counter() - start
+        differences: List[str] = []
+        if len(shared_edits) != len(eager.edits) or \
+           any(left is not right for left, right in zip(shared_edits, eager.edits)):
+            position: int = next((index for index, (left, right) in enumerate(zip(shared_edits, eager.edits))
+                                  if left is not right), min(len(shared_edits), len(eager.edits)))
+            differences.append(f'edits differ at position {position} (of {len(shared_edits)} vs {len(eager.edits)})')
+        if shared.total_cost != eager.total_cost:
+            differences.append(f'total cost {shared.total_cost} vs {eager.total_cost}')
+        times: str = f'{len(edits)} edits, shared {shared_time:.2f}s, eager {eager_time:.2f}s'
+        if differences:
+            all_match = False
+            print(f'chain {chain}: DIFFERENT ({times})')
+            for difference in differences:
+                print(f'    {difference}')
+        else:
+            print(f'chain {chain}: OK ({times})')
+    sys.exit(0 if all_match else 1)
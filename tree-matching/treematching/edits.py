@@ -23,12 +23,13 @@
 import logging, json
 from abc import ABC, abstractmethod
 from math import inf
-from typing import Dict, List, Union
+from typing import Dict, List, Tuple, Union
 
 from node import Node, Element, Text
 from tree import Tree
 from node_path_ids import NodeID
 from merge_change import MergeChange, OpType
+from shadow_tree import ShadowTree, ShadowNode, path_str
 
 
 logger = logging.getLogger(__name__)
@@ -37,6 +38,10 @@ class Edit(ABC):
     def __init__(self, affectedID: NodeID = None):
         #affecting the node with the given cpid in the source tree.
         self.cpid: NodeID = affectedID
+        # edits are sorted by cpid: the root path (cached by the NodeID) is
+        # compared natively as a tuple (see EditSequence.edits), without
+        # going through NodeID.__lt__
+        self.sort_key: Tuple[int, ...] = affectedID._root_path if affectedID is not None else ()
 
     @abstractmethod
     def apply(self, subject: Tree) -> None:
@@ -55,12 +60,12 @@ class Edit(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    def shadow_apply(self, subject: Tree) -> Dict:
+    def shadow_apply(self, subject: ShadowTree) -> Dict:
         raise NotImplementedError
 
     def __lt__(self, other) -> bool:
-        if hasattr(other, 'cpid'):
-            return self.cpid < other.cpid
+        if hasattr(other, 'sort_key'):
+            return self.sort_key < other.sort_key
 
     def __eq__(self, other) -> bool:
         if hasattr(other, 'cpid'):
@@ -70,6 +75,9 @@ class Edit(ABC):
 class Delete(Edit):
     def __init__(self, node: Node):
         self.source = node
+        # cpid of the node in the DOM when it is deleted, after the edits
+        # before this one (see shadow_apply), which may have shifted it.
+        self.shadow_cpid: Tuple[int, ...] = None
         super().__init__(self.source.id)
 
     def apply(self, subject: Tree) -> None:
@@ -83,21 +91,18 @@ class Delete(Edit):
         # they are not affected by any possible Delete or Insert updates before
         # this current one. On the other hand, cpids are affected by Delete/Inserts.
         found = subject.find_node_by_post_id(self.source.post_id)
-        found_siblings = found.parent.children
-        source_index = found_siblings.index(found)
-        new_children_list = found_siblings[0:source_index] #does not include source_index
-        found_children_size: int = 0
+        parent: Element = found.parent
+        source_index: int = found.child_index()
+        found_children: List[Node] = []
         if isinstance(found, Element):
-            new_children_list += found.children
-            found_children_size = len(found.children)
-            #updates the child_path_ids in addition to parent references
-            for i in range(len(found.children)):
-                found.children[i].update_parent(found.parent, source_index+i)
-
-        for j in range(source_index+1, len(found_siblings)):
-            found_siblings[j].update_id(found_children_size+j-1)
-        new_children_list += found_siblings[source_index+1:]
-        found.parent.children = new_children_list
+            found_children = found.children
+            for child in found_children:
+                child.parent = parent
+        # replaces found with its children, preserving the order.
+        parent.children[source_index:source_index+1] = found_children
+        # child_path_ids of the moved children and right siblings (and their
+        # descendants) are lazily recomputed.
+        parent.mark_children_changed(source_index)
 
     def cost(self) -> int:
         return 1
@@ -108,18 +113,21 @@ class Delete(Edit):
     def get_json(self) -> Dict:
         json_rep = {}
         json_rep['type'] = self.__class__.__name__
-        json_rep['cpid'] = self.source.id.get_child_path()
+        json_rep['cpid'] = list(self.shadow_cpid) if self.shadow_cpid is not None \
+            else self.source.id.get_child_path()
         json_rep['tag_name'] = self.source.name
         if isinstance(self.source, Text):
             json_rep['content'] = self.source.content
         return json_rep
 
-    def shadow_apply(self, subject: Tree) -> Dict:
-        """Does exactly the same as actual apply, removes the targeted node
-        from the subject tree and returns True to keep this in the list of
-        JSON updates.
+    def shadow_apply(self, subject: ShadowTree) -> Dict:
+        """Does exactly the same as actual apply, replaces the targeted node
+        by its children in the subject (shadow) tree, after recording its
+        current cpid for get_json. Returns no move update.
         """
-        self.apply(subject)
+        found: ShadowNode = subject.find_node_by_post_id(self.source.post_id)
+        self.shadow_cpid = subject.cpid(found)
+        subject.delete(found)
         return
 
 
@@ -157,32 +165,16 @@ class Insert(Edit):
             json_rep['c'] = self.target.content
         return json_rep
 
-    def shadow_apply(self, subject: Tree) -> Dict:
-        """Inserts only a copy of target node into the subject tree,
-        updates the child_path_id of all right siblings descendants.
-        The copy of target node should not have any children so that
-        the flow of next (Merge) updates becomes the same as what
-        happens in the JS patcher.
-        Returns true to keep this in the resulting list of JSON updates.
+    def shadow_apply(self, subject: ShadowTree) -> Dict:
+        """Inserts only a copy of target node into the subject tree, right
+        siblings are shifted. The copy of target node should not have any
+        children so that the flow of next (Merge) updates becomes the same as
+        what happens in the JS patcher. Returns no move update.
         """
         if self.target.parent is None:
             raise ValueError('Does not support inserting a root node into another tree.')
-        parent_id: NodeID = self.target.parent.id
-        parent: Node = subject.find_node_by_cpid(parent_id)
-
-        target_index: int = self.target.id.last_child_index()
-        # logger.debug(f'Insert into parent id: {parent_id} <- target_insert_index: {target_index}')
-
-        target_copy: Node = self.target.deepcopy_node(parent)
-        # target_copy.parent = parent
-        if isinstance(self.target, Element):
-            target_copy.children = []
-
-        parent.children.insert(target_index, target_copy)
-
-        for j in range(target_index+1, len(parent.children)):
-            parent.children[j].update_id(j)
-
+        subject.insert(self.target.parent.id._root_path, self.target.id.last_child_index(),
+                       self.target.name, isinstance(self.target, Element))
         return
 
 
@@ -209,6 +201,7 @@ class Merge(Edit):
             if len(self.changes) > 0:
                 # the content has changed between the two, o.w. returns empty.
                 found.content = ''
+                found.invalidate_hash()
         else: # it's an Element
             for c in self.changes:
                 if c.change_type == OpType.REMOVE:
@@ -229,6 +222,8 @@ class Merge(Edit):
                         found.attrs[c.key] = list(sourceVals & targetVals)
                 else: #does not apply any ADD attribute or content.
                     pass
+            if len(self.changes) > 0:
+                found.invalidate_hash()
 
     def cost(self) -> int:
         if len(self.changes) > 0:
@@ -266,32 +261,47 @@ class Merge(Edit):
                     json_rep['c'] = self.target.content
         return json_rep
 
-    def shadow_apply(self, subject: Tree) -> Dict:
+    def _is_target_ancestor(self, found_parent: ShadowNode, parent_path: Tuple[int, ...],
+                            target_path: Tuple[int, ...]) -> bool:
+        """Same as self.target.is_ancestor(found_parent), given the current
+        cpid of found_parent (and of target): the only ancestor of target
+        which may have the same cpid is the one at the same depth."""
+        if found_parent is None or len(parent_path) >= len(target_path) or \
+           target_path[:len(parent_path)] != parent_path:
+            return False
+        ancestor: Node = self.target
+        for _ in range(len(target_path) - len(parent_path)):
+            ancestor = ancestor.parent
+        if ancestor.name == found_parent.name:
+            return True
+        logger.error(f'Found ancestor={ancestor} with same id,'\
+                     f'but not equal to other={found_parent}')
+        return False
+
+    def shadow_apply(self, subject: ShadowTree) -> Dict:
         """Checks to see if the source and target nodes are in the same
         position as they should be or not. If the corresponding node in the
-        subject tree is already at the correct position, then returns False.
-        As this update does not need to stay in the list of JSON updates,
-        assuming it has 0 cost.
+        subject tree is already at the correct position, then returns None.
+        Otherwise it is moved under its expected parent and the move update
+        is returned, to be included in the list of JSON updates.
         """
-        found = subject.find_node_by_post_id(self.source.post_id)
-        if found.id != self.target.id:
+        found: ShadowNode = subject.find_node_by_post_id(self.source.post_id)
+        found_path: Tuple[int, ...] = subject.cpid(found)
+        target_path: Tuple[int, ...] = self.target.id._root_path
+        if found_path != target_path:
             # if the updates are applied correctly then the parent of this
             # node should be in the right position ->
-            if self.target.is_ancestor(found.parent):
-                move_json: Dict = {'cpid': found.id.get_child_path()}
-                # detach found from its parent, append to target.parent children
-                found.parent.remove_subtree(found)
-                # get the corresponding node in subject with target.parent cpid
-                expected_parent: Node = subject.find_node_by_cpid(self.target.parent.id)
-                expected_parent.append_child(found)
-
-                move_json['np'] = self.target.parent.id.get_child_path()
+            if self._is_target_ancestor(found.parent, found_path[:-1], target_path):
+                move_json: Dict = {'cpid': list(found_path)}
+                # detach found from its parent, append to the children of the
+                # node in subject with target.parent cpid
+                subject.move(found, target_path[:-1])
+                move_json['np'] = list(target_path[:-1])
                 move_json['j'] = self.target.id.last_child_index() # for debugging purposes
                 return move_json
             else:
                 raise ValueError(f'Could not solve the issue with moving:' \
-                                 f'found.cpid={found.id} vs. ' \
+                                 f'found.cpid={path_str(found_path)} vs. ' \
                                  f'target.cpid={self.target.id}')
 
         return
-
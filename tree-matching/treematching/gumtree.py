@@ -0,0 +1,294 @@
+# MIT License
+
+# Copyright (c) 2019 Shaghayegh Mardani
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from collections import defaultdict
+from operator import itemgetter
+from typing import List, Tuple, Dict, Set
+
+from node import Node, Element
+from tree import Tree
+from traversal import postorder
+from anchoring import ordered_pairs, consistent_pairs
+from top_down import pairs_by_key
+from tree_mappings import TreeMappings
+
+def _label(node: Node) -> str:
+    # GumTree type of a node: elements of different names are never matched
+    return node.name if isinstance(node, Element) else None
+
+class GumTreeMatcher:
+    """Heuristic matching of two trees after GumTree (Falleri et al., Fine-grained
+    and accurate source code differencing, ASE 2014), much faster than the
+    tree edit distance on large pages, at the price of a larger patch:
+    1) top-down: the highest isomorphic subtrees (same subtree hash, at least
+    min_height high) are matched, those occurring more than once by the
+    dice of their parents;
+    2) bottom-up: each unmatched element is matched with the unmatched
+    element of the same name sharing most of its matched descendants
+    (dice above min_dice), as are both roots;
+    3) recovery: after each bottom-up match, the unmatched children are
+    matched in order, first those with the same structure (names all the way
+    down, ignoring texts and attributes), then those with the same name,
+    and so on recursively.
+    GumTree mappings can move nodes, which Insert/Delete/Merge edits cannot
+    express: mapped pairs breaking the order or the ancestry of the others
+    are dropped (see consistent_pairs), i.e. moved nodes are deleted and
+    inserted, unless recovery matches them again in place. The result is in
+    the same format as the tree edit distance.
+    """
+    def __init__(self, first: Tree, second: Tree, min_height: int = 2,
+                 min_dice: float = 0.5, attributes: bool = False):
+        self.first: Tree = first
+        self.second: Tree = second
+        self.min_height: int = min_height
+        self.min_dice: float = min_dice
+        self.attributes: bool = attributes
+        # partners by post id, 0 if unmatched
+        self._first_partners: List[int] = [0] * (len(first) + 1)
+        self._second_partners: List[int] = [0] * (len(second) + 1)
+        self._first_heights: List[int] = self._heights(first)
+        self._second_heights: List[int] = self._heights(second)
+        # structure hashes of the nodes of both trees, by id()
+        self._structures: Dict[int, int] = {}
+        for node in first.nodes[1:] + second.nodes[1:]:
+            self._structures[id(node)] = hash((_label(node), tuple(
+                self._structures[id(child)] for child in node.children) if isinstance(node, Element) else ()))
+
+    @staticmethod
+    def _heights(tree: Tree) -> List[int]:
+        heights: List[int] = [0] * (len(tree) + 1)
+        for node in tree.nodes[1:]:
+            # children precede their parent in post order
+            if node.parent is not None:
+                parent_id: int = node.parent.post_id
+                heights[parent_id] = max(heights[parent_id], heights[node.post_id] + 1)
+        return [height + 1 for height in heights]
+
+    def _structure_key(self, node: Node) -> int:
+        return self._structures[id(node)]
+
+    def _match(self, source: Node, target: Node) -> None:
+        self._first_partners[source.post_id] = target.post_id
+        self._second_partners[target.post_id] = source.post_id
+
+    def _match_subtrees(self, source: Node, target: Node) -> None:
+        for source_node, target_node in zip(postorder(source), postorder(target)):
+            self._match(source_node, target_node)
+
+    def _dice(self, source: Node, target: Node) -> float:
+        """2 x (number of descendants of source matched with descendants
+        of target) / (number of descendants of both)."""
+        first_leftmost: int = self.first.leftmost_leaves[source.post_id]
+        second_leftmost: int = self.second.leftmost_leaves[target.post_id]
+        common: int = 0
+        for descendant in range(first_leftmost, source.post_id):
+            partner: int = self._first_partners[descendant]
+            if second_leftmost <= partner < target.post_id:
+                common += 1
+        total: int = source.post_id - first_leftmost + target.post_id - second_leftmost
+        return 2 * common / total if total > 0 else 0
+
+    # 1) top-down
+    def _match_isomorphic(self) -> None:
+        first_heights: List[int] = self._first_heights
+        second_heights: List[int] = self._second_heights
+        # nodes to visit, by height
+        first_open: Dict[int, List[Node]] = defaultdict(list)
+        second_open: Dict[int, List[Node]] = defaultdict(list)
+        first_open[first_heights[self.first.root.post_id]].append(self.first.root)
+        second_open[second_heights[self.second.root.post_id]].append(self.second.root)
+        # groups of isomorphic subtrees occurring more than once
+        ambiguous: List[Tuple[List[Node], List[Node]]] = []
+        height: int = max(first_open.keys() | second_open.keys())
+        while height >= self.min_height:
+            first_nodes: List[Node] = first_open.pop(height, [])
+            second_nodes: List[Node] = second_open.pop(height, [])
+            by_hash: Dict[int, Tuple[List[Node], List[Node]]] = defaultdict(lambda: ([], []))
+            for node in first_nodes:
+                by_hash[node.subtree_hash()][0].append(node)
+            for node in second_nodes:
+                by_hash[node.subtree_hash()][1].append(node)
+            for sources, targets in by_hash.values():
+                if sources and targets:
+                    if len(sources) == 1 and len(targets) == 1:
+                        self._match_subtrees(sources[0], targets[0])
+                    else:
+                        ambiguous.append((sources, targets))
+                    continue
+                # no isomorphic subtree on the other side: open them
+                for node in sources:
+                    for child in node.children:
+                        first_open[first_heights[child.post_id]].append(child)
+                for node in targets:
+                    for child in node.children:
+                        second_open[second_heights[child.post_id]].append(child)
+            height -= 1
+        self._match_ambiguous(ambiguous)
+
+    def _match_ambiguous(self, ambiguous: List[Tuple[List[Node], List[Node]]]) -> None:
+        """Matches isomorphic subtrees occurring more than once (groups of
+        them in both trees): those whose parents share matched descendants
+        first, best first by the dice of their parents (computed once per
+        pair of parents), then the rest of each group, in order."""
+        candidates: List[Tuple[float, List[Node], List[Node]]] = []
+        for sources, targets in ambiguous:
+            second_siblings: Dict[int, List[Node]] = defaultdict(list)
+            for node in targets:
+                second_siblings[id(node.parent)].append(node)
+            first_siblings: Dict[int, List[Node]] = defaultdict(list)
+            for node in sources:
+                first_siblings[id(node.parent)].append(node)
+            for first_nodes in first_siblings.values():
+                source_parent: Node = first_nodes[0].parent
+                if source_parent is None:
+                    continue
+                # parents of targets which are ancestors of the partners of
+                # descendants of source_parent (the dice is 0 otherwise)
+                visited: Set[int] = set()
+                for descendant in range(self.first.leftmost_leaves[source_parent.post_id],
+                                        source_parent.post_id):
+                    partner: int = self._first_partners[descendant]
+                    if not partner:
+                        continue
+                    ancestor: Node = self.second.nodes[partner].parent
+                    while ancestor is not None and id(ancestor) not in visited:
+                        visited.add(id(ancestor))
+                        second_nodes: List[Node] = second_siblings.get(id(ancestor))
+                        if second_nodes:
+                            candidates.append((self._dice(source_parent, ancestor),
+                                               first_nodes, second_nodes))
+                        ancestor = ancestor.parent
+        candidates.sort(key=itemgetter(0), reverse=True)
+        for _, first_nodes, second_nodes in candidates:
+            self._match_in_order(first_nodes, second_nodes)
+        for sources, targets in ambiguous:
+            self._match_in_order(sources, targets)
+
+    def _match_in_order(self, sources: List[Node], targets: List[Node]) -> None:
+        # the k-th unmatched isomorphic subtree of sources with the k-th of targets
+        for source, target in ordered_pairs(pairs_by_key(
+                [node for node in sources if not self._first_partners[node.post_id]],
+                [node for node in targets if not self._second_partners[node.post_id]],
+                lambda node: node.subtree_hash())):
+            self._match_subtrees(source, target)
+
+    # 2) bottom-up and 3) recovery
+    def _candidates(self, source: Node) -> Set[int]:
+        # unmatched ancestors with the same name of the partners of the
+        # descendants of source (post ids)
+        candidates: Set[int] = set()
+        visited: Set[int] = set()
+        label: str = _label(source)
+        for descendant in range(self.first.leftmost_leaves[source.post_id], source.post_id):
+            partner: int = self._first_partners[descendant]
+            if not partner:
+                continue
+            ancestor: Node = self.second.nodes[partner].parent
+            while ancestor is not None and ancestor.post_id not in visited:
+                visited.add(ancestor.post_id)
+                if not self._second_partners[ancestor.post_id] and _label(ancestor) == label:
+                    candidates.add(ancestor.post_id)
+                ancestor = ancestor.parent
+        return candidates
+
+    def _recover(self, source: Node, target: Node) -> None:
+        stack: List[Tuple[Node, Node]] = [(source, target)]
+        while stack:
+            source, target = stack.pop()
+            if not isinstance(source, Element):
+                continue
+            for key in (self._structure_key, _label):
+                # in the gaps between the children matched with each other
+                matched: List[Tuple[Node, Node]] = ordered_pairs(
+                    [(child, self.second.nodes[self._first_partners[child.post_id]])
+                     for child in source.children if self._first_partners[child.post_id] and
+                     self.second.nodes[self._first_partners[child.post_id]].parent is target])
+                bounds: List[Tuple[int, int]] = [(-1, -1)] + \
+                    [(first_child.id.last_child_index(), second_child.id.last_child_index())
+                     for first_child, second_child in matched] + \
+                    [(len(source.children), len(target.children))]
+                for (first_start, second_start), (first_end, second_end) in zip(bounds, bounds[1:]):
+                    sources: List[Node] = [child for child in source.children[first_start+1:first_end]
+                                           if not self._first_partners[child.post_id]]
+                    targets: List[Node] = [child for child in target.children[second_start+1:second_end]
+                                           if not self._second_partners[child.post_id]]
+                    for pair in ordered_pairs(pairs_by_key(sources, targets, key)):
+                        self._match(*pair)
+                        stack.append(pair)
+
+    def _match_containers(self) -> None:
+        for source in self.first.nodes[1:]:
+            if self._first_partners[source.post_id] or not isinstance(source, Element):
+                continue
+            if source is self.first.root:
+                target: Node = self.second.root
+                if self._second_partners[target.post_id] or _label(target) != _label(source):
+                    continue
+            else:
+                best_dice: float = self.min_dice
+                target = None
+                for candidate in sorted(self._candidates(source)):
+                    dice: float = self._dice(source, self.second.nodes[candidate])
+                    if dice > best_dice:
+                        best_dice = dice
+                        target = self.second.nodes[candidate]
+                if target is None:
+                    continue
+            self._match(source, target)
+            self._recover(source, target)
+
+    def mappings(self) -> TreeMappings:
+        """Returns the mappings, including deleted and inserted nodes,
+        and their cost (the same as for TreeEditDistance) as distance."""
+        self._match_isomorphic()
+        self._match_containers()
+        kept: List[Tuple[Node, Node]] = consistent_pairs(self.first, self.second, self._first_partners)
+        # the nodes of dropped pairs (e.g. moved) can still be matched in
+        # place: recovery once more around the kept pairs.
+        self._first_partners = [0] * (len(self.first) + 1)
+        self._second_partners = [0] * (len(self.second) + 1)
+        for source, target in kept:
+            self._match(source, target)
+        for source, target in kept:
+            self._recover(source, target)
+        result = TreeMappings()
+        partners: List[int] = [0] * (len(self.first) + 1)
+        matched: bytearray = bytearray(len(self.second) + 1)
+        distance: float = 0
+        for source, target in consistent_pairs(self.first, self.second, self._first_partners):
+            partners[source.post_id] = target.post_id
+            matched[target.post_id] = 1
+            if isinstance(source, Element):
+                if self.attributes:
+                    distance += source.transform_cost(target)
+            elif source.content != target.content:
+                distance += 1
+        for first_id in range(1, len(self.first) + 1):
+            result.append(first_id, partners[first_id])
+            if not partners[first_id]:
+                distance += 1
+        for second_id in range(1, len(self.second) + 1):
+            if not matched[second_id]:
+                result.append(0, second_id)
+                distance += 1
+        result.distance = distance
+        return result
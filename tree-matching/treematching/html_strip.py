@@ -24,8 +24,24 @@ from bs4 import BeautifulSoup
 from bs4.element import Tag, NavigableString, Doctype, Comment
 import sys, logging, copy
 
+from traversal import postorder
+
 logging.basicConfig(stream=sys.stderr, level=logging.WARNING)
 
+def _child_tags(soup_tag) -> list:
+    return [child for child in soup_tag.contents if isinstance(child, Tag)]
+
+def make_soup(html_file, parser = 'html5lib') -> BeautifulSoup:
+    """Parses the given (open) file into a soup with the given backend
+    (see tree_builder.PARSER_BACKENDS)."""
+    if parser == 'html5-parser':
+        import html5_parser
+        return html5_parser.parse(html_file.read(), treebuilder = 'soup',
+                                  return_root = False)
+    elif parser in ('html5lib', 'lxml'):
+        return BeautifulSoup(html_file, parser)
+    raise ValueError(f'Unknown parser backend: {parser}')
+
 class HTMLStrip:
 
     def __init__(self, html_file_name, soup):
@@ -34,9 +50,9 @@ class HTMLStrip:
 
     """cls is a reference to (this) class object"""
     @classmethod
-    def from_file(cls, html_file):
+    def from_file(cls, html_file, parser = 'html5lib'):
         html_file.seek(0)
-        soup = BeautifulSoup(html_file, 'html5lib') # html.parser
+        soup = make_soup(html_file, parser)
         soup_tree = cls(html_file.name, soup)    #calls (this) class constructor
         soup_tree.prepare_html_original()
         soup_tree.strip_meta_nodes()
@@ -110,35 +126,36 @@ class HTMLStrip:
         return HTMLStrip(self.file_name, self.original_soup)
 
 
-    """ For a given tag, this method strips that tag of its attributes or body or both recursively
+    """ For a given tag, this method strips that tag and all of its descendant tags of
+        their attributes or body or both. Tags are visited in post order, i.e. after their children.
         Returns nothing, applies the modification in place. """
     def strip_tag(self, current_tag, strip_attr = False, strip_body = False, preserve_nodes = True):
         # print(f"Mode: strip_attr = {strip_attr} and strip_body = {strip_body}")
-        if(strip_attr == True):
-            current_tag.attrs = {}
+        for current_tag in postorder(current_tag, _child_tags):
+            if(strip_attr == True):
+                current_tag.attrs = {}
 
-        to_be_removed = []
-        for child in current_tag.children:
-            if isinstance(child, Tag):
-                self.strip_tag(child, strip_attr, strip_body, preserve_nodes)
-                if child.name == 'meta':
-                    to_be_removed.append(child)
-
-            elif isinstance(child, NavigableString):
-                if isinstance(child, Comment):
-                    to_be_removed.append(child)
-                elif (child.string.isspace()):
-                    # if child content is only white spaces
-                    to_be_removed.append(child)
-                elif strip_body == True:
-                    if preserve_nodes:
-                        #keeps the node, just removes the text (string)
-                        child.string = ''
-                    else:
+            to_be_removed = []
+            for child in current_tag.children:
+                if isinstance(child, Tag):
+                    if child.name == 'meta':
                         to_be_removed.append(child)
 
-        for node in to_be_removed:
-            current_tag.contents.remove(node) #it should not throw a ValueError exception
+                elif isinstance(child, NavigableString):
+                    if isinstance(child, Comment):
+                        to_be_removed.append(child)
+                    elif (child.string.isspace()):
+                        # if child content is only white spaces
+                        to_be_removed.append(child)
+                    elif strip_body == True:
+                        if preserve_nodes:
+                            #keeps the node, just removes the text (string)
+                            child.string = ''
+                        else:
+                            to_be_removed.append(child)
+
+            for node in to_be_removed:
+                current_tag.contents.remove(node) #it should not throw a ValueError exception
 
 
     """ prints the structure of tree recursively """
@@ -38,6 +38,8 @@ class MergeChange:
     - If change_type is REMOVE, value is empty, otherwise
     the value has the updated value for both node types.
     """
+    __slots__ = ('change_type', 'key', 'value')
+
     def __init__(self,
                  type_: OpType,
                  key: str,
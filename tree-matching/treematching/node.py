@@ -20,7 +20,7 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import logging
+import sys, logging
 from typing import List, Dict, Union
 from bs4 import BeautifulSoup
 from bs4.element import Tag, NavigableString
@@ -29,21 +29,68 @@ from math import inf
 
 from node_path_ids import NodeID
 from merge_change import MergeChange, OpType
+from traversal import preorder, postorder, walk
 # from path import Path
 
 logger = logging.getLogger(__name__)
 
+#void elements -> they do not have any children, self-closing tags
+_VOID_ELEMENTS = frozenset(['garea', 'base', 'br', 'col', 'embed', 'hr', 'img',
+                            'input', 'link', 'meta', 'param', 'source', 'track', 'wbr'])
+
+class _EmptyAttrs(dict):
+    """Read-only empty attributes, shared by all elements without any."""
+    __slots__ = ()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('Shared empty attrs cannot be modified, assign a new dict instead.')
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    setdefault = update = pop = popitem = clear = _read_only
+
+# Shared immutable containers of elements without attributes/children.
+# Element.insert_child() replaces EMPTY_CHILDREN with a list when needed.
+EMPTY_ATTRS: Dict[str, Union[List[str], str]] = _EmptyAttrs()
+EMPTY_CHILDREN = ()
+
+class _TreeVersion:
+    """Shared by all nodes of a tree and bumped on every structural change.
+    Cached child path ids (cpids) are only trusted if they were computed
+    at the current version, otherwise they are recomputed on demand.
+    """
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value: int = 0
+
+def _unhashed_children(node: 'Node') -> List['Node']:
+    # children of a node whose subtree hash is not cached (see subtree_hash)
+    if node._subtree_hash is not None:
+        return EMPTY_CHILDREN
+    return getattr(node, 'children', EMPTY_CHILDREN)
+
 class Node(ABC):
+    __slots__ = ('name', 'parent', 'post_id', 'path',
+                 '_index', '_tree_version', '_id', '_id_version', '_subtree_hash')
+
     def __init__(self,
                 name: str,
                 current_index: int,
                 parent: 'Node') -> 'Node':
-        self.name: str = name
-        parent_id: NodeID = parent.id if parent != None else None
-        self.id: NodeID = NodeID(current_index, parent_id)
+        # tag names are interned, all nodes with the same tag share one string.
+        self.name: str = sys.intern(name)
         self.parent: Node = parent
         self.post_id: int = -1
         self.path = None
+        # cached structural hash of the subtree (see subtree_hash).
+        self._subtree_hash: int = None
+        # index of this node inside parent's children (see child_index)
+        # and the cached cpid, valid as long as _id_version is up to date.
+        self._index: int = current_index
+        self._tree_version: _TreeVersion = parent._tree_version \
+            if parent is not None else _TreeVersion()
+        self._id: NodeID = None
+        self._id_version: int = -1
 
 
     @classmethod
@@ -61,22 +108,30 @@ class Node(ABC):
             return Text(current_index, parent, text = str(soup_tag.string))
 
         assert(type(soup_tag) == Tag)
-        node = Element(soup_tag.name, current_index, parent, soup_tag.attrs)
-        # If <noscript> then it should only have one Text child.
-        # The Text child content is set to string of original children nodes.
-        if soup_tag.name == 'noscript':
-            if len(soup_tag.contents) > 0:
-                content_str: str = ''.join(map(str, soup_tag.contents))
-                node.children = [Text(0, parent = node, text = content_str)]
-        else:
+        root = Element(soup_tag.name, current_index, parent, soup_tag.attrs or EMPTY_ATTRS)
+        # (soup tag, its Element) pairs whose children are still to be created
+        stack: List = [(soup_tag, root)]
+        while stack:
+            soup_tag, node = stack.pop()
+            # If <noscript> then it should only have one Text child.
+            # The Text child content is set to string of original children nodes.
+            if soup_tag.name == 'noscript':
+                if len(soup_tag.contents) > 0:
+                    content_str: str = ''.join(map(str, soup_tag.contents))
+                    node.children = [Text(0, parent = node, text = content_str)]
+                continue
             children: List[Node] = []
-            for index in range(len(soup_tag.contents)):
-                child_node = Node.from_soup_tag(soup_tag.contents[index],
-                                                index,
-                                                parent = node)
-                children.append(child_node)
-                node.children = children
-        return node
+            for index, soup_child in enumerate(soup_tag.contents):
+                if isinstance(soup_child, NavigableString):
+                    children.append(Text(index, node, text = str(soup_child.string)))
+                else:
+                    assert(type(soup_child) == Tag)
+                    child_node = Element(soup_child.name, index, node,
+                                         soup_child.attrs or EMPTY_ATTRS)
+                    children.append(child_node)
+                    stack.append((soup_child, child_node))
+            node.children = children or EMPTY_CHILDREN
+        return root
 
     @classmethod
     def from_text(cls,
@@ -97,7 +152,8 @@ class Node(ABC):
     @abstractmethod
     def __hash__(self):
         #Attention: is used to check equality of two instances in a Set
-        return hash(self.__str__())
+        # Consistent with __eq__, which compares (at least) cpids and names.
+        return hash((self.id, self.name))
 
     @abstractmethod
     def __eq__(self, other):
@@ -111,27 +167,112 @@ class Node(ABC):
     def deepcopy_node(self, parent: 'Element') -> 'Node':
         pass
 
+    @abstractmethod
+    def label_hash(self) -> int:
+        """Hash of the node itself without cpid (name, attrs or text content),
+        consistent with isEqualWOcpid."""
+        raise NotImplementedError
+
+    def subtree_hash(self) -> int:
+        """Structural (Merkle) hash of this subtree, computed from the
+        label_hash of this node and the subtree hashes of its children (in order).
+        Cached on each node until invalidate_hash is called. Like str hashes,
+        the values are only comparable within the same process.
+        """
+        if self._subtree_hash is None:
+            for node in postorder(self, _unhashed_children):
+                if node._subtree_hash is None:
+                    node._subtree_hash = node._compute_subtree_hash()
+        return self._subtree_hash
+
+    def _compute_subtree_hash(self) -> int:
+        # hashes of the children (if any) are already cached.
+        return self.label_hash()
+
+    def invalidate_hash(self) -> None:
+        """Must be called after changing attrs/content or children of this
+        node in place. Clears the cached subtree hashes of this node and its
+        ancestors. Stops at the first one without a cached hash, since none
+        of its ancestors can have one either.
+        """
+        node: Node = self
+        while node is not None and node._subtree_hash is not None:
+            node._subtree_hash = None
+            node = node.parent
+
+    def subtree_equals(self, other: 'Node') -> bool:
+        """Whether the two subtrees are the same (ignoring cpids), by
+        comparing their subtree hashes."""
+        return self.subtree_hash() == other.subtree_hash()
+
+    @property
+    def id(self) -> NodeID:
+        """Child path id (cpid) of this node.
+        It is cached and only recomputed if the tree has been structurally
+        modified since, which costs one step per stale ancestor.
+        """
+        if self._id_version != self._tree_version.value:
+            self._refresh_id()
+        return self._id
+
+    def _refresh_id(self) -> None:
+        stale: List[Node] = []
+        current: Node = self
+        while current is not None and \
+              current._id_version != current._tree_version.value:
+            stale.append(current)
+            current = current.parent
+        # top-down, so that the parent cpid is always up to date.
+        for node in reversed(stale):
+            index: int = node.child_index()
+            parent_id: NodeID = node.parent._id if node.parent else None
+            old_id: NodeID = node._id
+            # reuse the cached object if nothing has changed on the path.
+            if old_id is None or old_id._index != index or \
+               old_id._parent is not parent_id:
+                node._id = NodeID(index, parent_id)
+            node._id_version = node._tree_version.value
+
+    def child_index(self) -> int:
+        """Returns the index of this node inside parent's list of children.
+        Only the first parent._valid_upto children are known to have a correct
+        index; otherwise the parent re-indexes its children up to this node.
+        Since edits are applied from left to right, this is amortized O(1).
+        """
+        parent: Element = self.parent
+        if parent is not None:
+            if self._index >= parent._valid_upto or \
+               parent.children[self._index] is not self:
+                parent.reindex_children(until = self)
+        return self._index
+
     def update_id(self, new_index: int) -> None:
-        """Updates the child path id based on the parent child_path_id and the given new index.
-        The new index is the (updated) index of this node inside parent's list of children.
-        Here we are reading the parent.id again, because it probably has changed since the construction of this node.
+        """Sets the index of this node inside parent's list of children.
+        The cpids of this node and its descendants are not rewritten here,
+        they are lazily recomputed the next time they are read.
         """
-        old_id = self.id
-        self.id = NodeID(new_index, self.parent.id)
+        self._index = new_index
+        self._tree_version.value += 1
 
     def update_parent(self, new_parent: 'Node', new_index: int) -> None:
         self.parent = new_parent
+        if new_parent is not None:
+            # from now on, it is a part of the new parent's tree.
+            self._tree_version = new_parent._tree_version
         self.update_id(new_index)
 
-    @abstractmethod
     def set_post_order_id(self, next_index: int, nodes: List['Node']) -> int:
         """Traverses the sub-tree of this node in a post-order manner.
-        Given next available index, it sets post_ids for all of its children recursively
+        Given next available index, it sets post_ids for all of its descendants
         and then sets the id for itself. Also caches the nodes by post id,
         such that element at index i of nodes array has post_id = i
         Returns the next available index.
         """
-        raise NotImplementedError
+        for node in postorder(self):
+            node.post_id = next_index
+            nodes.append(node)
+            next_index += 1
+        return next_index
 
     @abstractmethod
     def print_html(self, out_file) -> None:
@@ -155,6 +296,10 @@ class Node(ABC):
         is different then transformation cost is 1 (for now).
         3) It is impossible to do any modifications if nodes tag names are not the same.
         In this case, the cost is considered +infinity.
+        Subclasses agree with this default (cost 1 iff get_merge_changes
+        returns some change), but stop at the first difference without
+        building the changes, as it is called for many pairs of nodes that
+        are never merged.
         """
         # Keeping this only for TreeMatching class.
         # TODO: Refactor this later and separate from APTED.
@@ -204,18 +349,29 @@ class Node(ABC):
         """
         from path import Path
         if not self.path:
-            if not self.parent:
-                self.path = Path(self, parent_path = None)
-            else:
-                self.path = Path(self, self.parent.get_path())
+            # ancestors without a path yet, from this node upwards
+            missing: List[Node] = []
+            node: Node = self
+            while node is not None and not node.path:
+                missing.append(node)
+                node = node.parent
+            for node in reversed(missing):
+                if not node.parent:
+                    node.path = Path(node, parent_path = None)
+                else:
+                    node.path = Path(node, node.parent.path)
         return self.path
 
-    @abstractmethod
     def num_of_nodes(self) -> int:
         """Returns the total number of nodes in this subtree including root."""
-        pass
+        num: int = 0
+        for _ in preorder(self):
+            num += 1
+        return num
 
 class Text(Node):
+    __slots__ = ('content',)
+
     def __init__(self,
                 current_index: int,
                 parent: 'Node',
@@ -233,7 +389,7 @@ class Text(Node):
         return f'{{{self.id}: {self.name}}}'
 
     def __hash__(self):
-        return hash(self.__str__())
+        return hash((self.id, self.name))
 
     def __eq__(self, other):
         if not isinstance(other, Text):
@@ -245,21 +401,23 @@ class Text(Node):
             return False
         return (self.content == other.content)
 
+    def label_hash(self) -> int:
+        return hash((None, self.content))
+
     def deepcopy_node(self, parent: 'Element') -> 'Text':
         return Text(self.id.last_child_index(), parent, self.content)
 
     def print_html(self, out_file) -> None:
         out_file.write(self.content)
 
-    def set_post_order_id(self, next_index: int, nodes: List['Node']) -> int:
-        self.post_id = next_index
-        nodes.append(self)
-        # assert(nodes[self.post_id] == self)
-        return next_index+1
-
     def leftmost_leaf(self) -> Node:
         return self
 
+    def transform_cost(self, other: Node) -> float:
+        if not isinstance(other, Text):
+            return inf
+        return 0 if self.content == other.content else 1
+
     def get_merge_changes(self, other: Node) -> List[MergeChange]:
         """Returns a list of MergeChange containing one or no change.
         If content has not changed, it returns an empty list.
@@ -287,19 +445,21 @@ class Text(Node):
         # does not need to do anything
         return ''
 
-    def num_of_nodes(self) -> int:
-        return 1
-
 
 class Element(Node):
+    __slots__ = ('attrs', 'children', '_valid_upto')
+
     def __init__(self,
                 name: str,
                 current_index: int,
                 parent: 'Element',
-                attrs: Dict[str, Union[List[str], str]] = {},
-                children: List[Node] = []) -> 'Element':
+                attrs: Dict[str, Union[List[str], str]] = EMPTY_ATTRS,
+                children: List[Node] = EMPTY_CHILDREN) -> 'Element':
         self.attrs: Dict[str, Union[List[str], str]] = attrs
+        # a list, or EMPTY_CHILDREN for an element without any children.
         self.children: List[Node] = children
+        # number of leading children with a correct _index.
+        self._valid_upto: int = 0
         Node.__init__(self,
                     name = name,
                     current_index = current_index,
@@ -335,29 +495,68 @@ class Element(Node):
                 and (self.attrs == other.attrs)) #TODO: better comparison of attrs
 
     def __hash__(self):
-        return hash(self.__str__())
+        return hash((self.id, self.name))
+
+    def label_hash(self) -> int:
+        # attrs are compared as dicts (order does not matter), values as lists.
+        return hash((self.name, frozenset(
+            (name, value if isinstance(value, str) else tuple(value))
+            for name, value in self.attrs.items())))
+
+    def _compute_subtree_hash(self) -> int:
+        return hash((self.label_hash(),
+                     tuple(child._subtree_hash for child in self.children)))
 
     def __le__(self, other):
         if not isinstance(other, Element):
             return False
         return (self.id == other.id and self.name == other.name)
 
-    def deepcopy_node(self, parent: 'Element') -> 'Element':
+    def _shallow_copy(self, parent: 'Element') -> 'Element':
+        """Copy of this element and its attributes, without any children."""
         element_copy = Element(self.name, self.id.last_child_index(), parent)
-        attrs_copy: Dict[str, Union[List[str], str]] = {}
-        for name, value in self.attrs.items():
-            attrs_copy[name] = value
-        element_copy.attrs = attrs_copy
-        children_copy = []
-        for child in self.children:
-            children_copy.append(child.deepcopy_node(parent=element_copy))
-        element_copy.children = children_copy
+        if self.attrs:
+            element_copy.attrs = dict(self.attrs)
         return element_copy
 
-    def update_id(self, new_index: int) -> None:
-        super().update_id(new_index)
-        for i in range(len(self.children)):
-            self.children[i].update_id(i)
+    def deepcopy_node(self, parent: 'Element') -> 'Element':
+        root_copy: Element = self._shallow_copy(parent)
+        # (original, copy) pairs whose children are still to be copied
+        stack: List = [(self, root_copy)]
+        while stack:
+            original, element_copy = stack.pop()
+            children_copy: List[Node] = []
+            for child in original.children:
+                if isinstance(child, Element):
+                    child_copy = child._shallow_copy(element_copy)
+                    stack.append((child, child_copy))
+                else:
+                    child_copy = child.deepcopy_node(parent=element_copy)
+                children_copy.append(child_copy)
+            element_copy.children = children_copy or EMPTY_CHILDREN
+        return root_copy
+
+    def mark_children_changed(self, from_index: int = 0) -> None:
+        """Must be called after modifying the list of children, where
+        from_index is the first position which might have been affected.
+        Indices of children are fixed lazily by reindex_children().
+        """
+        self._valid_upto = min(self._valid_upto, from_index)
+        self._tree_version.value += 1
+        self.invalidate_hash()
+
+    def reindex_children(self, until: Node = None) -> None:
+        """Fixes the indices of children, starting from the first one which
+        might be wrong, up to the given child (or all of them)."""
+        children: List[Node] = self.children
+        i: int = self._valid_upto
+        while i < len(children):
+            child: Node = children[i]
+            child._index = i
+            i += 1
+            if child is until:
+                break
+        self._valid_upto = i
 
     #TODO(!!): stripping strategy -> right now we are ignoring attributes
     def find_equivalent_child(self, node: Node) -> Node:
@@ -366,23 +565,42 @@ class Element(Node):
         The reason we are not using <if node in self.children> directly is that we want
         the exact child (object) in children list as it might have some different descendants
         down the line, compared to the given node (which comes from another tree/path).
+        Children are kept sorted by their ids (see add_child), so it is
+        a binary search.
         """
-        for child in self.children:
-            if child.id == node.id and child.name == node.name:
-                return child
+        children: List[Node] = self.children
+        node_id: NodeID = node.id
+        low, high = 0, len(children)
+        while low < high:
+            middle: int = (low + high) // 2
+            if children[middle].id < node_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(children) and children[low].id == node_id and \
+           children[low].name == node.name:
+            return children[low]
         return None
 
+    def insert_child(self, index: int, child_node: Node) -> None:
+        """Inserts child_node at the given index of children, the right
+        siblings are shifted (their cpids are lazily recomputed)."""
+        if self.children is EMPTY_CHILDREN:
+            self.children = []
+        self.children.insert(index, child_node)
+        self.mark_children_changed(index)
+
     def add_child(self, child_node: Node):
         #Attention: Assuming that list of children are sorted based on NodeID
         for index in range(len(self.children)):
             if self.children[index].id > child_node.id:
-                self.children.insert(index, child_node)
+                self.insert_child(index, child_node)
                 return
             elif self.children[index].id == child_node.id:
                 raise ValueError(f'Did not expect one of the child IDs to be equal to-be-added-node ID')
 
         # print('child node before append', child_node)
-        self.children.insert(len(self.children), child_node)
+        self.insert_child(len(self.children), child_node)
         # print(self.children[0])
         # print('before return = ', child_node)
         return
@@ -401,58 +619,73 @@ class Element(Node):
         return output
 
     def print_html(self, out_file) -> None:
-        #void elements -> they do not have any children, self-closing tags
-        if self.name in ['garea', 'base', 'br', 'col', 'embed', 'hr', 'img', \
-                        'input', 'link', 'meta', 'param', 'source', 'track', 'wbr']:
-            out_file.write(f'<{self.name}{self._get_attrs_str()}/>')
-            assert(len(self.children) == 0)
-        else:
-            out_file.write(f'<{self.name}{self._get_attrs_str()}>')
-            for child in self.children:
-                child.print_html(out_file)
-            out_file.write(f'</{self.name}>')
+        for node, leaving in walk(self):
+            if not isinstance(node, Element):
+                if not leaving:
+                    out_file.write(node.content)
+            elif node.name in _VOID_ELEMENTS:
+                if not leaving:
+                    out_file.write(f'<{node.name}{node._get_attrs_str()}/>')
+                    assert(len(node.children) == 0)
+            elif leaving:
+                out_file.write(f'</{node.name}>')
+            else:
+                out_file.write(f'<{node.name}{node._get_attrs_str()}>')
 
     def find_element_by_attr(self, key: str, value: str):
         """Finds the first occurrence of an element which has an attribute (key-value pair)
         equal to the one given.
         """
-        found_value = self.attrs.get(key, None)
-        if found_value is not None:
-            if isinstance(found_value, list) and value in found_value:
-                return self
-            elif isinstance(found_value, str) and value == found_value:
-                return self
-        for child in self.children:
-            if isinstance(child, Element):
-                result = child.find_element_by_attr(key, value)
-                if result is not None:
-                    return result
+        for node in preorder(self):
+            if not isinstance(node, Element):
+                continue
+            found_value = node.attrs.get(key, None)
+            if found_value is not None:
+                if isinstance(found_value, list) and value in found_value:
+                    return node
+                elif isinstance(found_value, str) and value == found_value:
+                    return node
         return None
 
-    def set_post_order_id(self, next_index: int, nodes: List['Node']) -> int:
-        for child in self.children:
-            next_index = child.set_post_order_id(next_index, nodes)
-        self.post_id = next_index
-        nodes.append(self)
-        # assert(nodes[self.post_id] == self)
-        return next_index+1
-
     def leftmost_leaf(self) -> Node:
-        if len(self.children) > 0:
-            return self.children[0].leftmost_leaf()
-        else:
-            return self
+        node: Node = self
+        while isinstance(node, Element) and len(node.children) > 0:
+            node = node.children[0]
+        return node
 
     def find_node_by_post_id(self, id: int) -> Node:
-        if self.post_id == id:
-            return self
-        for child in self.children:
-            if child.post_id > id:
-                return child.find_node_by_post_id(id)
-            elif child.post_id == id:
-                return child
+        # descends into the first child whose subtree (post ids up to
+        # the child's own) might contain the id.
+        node: Node = self
+        while node.post_id != id:
+            if not isinstance(node, Element):
+                return None
+            for child in node.children:
+                if child.post_id >= id:
+                    node = child
+                    break
+            else:
+                raise RuntimeError('Could not find a node with id =', id)
+        return node
 
-        raise RuntimeError('Could not find a node with id =', id)
+    def transform_cost(self, other: Node) -> float:
+        if not isinstance(other, Element) or self.name != other.name:
+            return inf
+        attrs: Dict = self.attrs
+        other_attrs: Dict = other.attrs
+        if attrs == other_attrs:
+            return 0
+        if len(attrs) != len(other_attrs):
+            return 1 # some attribute is added or removed
+        for attr_name, this_value in attrs.items():
+            other_value = other_attrs.get(attr_name)
+            if other_value == None:
+                return 1
+            # same rule as in get_merge_changes for reordered lists
+            if other_value != this_value and \
+               (type(this_value) == str or not set(other_value) <= set(this_value)):
+                return 1
+        return 0
 
     def get_merge_changes(self, other: Node) -> List[MergeChange]:
         """Returns a list of MergeChange by comparing values of both elements
@@ -487,8 +720,7 @@ class Element(Node):
 
     #TODO: merge this with the already existing print_html method
     def print_html_tag(self) -> str:
-        if self.name in ['garea', 'base', 'br', 'col', 'embed', 'hr', 'img', \
-                         'input', 'link', 'meta', 'param', 'source', 'track', 'wbr']:
+        if self.name in _VOID_ELEMENTS:
             return f'<{self.name}{self.get_attrs()}/>\n'
 
         else:
@@ -496,53 +728,45 @@ class Element(Node):
 
     def append_child(self, child: Node) -> None:
         appended_index: int = len(self.children)
+        if self.children is EMPTY_CHILDREN:
+            self.children = []
         self.children.append(child)
-        child.parent = self
-        # recursively updates the cpids of all nodes in the subtree.
-        child.update_id(appended_index)
+        # cpids of the subtree are lazily recomputed.
+        child.update_parent(self, appended_index)
+        self.invalidate_hash()
 
     def remove_subtree(self, to_be_removed: Node) -> None:
         """Removes the subtree rooted at the given to_be_removed node from this node."""
-        remove_index: int = -1
-        for i, child in enumerate(self.children):
-            if child == to_be_removed:
-                remove_index = i
-            # we are on the right side of to_be_removed node
-            if remove_index != -1:
-                child.update_id(i-1)
-
-        self.children.pop(remove_index) # == .remove(child)
+        remove_index: int = to_be_removed.child_index()
+        assert(self.children[remove_index] is to_be_removed)
+        self.children.pop(remove_index)
+        # right siblings are shifted to the left.
+        self.mark_children_changed(remove_index)
 
     def list_uris(self, uris_so_far: List[str]) -> str:
         base_url : str = ''
-        found_uri: str = ''
-        if self.name == 'link' and \
-           self.attrs.get('href'):
-            found_uri = self.attrs['href']
-        elif self.name == 'script' and \
-             self.attrs.get('src'):
-            found_uri = self.attrs['src']
-        elif self.name == 'img' and \
-             self.attrs.get('src'):
-            found_uri = self.attrs['src']
-            # <source> <video> <audio>
-        elif self.name == 'base' and \
-             self.attrs.get('href'):
-            base_url = self.attrs['href']
-
-        if found_uri != '' and \
-           not found_uri.startswith('data') and \
-           not found_uri.startswith('android-app:') and \
-           not found_uri.startswith('ios-app:'):
-            uris_so_far.append(found_uri.strip())
-
-        for child in self.children:
-            base_url += child.list_uris(uris_so_far)
+        for node in preorder(self):
+            if not isinstance(node, Element):
+                continue
+            found_uri: str = ''
+            if node.name == 'link' and \
+               node.attrs.get('href'):
+                found_uri = node.attrs['href']
+            elif node.name == 'script' and \
+                 node.attrs.get('src'):
+                found_uri = node.attrs['src']
+            elif node.name == 'img' and \
+                 node.attrs.get('src'):
+                found_uri = node.attrs['src']
+                # <source> <video> <audio>
+            elif node.name == 'base' and \
+                 node.attrs.get('href'):
+                base_url += node.attrs['href']
+
+            if found_uri != '' and \
+               not found_uri.startswith('data') and \
+               not found_uri.startswith('android-app:') and \
+               not found_uri.startswith('ios-app:'):
+                uris_so_far.append(found_uri.strip())
 
         return base_url
-
-    def num_of_nodes(self) -> int:
-        num: int = 1
-        for child in self.children:
-            num += child.num_of_nodes()
-        return num
@@ -20,69 +20,83 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-from typing import List
+from typing import List, Tuple
 
 class NodeID:
-    def __init__(self, current_index: int, parent_id: 'NodeID' = None):
-        try:
-            self._root_path: List[int] = parent_id._root_path + [current_index]
-        except AttributeError: # parent_id is None
-            self._root_path: List[int] = [current_index]
+    """Child path id of a node: list of child indices from the root.
+    Only the parent NodeID and the index are stored up front; the full path
+    is materialized lazily, once, as an immutable tuple built from the
+    (cached) tuple of the parent, and comparisons use these tuples.
+    """
+    __slots__ = ('_parent', '_index', '_path', '_hash', '_root_len')
 
-        self._root_len = len(self._root_path)
+    def __init__(self, current_index: int, parent_id: 'NodeID' = None):
+        self._parent: 'NodeID' = parent_id
+        self._index: int = current_index
+        self._path: Tuple[int, ...] = None
+        self._hash: int = None
+        self._root_len: int = parent_id._root_len + 1 if parent_id is not None else 1
+
+    @property
+    def _root_path(self) -> Tuple[int, ...]:
+        if self._path is None:
+            # Materialize the missing prefixes iteratively (top-down).
+            pending: List['NodeID'] = []
+            current: 'NodeID' = self
+            while current is not None and current._path is None:
+                pending.append(current)
+                current = current._parent
+            prefix: Tuple[int, ...] = current._path if current is not None else ()
+            for node_id in reversed(pending):
+                prefix = prefix + (node_id._index,)
+                node_id._path = prefix
+        return self._path
 
     def __str__(self):
-        return str(self._root_path).replace(' ', '')
+        return '[' + ','.join(map(str, self._root_path)) + ']'
 
     def __hash__(self):
-        return hash(self.__str__())
+        if self._hash is None:
+            self._hash = hash(self._root_path)
+        return self._hash
 
     def __eq__(self, other):
+        if self is other:
+            return True
         try:
-            if self._root_len != other._root_len:
+            if self._root_len != other._root_len or \
+               self._index != other._index:
                 return False
-            # zip: iterator with the least items decides the length of the result.
-            for this_element, other_element in zip(self._root_path, other._root_path):
-                if this_element != other_element:
-                    return False
-            return True
-        except:
+            return self._root_path == other._root_path
+        except AttributeError:
             return False
 
     def __lt__(self, other):
         #Attention: We are not restricting the length of two Node IDs to be equal to each other.
-        for i in range(min(self._root_len, other._root_len)):
-            # _root_path[0..i-1] has been the same so far,
-            # if i-th node has lesser index than its counterpart in other_path,
-            # then it's on the left side of the other in the same tree
-            # and no need to compare the rest of the path.
-            # and there is no need to compare the rest of the path.
-            if self._root_path[i] < other._root_path[i]:
-                return True
-            elif self._root_path[i] > other._root_path[i]:
-                return False
-
-        # so far _root_path[0..min(_root_lens)] has been the same
-        # the path with shortest length is considered smaller.
-        return (self._root_len < other._root_len)
+        # Tuples compare element-wise from the root; the first different index
+        # decides which node is on the left side of the other in the same tree.
+        # If one path is a prefix of the other, the shorter one is smaller.
+        return self._root_path < other._root_path
 
     @classmethod
     def from_list(cls, child_path: List[int]) -> 'NodeID':
         """ Creates a NodeID based on the given child_path.
         For unit test only!
         """
-        new_id = cls(0, None)
-        new_id._root_path = child_path
-        new_id._root_len = len(child_path)
+        new_id: 'NodeID' = None
+        for index in child_path:
+            new_id = cls(index, new_id)
         return new_id
 
     def last_child_index(self) -> int:
-        return self._root_path[-1]
+        return self._index
 
     def get_child_path(self) -> List[int]:
-        return self._root_path
+        return list(self._root_path)
 
 class PathID:
+    __slots__ = ('start_node_id', 'end_node_id')
+
     def __init__(self, start: NodeID, end: NodeID):
         self.start_node_id: NodeID = start
         self.end_node_id: NodeID = end
@@ -0,0 +1,93 @@
+# MIT License
+
+# Copyright (c) 2019 Shaghayegh Mardani
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import sys, time
+from typing import List, Tuple
+
+from node import Node, Text
+from tree import Tree
+from tree_builder import PARSER_BACKENDS
+
+def tree_differences(first: Tree, second: Tree, limit: int = 20) -> List[str]:
+    """
+    Walks the two trees side by side (pre-order) and returns up to limit
+    descriptions of the places where they differ structurally: tag names,
+    attributes, text contents and number of children.
+    Children of nodes with a different number of children are not compared.
+    """
+    differences: List[str] = []
+    if len(first) != len(second):
+        differences.append(f'{len(first)-1} vs {len(second)-1} nodes')
+    stack: List[Tuple[Node, Node]] = [(first.root, second.root)]
+    while stack and len(differences) < limit:
+        first_node, second_node = stack.pop()
+        if type(first_node) is not type(second_node) or \
+           first_node.name != second_node.name:
+            differences.append(f'{first_node.id}: <{first_node.name}> vs <{second_node.name}>')
+        elif isinstance(first_node, Text):
+            if first_node.content != second_node.content:
+                differences.append(f'{first_node.id}: text {first_node.content[:40]!r} vs {second_node.content[:40]!r}')
+        else:
+            if first_node.attrs != second_node.attrs:
+                keys = sorted(key for key in first_node.attrs.keys() | second_node.attrs.keys()
+                              if first_node.attrs.get(key) != second_node.attrs.get(key))
+                differences.append(f'{first_node.id}: <{first_node.name}> attrs differ: {", ".join(keys)}')
+            if len(first_node.children) != len(second_node.children):
+                differences.append(f'{first_node.id}: <{first_node.name}> has '
+                                   f'{len(first_node.children)} vs {len(second_node.children)} children')
+            else:
+                stack.extend(reversed(list(zip(first_node.children, second_node.children))))
+    return differences[:limit]
+
+def check_conformance(html_file, parser: str, reference: str = 'html5lib') -> List[str]:
+    """
+    Parses the given (open) HTML file with both parser backends and returns
+    the differences between the two resulting trees (empty if they match).
+    A failure of the parser backend is reported as a difference as well.
+    """
+    reference_tree = Tree.from_file(html_file, 1, reference)
+    try:
+        parser_tree = Tree.from_file(html_file, 2, parser)
+    except Exception as e:
+        return [f'{parser} failed: {e!r}']
+    return tree_differences(reference_tree, parser_tree)
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) < 3 or sys.argv[1] not in PARSER_BACKENDS:
+        sys.exit(f'Usage: python3 treematching/parser_conformance.py {"|".join(PARSER_BACKENDS)} html_file [html_file ...]')
+
+    parser = sys.argv[1]
+    all_match = True
+    for html_path in sys.argv[2:]:
+        with open(html_path, 'r') as html_file_handle:
+            start = time.perf_counter()
+            differences = check_conformance(html_file_handle, parser)
+            elapsed = time.perf_counter() - start
+        if differences:
+            all_match = False
+            print(f'{html_path}: DIFFERENT ({elapsed:.2f}s)')
+            for difference in differences:
+                print(f'    {difference}')
+        else:
+            print(f'{html_path}: OK ({elapsed:.2f}s)')
+    sys.exit(0 if all_match else 1)
@@ -30,7 +30,7 @@ def insert_patchers(common: Tree, patcher_path: str) -> Tree:
     head = common.root.children[0]
     assert(head.name == 'head')
     main_patcher: Element = Element('script', 0, head, {'id': 'main-patcher'})
-    head.children.insert(0, main_patcher)
+    head.insert_child(0, main_patcher)
     # read patcher.js content
     with open(patcher_path, 'r') as patcher_file:
         patcher_content: str = patcher_file.read()
@@ -40,7 +40,7 @@ def insert_patchers(common: Tree, patcher_path: str) -> Tree:
     body = common.root.children[-1]
     assert(body.name == 'body')
     bottom_patcher = Element('script', len(body.children), body, {'id' : 'bottom-patcher'})
-    body.children.append(bottom_patcher)
+    body.append_child(bottom_patcher)
 
     bottom_content: str =  'var patcher = _getElementById' \
         '.call(document, "bottom-patcher");' \
@@ -26,13 +26,18 @@ from node_path_ids import PathID
 from node import Node
 
 class Path:
+    __slots__ = ('able_id', 'nodes', '_hash')
+
     def __init__(self, curr_node: Node, parent_path: 'Path' = None):
         self.able_id: bool = False
         self.nodes: List[Node] = []
         if not parent_path:
             self.nodes = [curr_node]
+            self._hash: int = hash((curr_node.label_hash(),))
         else:
             self.nodes = parent_path.nodes + [curr_node]
+            # chained with the parent path's hash, consistent with __eq__.
+            self._hash: int = hash((parent_path._hash, curr_node.label_hash()))
 
     def __str__(self):
         result: str = ''
@@ -56,7 +61,7 @@ class Path:
         return True
 
     def __hash__(self):
-        return hash(self.__str__())
+        return self._hash
 
     def get_next_level_paths(self) -> List['Path']:
         result: List['Path'] = []
@@ -0,0 +1,133 @@
+# MIT License
+
+# Copyright (c) 2019 Shaghayegh Mardani
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import os, sys, gzip, zlib, subprocess
+from typing import Dict, List, Tuple, Union
+
+# Top-level HTML of a mahimahi recording (e.g. examples/yahoo/record/v0),
+# as get_main_html in fawkes-example.sh extracts it with mm_tools, but in
+# Python only: the recorded file of the "GET / " request is decoded
+# (RequestResponse protobuf), and its body unchunked and decompressed.
+#     python3 treematching/recorded_html.py recorded_dir out_html
+
+# Field numbers of mahimahi's http_record.proto
+_RESPONSE = 5 # RequestResponse.response
+_HEADER, _BODY = 2, 3 # HTTPMessage.header, HTTPMessage.body
+_KEY, _VALUE = 1, 2 # HTTPHeader.key, HTTPHeader.value
+
+def _varint(data: bytes, position: int) -> Tuple[int, int]:
+    value: int = 0
+    shift: int = 0
+    while True:
+        byte: int = data[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if byte < 0x80:
+            return value, position
+
+def proto_fields(data: bytes) -> List[Tuple[int, Union[int, bytes]]]:
+    """(field number, value) of a protobuf message, in order: an int for a
+    varint, bytes for a length-delimited field (the only wire types of
+    http_record.proto)."""
+    fields: List[Tuple[int, Union[int, bytes]]] = []
+    position: int = 0
+    while position < len(data):
+        key, position = _varint(data, position)
+        wire_type: int = key & 7
+        if wire_type == 0:
+            value, position = _varint(data, position)
+        elif wire_type == 2:
+            length, position = _varint(data, position)
+            value = data[position:position+length]
+            position += length
+        else:
+            raise ValueError(f'Unexpected protobuf wire type {wire_type}')
+        fields.append((key >> 3, value))
+    return fields
+
+def _unchunk(body: bytes) -> bytes:
+    chunks: List[bytes] = []
+    position: int = 0
+    while True:
+        line_end: int = body.index(b'\r\n', position)
+        size: int = int(body[position:line_end].split(b';')[0], 16)
+        if size == 0:
+            return b''.join(chunks)
+        chunks.append(body[line_end+2:line_end+2+size])
+        position = line_end + 2 + size + 2
+
+def _decompress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'gzip':
+        return gzip.decompress(body)
+    if encoding == 'deflate':
+        return zlib.decompress(body)
+    if encoding == 'br': # brotli package if installed, or the brotli CLI
+        try:
+            import brotli
+            return brotli.decompress(body)
+        except ImportError:
+            return subprocess.run(['brotli', '-d', '-c'], input=body, stdout=subprocess.PIPE,
+                                  check=True).stdout
+    return body
+
+def response_body(recorded_path: str) -> str:
+    """Decoded body of the response recorded in the given file."""
+    with open(recorded_path, 'rb') as recorded_file:
+        record: bytes = recorded_file.read()
+    response: bytes = next(value for field, value in proto_fields(record) if field == _RESPONSE)
+    headers: Dict[str, str] = {}
+    body: bytes = b''
+    for field, value in proto_fields(response):
+        if field == _HEADER:
+            header: Dict[int, bytes] = dict(proto_fields(value))
+            headers[header[_KEY].decode().lower()] = header.get(_VALUE, b'').decode()
+        elif field == _BODY:
+            body += value
+    if 'chunked' in headers.get('transfer-encoding', ''):
+        body = _unchunk(body)
+    body = _decompress(body, headers.get('content-encoding', '').strip())
+    charset: str = 'utf-8'
+    for parameter in headers.get('content-type', '').split(';')[1:]:
+        name, _, value = parameter.strip().partition('=')
+        if name.lower() == 'charset' and value:
+            charset = value.strip('"')
+    return body.decode(charset, errors='replace')
+
+def main_html(recorded_dir: str) -> str:
+    """Body of the top-level HTML ("GET / ") of the recording."""
+    found: List[str] = []
+    for name in sorted(os.listdir(recorded_dir)):
+        path: str = os.path.join(recorded_dir, name)
+        with open(path, 'rb') as recorded_file:
+            if b'GET / ' in recorded_file.read():
+                found.append(path)
+    if len(found) != 1:
+        raise ValueError(f'{len(found)} top-level HTML files (GET /) found in {recorded_dir}')
+    return response_body(found[0])
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) != 3:
+        sys.exit('Usage: python3 treematching/recorded_html.py recorded_dir out_html')
+    with open(sys.argv[2], 'w') as out_file:
+        out_file.write(main_html(sys.argv[1]))
@@ -0,0 +1,189 @@
+# MIT License
+
+# Copyright (c) 2019 Shaghayegh Mardani
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import logging
+from collections import Counter
+from typing import List, Tuple, Dict, Set
+
+from node import Node, Element
+from tree import Tree
+from traversal import postorder
+from anchoring import collapse_tree, consistent_pairs
+from tree_mappings import TreeMappings
+
+logger = logging.getLogger(__name__)
+
+# Elements pinned whenever they are unique in both trees
+PINNED_TAGS = ('html', 'head', 'body')
+
+class PinnedRegions:
+    """Decomposition of the tree edit distance into independent regions.
+    Some pairs of elements are pinned, i.e. assumed to be matched: the roots,
+    head and body, and the elements with the same name and an id attribute
+    which is unique in both trees (of at least min_size nodes). Each pinned
+    pair delimits a region: both subtrees, where nested pinned subtrees are
+    collapsed into placeholder leaves (see collapse_tree). The regions can be
+    matched separately (e.g. in parallel), and stitch() gives the mappings of
+    the original trees.
+    Like anchors (see SubtreeAnchors), a pin is only a heuristic: if the
+    edit distance of a region does not match a placeholder with its partner,
+    release_split_pins() merges its region into the enclosing one.
+    """
+    def __init__(self, first: Tree, second: Tree, min_size: int = 32):
+        self.first: Tree = first
+        self.second: Tree = second
+        # pinned nodes of both trees (by id()) -> region name
+        self._placeholders: Dict[int, str] = {}
+        # region name -> (pinned node, partner), top-down
+        self._pins: Dict[str, Tuple[Node, Node]] = {}
+        self._find_pins(min_size)
+        # region name -> collapsed subtrees, and their original nodes
+        # by (collapsed) post id
+        self.regions: Dict[str, Tuple[Tree, Tree]] = {}
+        self._originals: Dict[str, Tuple[List[Node], List[Node]]] = {}
+        for name in self._pins:
+            self._collapse(name)
+        logger.info(f'{len(self.regions)} pinned regions, largest: '
+                    f'{max(len(first_region) for first_region, _ in self.regions.values())} nodes')
+
+    def _find_pins(self, min_size: int) -> None:
+        def key(node: Node) -> Tuple[str, str]:
+            if not isinstance(node, Element):
+                return None
+            if node.name in PINNED_TAGS:
+                return (node.name, None)
+            node_id = node.attrs.get('id')
+            return (node.name, node_id) if isinstance(node_id, str) else None
+        first_counts: Counter = Counter(key(node) for node in self.first.nodes[1:])
+        second_counts: Counter = Counter(key(node) for node in self.second.nodes[1:])
+        second_unique: Dict[Tuple[str, str], Node] = {
+            key(node): node for node in self.second.nodes[1:]
+            if key(node) is not None and second_counts[key(node)] == 1}
+        partners: List[int] = [0] * (len(self.first) + 1)
+        for node in self.first.nodes[1:]:
+            node_key: Tuple[str, str] = key(node)
+            if node_key is None or first_counts[node_key] != 1 or node_key not in second_unique:
+                continue
+            partner: Node = second_unique[node_key]
+            size: int = min(node.post_id - self.first.leftmost_leaves[node.post_id],
+                            partner.post_id - self.second.leftmost_leaves[partner.post_id]) + 1
+            if size >= min_size or node.name in PINNED_TAGS:
+                partners[node.post_id] = partner.post_id
+        # the roots delimit the outermost region anyway
+        partners[self.first.root.post_id] = self.second.root.post_id
+        # moved or nested differently: dropped (see consistent_pairs), i.e.
+        # part of the enclosing region
+        pins: List[Tuple[Node, Node]] = consistent_pairs(self.first, self.second, partners)
+        pins.sort(key=lambda pair: -pair[0].post_id)
+        for node, partner in pins:
+            name: str = f'fawkes-pin-{len(self._pins)}'
+            self._pins[name] = (node, partner)
+            self._placeholders[id(node)] = name
+            self._placeholders[id(partner)] = name
+
+    def _collapse(self, name: str) -> None:
+        node, partner = self._pins[name]
+        first_region, first_originals = collapse_tree(node, self._placeholders, self.first.name,
+                                                      self.first.tindex, keep_root=True)
+        second_region, second_originals = collapse_tree(partner, self._placeholders, self.second.name,
+                                                        self.second.tindex, keep_root=True)
+        self.regions[name] = (first_region, second_region)
+        self._originals[name] = (first_originals, second_originals)
+
+    def _enclosing(self, node: Node) -> str:
+        """Name of the region in which node is (collapsed or not)."""
+        node = node.parent
+        while id(node) not in self._placeholders:
+            node = node.parent
+        return self._placeholders[id(node)]
+
+    def _within(self, node: Node, names: Set[str]) -> bool:
+        """Whether node is inside (or is) one of the given pinned nodes."""
+        while node is not None:
+            if self._placeholders.get(id(node)) in names:
+                return True
+            node = node.parent
+        return False
+
+    def _split_pins(self, region_mappings: Dict[str, TreeMappings]) -> Set[str]:
+        """Names of the placeholders which are not matched with their partner."""
+        split: Set[str] = set()
+        for name, mappings in region_mappings.items():
+            first_originals, second_originals = self._originals[name]
+            for first_id, second_id in mappings:
+                source: Node = first_originals[first_id]
+                if source is None or source is self._pins[name][0]:
+                    continue
+                pinned: str = self._placeholders.get(id(source))
+                if pinned is not None and (not second_id or pinned != self._placeholders.get(
+                        id(second_originals[second_id]))):
+                    split.add(pinned)
+        return split
+
+    def release_split_pins(self, region_mappings: Dict[str, TreeMappings]) -> List[str]:
+        """Given the mappings of (some of) the regions, releases the pins
+        whose placeholders are not matched with their partner: their regions
+        are merged into the enclosing ones, which are collapsed again.
+        Returns the names of these enclosing regions, to be matched again
+        (the mappings of other regions are still valid)."""
+        released: List[Node] = []
+        for name in self._split_pins(region_mappings):
+            node, partner = self._pins.pop(name)
+            del self._placeholders[id(node)]
+            del self._placeholders[id(partner)]
+            del self.regions[name]
+            del self._originals[name]
+            released.append(node)
+        changed: List[str] = list(dict.fromkeys(self._enclosing(node) for node in released))
+        for name in changed:
+            self._collapse(name)
+        return changed
+
+    def stitch(self, region_mappings: Dict[str, TreeMappings]) -> TreeMappings:
+        """Given the mappings (pairs of post ids, 0 for insert/delete) of
+        every region, returns the mappings between the original trees.
+        A pair of placeholders stands for the pinned subtrees, which are
+        mapped by their own region. A placeholder which is still split is
+        deleted or inserted as a whole, with all the regions inside it.
+        """
+        split: Set[str] = self._split_pins(region_mappings)
+        result = TreeMappings()
+        for name, (node, partner) in self._pins.items():
+            if split and self._within(node, split):
+                continue
+            first_originals, second_originals = self._originals[name]
+            for first_id, second_id in region_mappings[name]:
+                source: Node = first_originals[first_id]
+                target: Node = second_originals[second_id]
+                source_name: str = self._placeholders.get(id(source)) \
+                    if source is not None and source is not node else None
+                target_name: str = self._placeholders.get(id(target)) \
+                    if target is not None and target is not partner else None
+                if source_name is None and target_name is None:
+                    result.append(source.post_id if source else 0, target.post_id if target else 0)
+                elif source_name != target_name:
+                    if source is not None:
+                        for deleted in (postorder(source) if source_name is not None else [source]):
+                            result.append(deleted.post_id, 0)
+                    if target is not None:
+                        for inserted in (postorder(target) if target_name is not None else [target]):
+                            result.append(0, inserted.post_id)
+        return result
@@ -20,49 +20,306 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import sys, os, json
-from subprocess import check_output, STDOUT
-from typing import List, Tuple, Dict
+import sys, os, io, argparse, logging, multiprocessing, shutil, tempfile, time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from hashlib import blake2b
+from queue import Queue
+from subprocess import Popen, PIPE, STDOUT, CalledProcessError
+from threading import Thread, Timer
+from typing import List, Tuple, Dict, Iterator, Iterable, Union
 
-from html_strip import HTMLStrip
 from tree import Tree
+from tree_builder import PARSER_BACKENDS, parse_html
+from traversal import walk, postorder
 from node import Node, Text, Element
 from edits import Edit, Merge, Insert, Delete
 from edit_sequence import EditSequence
+from anchoring import SubtreeAnchors, ordered_pairs
+from regions import PinnedRegions
+from ted import TreeEditDistance
+from ted_budget import TedBudgetExceeded, check_ted_budget
+from top_down import TopDownMatcher, pairs_by_key
+from gumtree import GumTreeMatcher
+from tree_mappings import TreeMappings
 from patching_helper import insert_patchers
-from config import apted_path, patcher_path
-
-def parse_apted_output(output: str) -> List[Tuple[int, int]]:
-    mappings: List[Tuple[int, int]] = []
-    except_first_line = output.split('\n')[1:]
-    for line in except_first_line:
-        parts = line.split('->')
-        mappings.append((int(parts[0]), int(parts[1])))
-    return mappings
+from compact_patch import dump_patch
+from config import apted_path, apted_worker_path, patcher_path
+
+logger = logging.getLogger(__name__)
+
+def text_label(content: str) -> str:
+    """Compact label standing for a text content: a 64 bit digest (hex)."""
+    return blake2b(content.encode('utf-8', 'surrogatepass'), digest_size=8).hexdigest()
 
-def run_command(command: str) -> str:
-    completed = check_output(command, stderr=STDOUT, shell=True) #, check=True)
-    return completed[:-1].decode('utf-8')
+def compatible_repr_string(current: Node, hash_texts: bool = False) -> str:
+    """Bracket representation of the subtree of current, which is the input
+    format of html-apted. If hash_texts, text contents are replaced by their
+    text_label(), so that the size of the input (and the cost of comparing
+    labels) does not depend on inline scripts, styles or JSON. html-apted
+    only compares texts for equality, so mappings are the same."""
+    parts: List[str] = []
+    append = parts.append
+    for node, leaving in walk(current):
+        if leaving:
+            append('}')
+        elif isinstance(node, Element):
+            append('{'+node.name)
+        elif hash_texts:
+            append('{#text:"'+text_label(node.content)+'"')
+        else:
+            append('{#text:"'+node.content.replace('"', '\\"')+'"')
+    return ''.join(parts)
 
 def compatible_repr_node(current: Node, out) -> None:
-    out.write('{')
-    if isinstance(current, Element):
-        out.write(f'{current.name}') # -{current.post_id}
-        for child in current.children:
-            compatible_repr_node(child, out)
-    else:
-        out.write(f'#text')
-        out.write(':"'+current.content.replace('"', '\\"')+'"')
-    out.write('}')
+    out.write(compatible_repr_string(current))
 
 def compatible_repr(tree: Tree, out_file_path: str) -> None:
+    # Only for debugging: the matcher reads the trees through pipes.
     with open(out_file_path, 'w') as out:
         compatible_repr_node(tree.root, out)
 
-def get_apted_edits(first: Tree, second: Tree, out_path: str) -> EditSequence:
-    apted_out = run_command(f'java -jar {apted_path} -f {out_path}_1.tree {out_path}_2.tree -m')
-    mappings_list: List[Tuple[int, int]] = parse_apted_output(apted_out)
+def _feed(path_or_fd: Union[str, int], data: bytes) -> None:
+    """Writes data into a pipe (fd) or a named pipe (path), then closes it.
+    The reader might exit early (e.g. on an error), which is not an error here."""
+    try:
+        with open(path_or_fd, 'wb') as pipe:
+            pipe.write(data)
+    except BrokenPipeError:
+        pass
+
+def _start_feeding(*pipes: Tuple[Union[str, int], bytes]) -> List[Thread]:
+    # One thread per pipe, since the reader might read them in any order.
+    feeders: List[Thread] = [Thread(target=_feed, args=pipe, daemon=True) for pipe in pipes]
+    for feeder in feeders:
+        feeder.start()
+    return feeders
+
+def _read_lines(stream, size: int) -> Iterator[bytes]:
+    # Lines of the next size bytes of the stream.
+    while size > 0:
+        line: bytes = stream.readline(size)
+        if not line:
+            raise EOFError('html-apted worker has exited')
+        size -= len(line)
+        yield line
+
+def _kill_at(process: Popen, deadline: float) -> Timer:
+    # Kills the process at the deadline (time.monotonic()), unless cancelled.
+    if deadline is None:
+        return None
+    killer = Timer(max(deadline - time.monotonic(), 0), process.kill)
+    killer.daemon = True
+    killer.start()
+    return killer
+
+def _out_of_budget(deadline: float, output: str) -> bool:
+    # Whether html-apted failed because of the deadline or of the heap size.
+    return (deadline is not None and time.monotonic() >= deadline) or \
+        'OutOfMemoryError' in output
+
+# paths in config.py are relative to the parent directory of this package
+_PARENT_DIR: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+class AptedWorker:
+    """A long-lived JVM running html-apted (see apted-worker/AptedWorker.java),
+    so that the JVM is started once instead of once per pair of trees.
+    Trees are streamed to it through two named pipes (in a private temporary
+    directory), and it answers with the output of the jar over stdout.
+    It is started on first use and restarted if it has crashed.
+    Not thread-safe: use an AptedWorkerPool for concurrent pages."""
+    def __init__(self):
+        self.process: Popen = None
+        self._pipes_dir: str = None
+
+    def start(self) -> None:
+        self._pipes_dir = tempfile.mkdtemp(prefix='apted-worker-')
+        for name in ('1.tree', '2.tree'):
+            os.mkfifo(os.path.join(self._pipes_dir, name))
+        jar: str = os.path.join(_PARENT_DIR, apted_path)
+        self.process = Popen(['java', '-cp', jar, os.path.join(_PARENT_DIR, apted_worker_path), jar],
+                             stdin=PIPE, stdout=PIPE)
+
+    def close(self) -> None:
+        if self.process is not None:
+            try:
+                self.process.stdin.close()
+            except BrokenPipeError:
+                pass
+            self.process.wait()
+            self.process = None
+        if self._pipes_dir is not None:
+            shutil.rmtree(self._pipes_dir, ignore_errors=True)
+            self._pipes_dir = None
+
+    def __enter__(self) -> 'AptedWorker':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _unblock(self, path: str, feeder: Thread) -> None:
+        # The jar did not read this pipe (e.g. failed before): read it here,
+        # so that the feeder can open it, write and exit.
+        reader: int = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        try:
+            while feeder.is_alive():
+                try:
+                    os.read(reader, 1 << 16)
+                except BlockingIOError:
+                    pass
+                feeder.join(0.01)
+        finally:
+            os.close(reader)
+
+    def _request(self, first_repr: bytes, second_repr: bytes,
+                 first_size: int, second_size: int, deadline: float) -> TreeMappings:
+        paths: List[str] = [os.path.join(self._pipes_dir, name) for name in ('1.tree', '2.tree')]
+        self.process.stdin.write(f'{paths[0]}\t{paths[1]}\n'.encode('utf-8'))
+        self.process.stdin.flush()
+        feeders: List[Thread] = _start_feeding((paths[0], first_repr), (paths[1], second_repr))
+        # the worker is killed at the deadline, and restarted on the next run
+        killer: Timer = _kill_at(self.process, deadline)
+        try:
+            header: List[str] = self.process.stdout.readline().decode('utf-8').split()
+            if len(header) != 2:
+                raise EOFError('html-apted worker has exited')
+            status, size = header
+            lines: Iterator[bytes] = _read_lines(self.process.stdout, int(size))
+            if status != 'OK':
+                error: str = b''.join(lines).decode('utf-8', 'replace')
+                if _out_of_budget(deadline, error):
+                    raise TedBudgetExceeded(f'html-apted is out of budget: {error}')
+                raise RuntimeError(f'html-apted failed: {error}')
+            return TreeMappings.parse(lines, first_size, second_size)
+        except EOFError as error:
+            if _out_of_budget(deadline, ''):
+                raise TedBudgetExceeded('html-apted ran out of time') from error
+            raise
+        finally:
+            if killer is not None:
+                killer.cancel()
+            for path, feeder in zip(paths, feeders):
+                if feeder.is_alive():
+                    self._unblock(path, feeder)
+
+    def run(self, first: Tree, second: Tree, deadline: float = None) -> TreeMappings:
+        """Returns the mappings of html-apted between the given trees (same
+        as get_apted_mappings without a worker). If the worker crashes,
+        it is restarted and the pair is tried once more."""
+        first_repr: bytes = compatible_repr_string(first.root, hash_texts=True).encode('utf-8')
+        second_repr: bytes = compatible_repr_string(second.root, hash_texts=True).encode('utf-8')
+        if self.process is None or self.process.poll() is not None:
+            self.close()
+            self.start()
+        try:
+            return self._request(first_repr, second_repr, len(first), len(second), deadline)
+        except (BrokenPipeError, EOFError):
+            logger.warning(f'html-apted worker crashed on {first.name}, restarting')
+            self.process.kill()
+            self.close()
+            self.start()
+            return self._request(first_repr, second_repr, len(first), len(second), deadline)
+
+class AptedWorkerPool:
+    """A fixed number of AptedWorkers shared by threads working on different
+    pages, e.g. with a concurrent.futures.ThreadPoolExecutor:
+        with pool.worker() as worker:
+            get_apted_edits(first, second, worker=worker)
+    """
+    def __init__(self, size: int):
+        self._workers: List[AptedWorker] = [AptedWorker() for _ in range(size)]
+        self._idle: Queue = Queue()
+        for worker in self._workers:
+            self._idle.put(worker)
+
+    @contextmanager
+    def worker(self) -> Iterator[AptedWorker]:
+        """Waits for an idle worker, which is given back at the end."""
+        worker: AptedWorker = self._idle.get()
+        try:
+            yield worker
+        finally:
+            self._idle.put(worker)
+
+    def close(self) -> None:
+        for worker in self._workers:
+            worker.close()
+
+    def __enter__(self) -> 'AptedWorkerPool':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+# Tree edit distance engines: the html-apted jar, or the in-process one (ted.py)
+TED_ENGINES = ('apted', 'python')
 
+def get_apted_mappings(first: Tree, second: Tree, worker: AptedWorker = None,
+                       deadline: float = None, max_heap: int = None) -> TreeMappings:
+    """Returns the mappings of html-apted between the two trees, which are
+    streamed to it through pipes (no temporary files), with hashed texts.
+    Runs a new JVM (with at most max_heap bytes of heap, if given), unless
+    a (long-lived) worker is given. Raises TedBudgetExceeded if the JVM runs
+    out of heap or is still running at the deadline (time.monotonic())."""
+    if worker is not None:
+        return worker.run(first, second, deadline)
+    first_read, first_write = os.pipe()
+    second_read, second_write = os.pipe()
+    jar: str = os.path.join(_PARENT_DIR, apted_path)
+    heap: List[str] = [f'-Xmx{max(max_heap >> 20, 16)}m'] if max_heap is not None else []
+    try:
+        process = Popen(['java'] + heap + ['-jar', jar, '-f', f'/dev/fd/{first_read}', f'/dev/fd/{second_read}', '-m'],
+                        stdout=PIPE, stderr=STDOUT, pass_fds=(first_read, second_read))
+    except OSError:
+        os.close(first_write)
+        os.close(second_write)
+        raise
+    finally:
+        os.close(first_read)
+        os.close(second_read)
+    feeders: List[Thread] = _start_feeding(
+        (first_write, compatible_repr_string(first.root, hash_texts=True).encode('utf-8')),
+        (second_write, compatible_repr_string(second.root, hash_texts=True).encode('utf-8')))
+    killer: Timer = _kill_at(process, deadline)
+    with process:
+        try:
+            mappings: TreeMappings = TreeMappings.parse(process.stdout, len(first), len(second))
+        except ValueError as parse_error:
+            output: str = str(parse_error) + process.stdout.read().decode('utf-8', 'replace')
+            if process.wait() != 0:
+                if _out_of_budget(deadline, output):
+                    raise TedBudgetExceeded('html-apted is out of budget') from parse_error
+                raise CalledProcessError(process.returncode, process.args) from parse_error
+            raise
+        finally:
+            if killer is not None:
+                killer.cancel()
+    for feeder in feeders:
+        feeder.join()
+    return mappings
+
+def get_ted_mappings(first: Tree, second: Tree, engine: str = 'apted',
+                     worker: AptedWorker = None, attributes: bool = False,
+                     deadline: float = None, memory_budget: int = None) -> TreeMappings:
+    """Mappings between the two trees computed by the given engine
+    (one of TED_ENGINES), as pairs of post ids (0 for insert/delete).
+    Only the python engine supports attribute costs (see TreeEditDistance).
+    Raises TedBudgetExceeded if the predicted cost of the tree edit distance
+    (see ted_budget) does not fit in the budgets, i.e. a deadline
+    (time.monotonic()) and a number of bytes, or if it exceeds them."""
+    if engine not in TED_ENGINES:
+        raise ValueError(f'Unknown TED engine: {engine}')
+    if attributes and engine != 'python':
+        raise ValueError(f'Attribute costs are not supported by the {engine} engine')
+    if deadline is not None or memory_budget is not None:
+        check_ted_budget(first, second, engine, deadline, memory_budget)
+    if engine == 'python':
+        return TreeEditDistance(first, second, attributes, deadline).mappings()
+    return get_apted_mappings(first, second, worker, deadline, memory_budget)
+
+def edits_from_mappings(first: Tree, second: Tree,
+                        mappings_list: Iterable[Tuple[int, int]]) -> EditSequence:
     all_edits: List[Edit] = []
     for mapping in mappings_list:
         source = first.find_node_by_post_id(mapping[0])
@@ -78,47 +335,305 @@ def get_apted_edits(first: Tree, second: Tree, out_path: str) -> EditSequence:
     result: EditSequence = EditSequence(all_edits)
     return result
 
+# Number of TED runs on collapsed trees, releasing split anchors in between
+MAX_ANCHOR_ROUNDS: int = 3
 
-if __name__ == '__main__':
+def get_anchored_mappings(first: Tree, second: Tree, engine: str = 'apted',
+                          worker: AptedWorker = None, attributes: bool = False,
+                          deadline: float = None, memory_budget: int = None) -> List[Tuple[int, int]]:
+    """Like get_ted_mappings, but identical subtrees which are unique in both
+    trees are collapsed beforehand (see SubtreeAnchors), which makes the TED
+    input much smaller when most of the page has not changed."""
+    anchors = SubtreeAnchors(first, second)
+    collapsed_mappings: TreeMappings = get_ted_mappings(
+        anchors.first_collapsed, anchors.second_collapsed, engine, worker, attributes,
+        deadline, memory_budget)
+    for _ in range(MAX_ANCHOR_ROUNDS - 1):
+        if not anchors.release_split_anchors(collapsed_mappings):
+            break
+        collapsed_mappings = get_ted_mappings(
+            anchors.first_collapsed, anchors.second_collapsed, engine, worker, attributes,
+            deadline, memory_budget)
+    return anchors.expand_mappings(collapsed_mappings)
+
+# Regions being matched by get_region_mappings, inherited by the forked
+# processes of its pool (rather than pickled): key -> (PinnedRegions, arguments)
+_PENDING_REGIONS: Dict[int, Tuple[PinnedRegions, Tuple]] = {}
 
-    if len(sys.argv) < 4:
-        sys.exit('Usage: python3 treematching/run_apted.py first_html second_html out_path [html|json]')
+def _region_mappings(key: int, name: str) -> TreeMappings:
+    regions, arguments = _PENDING_REGIONS[key]
+    first, second = regions.regions[name]
+    mappings: TreeMappings = TreeMappings()
+    for first_id, second_id in get_anchored_mappings(first, second, *arguments):
+        mappings.append(first_id, second_id)
+    return mappings
 
-    first_path = sys.argv[1]
-    second_path = sys.argv[2]
-    out_path = sys.argv[3]
-    goal = "html" # by default
+def get_region_mappings(first: Tree, second: Tree, processes: int, engine: str = 'apted',
+                        attributes: bool = False, deadline: float = None,
+                        memory_budget: int = None) -> TreeMappings:
+    """Like get_anchored_mappings, but the trees are decomposed into pinned
+    regions (see PinnedRegions), which are matched concurrently by the given
+    number of processes (threads for the jar, which runs in its own process
+    anyway), largest first. The memory budget is shared by the processes."""
+    regions = PinnedRegions(first, second)
+    if memory_budget is not None:
+        memory_budget //= processes
+    key: int = id(regions)
+    _PENDING_REGIONS[key] = (regions, (engine, None, attributes, deadline, memory_budget))
+    if processes == 1:
+        executor: Executor = None
+    elif engine == 'python':
+        executor = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('fork'))
+    else:
+        executor = ThreadPoolExecutor(processes)
+    region_mappings: Dict[str, TreeMappings] = {}
+    futures: Dict[str, Future] = {}
+    try:
+        pending: List[str] = list(regions.regions)
+        for round_number in range(1, MAX_ANCHOR_ROUNDS + 1):
+            pending.sort(key=lambda name: -len(regions.regions[name][0]) * len(regions.regions[name][1]))
+            if executor is None:
+                region_mappings.update((name, _region_mappings(key, name)) for name in pending)
+            else:
+                futures = {name: executor.submit(_region_mappings, key, name)
+                           for name in pending}
+                region_mappings.update((name, future.result()) for name, future in futures.items())
+            if round_number == MAX_ANCHOR_ROUNDS:
+                break
+            pending = regions.release_split_pins({name: region_mappings[name] for name in pending})
+            if not pending:
+                break
+            for name in list(region_mappings):
+                if name not in regions.regions:
+                    del region_mappings[name]
+            if isinstance(executor, ProcessPoolExecutor):
+                # the forked processes would not see the regions collapsed again
+                executor.shutdown()
+                executor = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('fork'))
+    finally:
+        if executor is not None:
+            # shutdown(cancel_futures=True) needs python 3.9
+            for future in futures.values():
+                future.cancel()
+            executor.shutdown(wait=True)
+        del _PENDING_REGIONS[key]
+    return regions.stitch(region_mappings)
 
-    if len(sys.argv) == 5:
-        if sys.argv[4] == "html" or sys.argv[4] == "json":
-            goal = sys.argv[4]
+def get_apted_edits(first: Tree, second: Tree,
+                    anchored: bool = True, engine: str = 'apted',
+                    worker: AptedWorker = None, attributes: bool = False,
+                    time_budget: float = None, memory_budget: int = None,
+                    processes: int = None) -> EditSequence:
+    """Runs the tree edit distance between the two trees and returns the edits.
+    If anchored, identical subtrees which are unique in both trees are
+    collapsed beforehand (see get_anchored_mappings). The jar runs in the
+    given worker, if any (see AptedWorker). See get_ted_mappings for the
+    other arguments.
+    Given a number of processes, the trees are decomposed into regions
+    delimited by pinned elements (head, body, unique ids...) which are
+    matched concurrently (see get_region_mappings), always anchored: faster
+    on a large page, for a possibly larger patch.
+    The matching can be given a time budget (seconds) and a memory budget
+    (bytes). If the tree edit distance would exceed them (or runs out of JVM
+    heap), the trees are matched by a TopDownMatcher instead, which is
+    linear but gives more edits. The algorithm used is recorded in the
+    algorithm attribute of the result (the engine, or 'top-down')."""
+    if processes is not None and worker is not None:
+        raise ValueError('Pinned regions are matched by their own processes, not by a worker')
+    deadline: float = time.monotonic() + time_budget if time_budget is not None else None
+    algorithm: str = engine
+    try:
+        if processes is not None:
+            mappings_list: Iterable[Tuple[int, int]] = get_region_mappings(
+                first, second, processes, engine, attributes, deadline, memory_budget)
+        elif anchored:
+            mappings_list = get_anchored_mappings(first, second, engine, worker, attributes,
+                                                  deadline, memory_budget)
         else:
-            sys.exit('The 4th (optional) argument can only be "html" or "json"!')
+            mappings_list = get_ted_mappings(first, second, engine, worker, attributes,
+                                             deadline, memory_budget)
+    except TedBudgetExceeded as exceeded:
+        logger.warning(f'{first.name}: {exceeded}, falling back to top-down matching')
+        algorithm = 'top-down'
+        mappings_list = TopDownMatcher(first, second, attributes).mappings()
+    edits: EditSequence = edits_from_mappings(first, second, mappings_list)
+    edits.algorithm = algorithm
+    logger.info(f'{first.name}: matched with {algorithm}, '
+                f'{len(edits.edits)} edits of total cost {edits.total_cost}')
+    return edits
 
-    with open(first_path, 'r') as first_file_handle, \
-        open(second_path, 'r') as second_file_handle:
+def get_gumtree_edits(first: Tree, second: Tree, attributes: bool = False) -> EditSequence:
+    """Like get_apted_edits, but matches the trees with a GumTreeMatcher:
+    much faster on large pages, for a somewhat larger patch."""
+    mappings: TreeMappings = GumTreeMatcher(first, second, attributes=attributes).mappings()
+    edits: EditSequence = edits_from_mappings(first, second, mappings)
+    edits.algorithm = 'gumtree'
+    logger.info(f'{first.name}: matched with gumtree, '
+                f'{len(edits.edits)} edits of total cost {edits.total_cost}')
+    return edits
 
-        first_soup = HTMLStrip.from_file(first_file_handle)
-        second_soup = HTMLStrip.from_file(second_file_handle)
+def _printed_label(node: Node) -> str:
+    # texts are named 'text', like SVG text elements
+    return node.name if isinstance(node, Element) else '#text'
 
-        first_tree = Tree.from_soup_object(first_file_handle.name, first_soup.original_soup, 1)
-        second_tree = Tree.from_soup_object(second_file_handle.name, second_soup.original_soup, 2)
+def _printed_children(element: Element) -> List[List[Node]]:
+    """Children of an element of the common tree, as they are once printed
+    and parsed again: emptied texts disappear and adjacent texts are joined.
+    Each item is a run of texts to be joined, or a single element."""
+    runs: List[List[Node]] = []
+    for child in element.children:
+        if isinstance(child, Text):
+            if not child.content:
+                continue
+            if runs and isinstance(runs[-1][0], Text):
+                runs[-1].append(child)
+                continue
+        runs.append([child])
+    return runs
+
+def get_template_and_patch(first: Tree, second: Tree, edits: EditSequence,
+                           parser: str = 'html5lib') -> Tuple[str, Tree, EditSequence]:
+    """Given the edits from the first to the second version of a page (see
+    get_apted_edits), returns the static template (common tree, see
+    EditSequence.generate_common_tree) as HTML, its tree, and the edits from
+    the template to the second page, for generate_json_update: the same
+    as matching the template with the second page again, but derived from
+    the given edits instead. The edits are consumed.
+    Every node of the common tree comes from a Merge of the first page, and
+    keeps its partner. Since printing the common tree and parsing it again
+    is not exactly the identity, the template is parsed (in memory) like
+    browsers do, and both trees are walked in lockstep: the children of an
+    element of the template are those of the common tree, without emptied
+    texts, and with adjacent texts joined (a joined text keeps the partner
+    of its first part). Where the parser changed the structure, children
+    are paired in order by name (see pairs_by_key), the rest being deleted
+    and inserted by the patch."""
+    partners: Dict[int, Node] = {edit.source.post_id: edit.target for edit in edits.edits
+                                 if isinstance(edit, Merge)}
+    common: Tree = edits.generate_common_tree(first)
+    # post ids of the common tree are still those of the first page
+    common_partners: Dict[int, Node] = {id(node): partners[node.post_id]
+                                        for node in postorder(common.root)}
+    html_buffer = io.StringIO()
+    common.root.print_html(html_buffer)
+    template_html: str = html_buffer.getvalue()
+    # post ids in document order again (see ordered_pairs)
+    common = Tree(common.name, common.root, common.tindex)
+    template = Tree(first.name, parse_html(io.StringIO(template_html), parser), first.tindex)
+
+    template_partners: List[int] = [0] * (len(template) + 1)
+    stack: List[Tuple[Node, Node]] = []
+    if _printed_label(template.root) == _printed_label(common.root):
+        stack.append((template.root, common.root))
+    while stack:
+        template_node, common_node = stack.pop()
+        template_partners[template_node.post_id] = common_partners[id(common_node)].post_id
+        if not isinstance(template_node, Element):
+            continue
+        firsts: List[Node] = [run[0] for run in _printed_children(common_node)]
+        if list(map(_printed_label, template_node.children)) == list(map(_printed_label, firsts)):
+            stack.extend(zip(template_node.children, firsts))
+        else:
+            stack.extend(ordered_pairs(pairs_by_key(template_node.children, firsts, _printed_label)))
 
-        # Generating the input format needed
-        compatible_repr(first_tree, out_path+'_1.tree')
-        compatible_repr(second_tree, out_path+'_2.tree')
+    mappings = TreeMappings()
+    matched: bytearray = bytearray(len(second) + 1)
+    for template_id in range(1, len(template) + 1):
+        mappings.append(template_id, template_partners[template_id])
+        matched[template_partners[template_id]] = 1
+    for second_id in range(1, len(second) + 1):
+        if not matched[second_id]:
+            mappings.append(0, second_id)
+    patch_edits: EditSequence = edits_from_mappings(template, second, mappings)
+    patch_edits.algorithm = edits.algorithm
+    return template_html, template, patch_edits
 
-        all_edits: EditSequence = get_apted_edits(first_tree, second_tree, out_path)
+# Matchers of the command line: get_apted_edits (exact) or get_gumtree_edits
+MATCHERS = ('ted', 'gumtree')
+
+
+if __name__ == '__main__':
+
+    arg_parser = argparse.ArgumentParser(
+        usage = 'python3 treematching/run_apted.py first_html second_html out_path [html|json|both] [--patch-path PATH] [--compact] [--parser NAME] [--matcher NAME] [--no-anchors] [--engine NAME] [--attribute-costs] [--processes N] [--time-budget SECONDS] [--memory-budget MIB]')
+    arg_parser.add_argument('first_html')
+    arg_parser.add_argument('second_html')
+    arg_parser.add_argument('out_path')
+    arg_parser.add_argument('goal', nargs = '?', default = 'html', choices = ['html', 'json', 'both'])
+    arg_parser.add_argument('--patch-path',
+                            help = 'with both, where to write the json patch (default: update.json next to out_path)')
+    arg_parser.add_argument('--compact', action = 'store_true',
+                            help = 'write the json patch in the compact encoding (see compact_patch.py)')
+    arg_parser.add_argument('--parser', default = 'html5lib', choices = PARSER_BACKENDS,
+                            help = 'HTML parser backend (default: html5lib)')
+    arg_parser.add_argument('--matcher', default = 'ted', choices = MATCHERS,
+                            help = 'tree edit distance (default) or the faster gumtree heuristic')
+    arg_parser.add_argument('--no-anchors', action = 'store_true',
+                            help = 'run TED on the whole trees, without collapsing identical subtrees')
+    arg_parser.add_argument('--engine', default = 'apted', choices = TED_ENGINES,
+                            help = 'tree edit distance engine: the html-apted jar (default) or in-process python')
+    arg_parser.add_argument('--attribute-costs', action = 'store_true',
+                            help = 'with the python engine or gumtree, changed attributes cost 1 like changed texts')
+    arg_parser.add_argument('--processes', type = int,
+                            help = 'match regions delimited by head, body and unique ids with N processes')
+    arg_parser.add_argument('--time-budget', type = float,
+                            help = 'seconds for the tree edit distance, before falling back to top-down matching')
+    arg_parser.add_argument('--memory-budget', type = int,
+                            help = 'MiB for the tree edit distance, before falling back to top-down matching')
+    args = arg_parser.parse_args()
+    if args.patch_path is not None and args.goal != 'both':
+        arg_parser.error('--patch-path requires the both goal')
+    if args.compact and args.goal == 'html':
+        arg_parser.error('--compact requires the json or both goal')
+    if args.attribute_costs and args.engine != 'python' and args.matcher == 'ted':
+        arg_parser.error('--attribute-costs requires --engine python or --matcher gumtree')
+    if args.processes is not None and (args.processes < 1 or args.no_anchors or args.matcher != 'ted'):
+        arg_parser.error('--processes requires a positive number, anchors and --matcher ted')
+
+    first_path = args.first_html
+    second_path = args.second_html
+    out_path = args.out_path
+    goal = args.goal
+
+    with open(first_path, 'r') as first_file_handle, \
+        open(second_path, 'r') as second_file_handle:
+
+        first_tree = Tree.from_file(first_file_handle, 1, args.parser)
+        second_tree = Tree.from_file(second_file_handle, 2, args.parser)
+
+        memory_budget: int = args.memory_budget << 20 if args.memory_budget is not None else None
+        if args.matcher == 'gumtree':
+            all_edits: EditSequence = get_gumtree_edits(first_tree, second_tree,
+                                                        attributes = args.attribute_costs)
+        else:
+            all_edits = get_apted_edits(first_tree, second_tree,
+                                        anchored = not args.no_anchors,
+                                        engine = args.engine,
+                                        attributes = args.attribute_costs,
+                                        processes = args.processes,
+                                        time_budget = args.time_budget,
+                                        memory_budget = memory_budget)
+        summary: str = f'{all_edits.algorithm}: {len(all_edits.edits)} edits, cost {all_edits.total_cost}'
         if goal == 'html':
             common: Tree = all_edits.generate_common_tree(first_tree)
             common.print_html_in_file(out_path)
         else:
+            if goal == 'both':
+                # the template is out_path, patched like in json mode
+                template_html, first_tree, all_edits = get_template_and_patch(
+                    first_tree, second_tree, all_edits, args.parser)
+                with open(out_path, 'w') as template_file:
+                    template_file.write(template_html)
+                first_path = out_path
+                out_path = args.patch_path or os.path.join(os.path.dirname(out_path), 'update.json')
             json_out: Dict = all_edits.generate_json_update(first_tree)
             with open(out_path, 'w') as outfile:
-                json.dump(json_out, outfile)
+                dump_patch(json_out, outfile, args.compact)
+            summary += f', patch {os.path.getsize(out_path)} bytes'
             current_dir: str = os.path.dirname(os.path.abspath(__file__))
             patcher_path: str = os.path.join(current_dir, patcher_path)
             # inserts the patcher in place in the common html tree.
             insert_patchers(first_tree, patcher_path)
             first_tree.print_html_in_file(first_path[:-5]+'_patched.html')
+        print(summary, file = sys.stderr)
 
@@ -0,0 +1,200 @@
+# MIT License
+
+# Copyright (c) 2019 Shaghayegh Mardani
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import logging
+from typing import List, Tuple
+
+from node import Element
+from tree import Tree
+from traversal import postorder
+
+logger = logging.getLogger(__name__)
+
+def path_str(path: Tuple[int, ...]) -> str:
+    """Same format as str(NodeID)."""
+    return '[' + ','.join(map(str, path)) + ']'
+
+class ShadowNode:
+    """A node of a ShadowTree: only its name and position are kept.
+    Children of an element are stored as a gap buffer: left holds the
+    children before the gap in order, right holds the ones after the gap in
+    reverse order (its end faces the gap). A child knows its side and its
+    position in that list, which does not change when children are inserted
+    or removed at the gap, hence its index is computed in O(1).
+    Texts have no children (left and right are None).
+    """
+    __slots__ = ('name', 'parent', 'left', 'right', 'in_left', 'position')
+
+    def __init__(self, name: str, is_element: bool):
+        self.name: str = name
+        self.parent: 'ShadowNode' = None
+        self.left: List['ShadowNode'] = [] if is_element else None
+        self.right: List['ShadowNode'] = [] if is_element else None
+        self.in_left: bool = True
+        self.position: int = 0
+
+    def __str__(self):
+        return f'<{self.name}>'
+
+    def child_index(self) -> int:
+        parent: ShadowNode = self.parent
+        if self.in_left:
+            return self.position
+        return len(parent.left) + len(parent.right) - 1 - self.position
+
+    def num_of_children(self) -> int:
+        return len(self.left) + len(self.right)
+
+    def child(self, index: int) -> 'ShadowNode':
+        if index < len(self.left):
+            return self.left[index]
+        right_index: int = len(self.left) + len(self.right) - 1 - index
+        if right_index < 0:
+            raise IndexError('child index out of range')
+        return self.right[right_index]
+
+    def children(self) -> List['ShadowNode']:
+        return self.left + self.right[::-1]
+
+    def _move_gap(self, index: int) -> None:
+        """Moves the gap right before the child at the given index. Edits are
+        applied from left to right, so the gap mostly moves forward and the
+        total cost is linear in the number of children."""
+        left: List[ShadowNode] = self.left
+        right: List[ShadowNode] = self.right
+        while len(left) > index:
+            child: ShadowNode = left.pop()
+            child.in_left = False
+            child.position = len(right)
+            right.append(child)
+        while len(left) < index:
+            child = right.pop()
+            child.in_left = True
+            child.position = len(left)
+            left.append(child)
+
+    def _push(self, child: 'ShadowNode') -> None:
+        """Adds child right before the gap."""
+        child.parent = self
+        child.in_left = True
+        child.position = len(self.left)
+        self.left.append(child)
+
+    def insert_child(self, index: int, child: 'ShadowNode') -> None:
+        # same as list.insert: past the end means appending.
+        self._move_gap(min(index, self.num_of_children()))
+        self._push(child)
+
+    def append_child(self, child: 'ShadowNode') -> None:
+        self.insert_child(self.num_of_children(), child)
+
+    def remove_child(self, child: 'ShadowNode') -> int:
+        """Removes child (with its subtree) and returns its former index."""
+        index: int = child.child_index()
+        self._move_gap(index + 1)
+        self.left.pop()
+        child.parent = None
+        return index
+
+class ShadowTree:
+    """Structure-only copy of a source tree, used to simulate what the JS
+    patcher does to the DOM while generating the JSON updates (see
+    EditSequence.generate_json_update), without copying attributes or
+    contents. Nodes are looked up by their post order id in the source tree,
+    or by child path id (cpid) walking down from the root. The cpid of a node
+    is never stored: it is computed on demand from the child indexes of its
+    ancestors, so that an insert/delete does not rewrite its right siblings.
+    """
+    __slots__ = ('root', 'nodes')
+
+    def __init__(self, source: Tree):
+        # One pass in post order: the children of a node are the last
+        # finished nodes when we reach it.
+        self.nodes: List[ShadowNode] = [None]
+        finished: List[ShadowNode] = []
+        for node in postorder(source.root):
+            if isinstance(node, Element):
+                shadow: ShadowNode = ShadowNode(node.name, True)
+                count: int = len(node.children)
+                if count > 0:
+                    children: List[ShadowNode] = finished[-count:]
+                    del finished[-count:]
+                    for child in children:
+                        shadow._push(child)
+            else:
+                shadow = ShadowNode(node.name, False)
+            finished.append(shadow)
+            self.nodes.append(shadow)
+        self.root: ShadowNode = finished[0]
+
+    def find_node_by_post_id(self, post_id: int) -> ShadowNode:
+        return self.nodes[post_id]
+
+    def find_node_by_cpid(self, path: Tuple[int, ...]) -> ShadowNode:
+        current: ShadowNode = None
+        for i, child_index in enumerate(path):
+            if current is None:
+                if child_index != 0:
+                    raise IndexError('child index out of range')
+                current = self.root
+            elif current.left is None: # Text
+                raise ValueError(f'Invalid child_path_id ({path_str(path)})')
+            else:
+                current = current.child(child_index)
+        return current
+
+    @staticmethod
+    def cpid(node: ShadowNode) -> Tuple[int, ...]:
+        """Current child path id of node, as a tuple (see NodeID)."""
+        path: List[int] = []
+        while node.parent is not None:
+            path.append(node.child_index())
+            node = node.parent
+        path.append(0)
+        path.reverse()
+        return tuple(path)
+
+    def delete(self, node: ShadowNode) -> None:
+        """Replaces node by its children (preserving the order)."""
+        parent: ShadowNode = node.parent
+        parent.remove_child(node)
+        if node.left is not None:
+            for child in node.children():
+                parent._push(child)
+
+    def insert(self, parent_cpid: Tuple[int, ...], index: int, name: str,
+               is_element: bool) -> ShadowNode:
+        """Inserts a new (childless) node under the node at parent_cpid."""
+        parent: ShadowNode = self.find_node_by_cpid(parent_cpid)
+        if parent.left is None:
+            raise ValueError(f'Cannot insert into a text node ({path_str(parent_cpid)})')
+        inserted: ShadowNode = ShadowNode(name, is_element)
+        parent.insert_child(index, inserted)
+        return inserted
+
+    def move(self, node: ShadowNode, parent_cpid: Tuple[int, ...]) -> None:
+        """Detaches node and appends it to the children of the node which
+        is at parent_cpid after the removal."""
+        node.parent.remove_child(node)
+        parent: ShadowNode = self.find_node_by_cpid(parent_cpid)
+        if parent.left is None:
+            raise ValueError(f'Cannot move into a text node ({path_str(parent_cpid)})')
+        parent.append_child(node)
@@ -0,0 +1,234 @@
+# MIT License
+
+# Copyright (c) 2019 Shaghayegh Mardani
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import sys, os, json, time, tempfile, argparse, logging
+from typing import Dict, List, Callable, NamedTuple, Optional, Tuple, Union
+
+from tree import Tree
+from node import Node, Element
+from traversal import preorder
+from edit_sequence import EditSequence
+from run_apted import get_apted_edits, get_gumtree_edits, get_template_and_patch, \
+    TED_ENGINES, MATCHERS
+
+class Outputs(NamedTuple):
+    """Outputs of fawkes-example.sh for a pair of pages, and the cost of
+    the edits of the patch."""
+    template: str
+    json_patch: str
+    patch_cost: int
+    # why applying json_patch to the template does not give the second page,
+    # or None if it does
+    patch_error: Optional[str]
+
+class DomNode:
+    """A node of the DOM, as the JS patcher sees it: tag name, attributes
+    and children of an element, or content of a text."""
+    __slots__ = ('name', 'attrs', 'content', 'children')
+
+    def __init__(self, name: str, attrs: Dict[str, Union[List[str], str]] = None, content: str = None):
+        self.name: str = name
+        self.attrs: Dict[str, Union[List[str], str]] = attrs if attrs is not None else {}
+        self.content: str = content
+        self.children: List['DomNode'] = []
+
+def dom_of(root: Node) -> DomNode:
+    """The document of the page, whose only child is (a copy of) root."""
+    document = DomNode('#document')
+    copies: Dict[int, DomNode] = {}
+    for node in preorder(root):
+        if isinstance(node, Element):
+            copy = DomNode(node.name, dict(node.attrs))
+        else:
+            copy = DomNode(node.name, content = node.content)
+        parent_copy: DomNode = copies[id(node.parent)] if node is not root else document
+        parent_copy.children.append(copy)
+        copies[id(node)] = copy
+    return document
+
+def _find(document: DomNode, cpid: List[int]) -> DomNode:
+    current: DomNode = document
+    for child_index in cpid:
+        if child_index >= len(current.children):
+            raise ValueError(f'node {cpid} not found')
+        current = current.children[child_index]
+    return current
+
+def _settable(key: str) -> bool:
+    # not a valid attribute name for setAttribute, the patcher leaves it out
+    return '[' not in key and ']' not in key
+
+def _set_attributes(element: DomNode, attrs: Dict) -> None:
+    for key, value in attrs.items():
+        if key in element.attrs:
+            if value is None:
+                del element.attrs[key]
+            else:
+                element.attrs[key] = value
+        elif _settable(key):
+            element.attrs[key] = 'null' if value is None else value
+
+def _new_node(edit: Dict) -> DomNode:
+    if 'n' not in edit:
+        return DomNode('text', content = edit['c'])
+    element = DomNode(edit['n'])
+    _set_attributes(element, edit['attrs'])
+    children = edit.get('c')
+    if isinstance(children, str):
+        element.children.append(DomNode('text', content = children))
+    elif children:
+        element.children.extend(_new_node(child) for child in children)
+    return element
+
+def apply_json_patch(document: DomNode, patch: Dict) -> None:
+    """Applies the edits of a json patch (see EditSequence.generate_json_update)
+    to the document, one after the other: a Delete replaces the node by its
+    children (as ShadowTree.delete), an Insert adds a new node (and its nested
+    children) at index i of the node at cpid, a Move appends the node to the
+    children of the node at np (looked up before the node is detached, as in
+    the JS patcher), and a Merge sets the attributes of an element (as
+    setElementAttributes of the JS patcher) or the content of a text.
+    Raises ValueError for an edit which cannot be applied."""
+    for position, edit in enumerate(patch['edits']):
+        try:
+            selected: DomNode = _find(document, edit['cpid'])
+            if edit.get('type') == 'Delete':
+                parent: DomNode = _find(document, edit['cpid'][:-1])
+                index: int = edit['cpid'][-1]
+                parent.children[index:index+1] = selected.children
+            elif 'i' in edit: # Insert
+                if edit['i'] > len(selected.children):
+                    raise ValueError(f'insert index {edit["i"]} out of bounds')
+                selected.children.insert(edit['i'], _new_node(edit))
+            elif 'np' in edit: # Move
+                new_parent: DomNode = _find(document, edit['np'])
+                del _find(document, edit['cpid'][:-1]).children[edit['cpid'][-1]]
+                new_parent.children.append(selected)
+            elif selected.content is not None: # Merge of a text
+                if 'c' in edit:
+                    selected.content = edit['c']
+            else: # Merge of an element
+                _set_attributes(selected, edit['attrs'])
+        except (ValueError, KeyError) as error:
+            raise ValueError(f'edit {position} ({json.dumps(edit)[:80]}): {error}')
+
+def _settable_attrs(element: DomNode) -> DomNode:
+    return DomNode(element.name, {key: value for key, value in element.attrs.items() if _settable(key)})
+
+def dom_difference(actual: DomNode, expected: DomNode) -> Optional[str]:
+    """Where the two documents first differ (in pre order), or None if they
+    are the same. Attributes differ if a Merge of the two elements would not
+    be free (see Element.get_merge_changes): e.g. a class which only lost
+    some of its values is the same. Attributes which the patcher cannot set
+    are left out."""
+    stack: List[Tuple[DomNode, DomNode, Tuple[int, ...]]] = [(actual, expected, ())]
+    while stack:
+        left, right, cpid = stack.pop()
+        where: str = f'at [{",".join(map(str, cpid))}]'
+        if left.name != right.name:
+            return f'{where}: {left.name} instead of {right.name}'
+        if left.content != right.content:
+            return f'{where}: text {left.content[:40]!r} instead of {right.content[:40]!r}'
+        if left.content is None and \
+           Element.get_merge_changes(_settable_attrs(left), _settable_attrs(right)):
+            return f'{where}: {left.name} attributes {left.attrs} instead of {right.attrs}'
+        if len(left.children) != len(right.children):
+            return f'{where}: {left.name} has {len(left.children)} children instead of {len(right.children)}'
+        stack.extend(reversed([(left_child, right_child, cpid + (index,)) for index, (left_child, right_child)
+                               in enumerate(zip(left.children, right.children))]))
+    return None
+
+def _load(path: str, tindex: int, parser: str) -> Tree:
+    with open(path, 'r') as html_file:
+        return Tree.from_file(html_file, tindex, parser)
+
+def _patch_outputs(template: Tree, second: Tree, edits: EditSequence, template_html: str) -> Outputs:
+    try:
+        patch: Dict = edits.generate_json_update(template)
+    except Exception as error: # known issues of the patch generation itself
+        return Outputs(template_html, '', edits.total_cost, f'failed: {error!r}')
+    document: DomNode = dom_of(template.root)
+    try:
+        apply_json_patch(document, patch)
+        patch_error: Optional[str] = dom_difference(document, dom_of(second.root))
+    except ValueError as error:
+        patch_error = str(error)
+    return Outputs(template_html, json.dumps(patch), edits.total_cost, patch_error)
+
+def two_pass(first_path: str, second_path: str, match: Callable[[Tree, Tree], EditSequence],
+             parser: str, out_dir: str) -> Outputs:
+    """As fawkes-example.sh does: the template is written, then parsed again
+    and matched with the second page."""
+    first: Tree = _load(first_path, 1, parser)
+    template_path: str = os.path.join(out_dir, 'template.html')
+    match(first, _load(second_path, 2, parser)).generate_common_tree(first).print_html_in_file(template_path)
+    with open(template_path, 'r') as template_file:
+        template_html: str = template_file.read()
+    template: Tree = _load(template_path, 1, parser)
+    second: Tree = _load(second_path, 2, parser)
+    return _patch_outputs(template, second, match(template, second), template_html)
+
+def single_run(first_path: str, second_path: str, match: Callable[[Tree, Tree], EditSequence],
+               parser: str) -> Outputs:
+    """With run_apted.get_template_and_patch, as run_apted.py ... both does."""
+    first: Tree = _load(first_path, 1, parser)
+    second: Tree = _load(second_path, 2, parser)
+    template_html, template, edits = get_template_and_patch(first, second, match(first, second), parser)
+    return _patch_outputs(template, second, edits, template_html)
+
+if __name__ == '__main__':
+
+    arg_parser = argparse.ArgumentParser(
+        usage = 'python3 treematching/single_run_conformance.py [--matcher NAME] [--engine NAME] first_html second_html [first_html second_html ...]')
+    arg_parser.add_argument('pages', nargs = '+')
+    arg_parser.add_argument('--matcher', default = 'ted', choices = MATCHERS)
+    arg_parser.add_argument('--engine', default = 'apted', choices = TED_ENGINES)
+    arg_parser.add_argument('--parser', default = 'html5lib')
+    args = arg_parser.parse_args()
+    if len(args.pages) % 2 != 0:
+        arg_parser.error('expects pairs of pages')
+    logging.disable(logging.WARNING)
+    sys.setrecursionlimit(10000) # deep pages
+
+    if args.matcher == 'gumtree':
+        match: Callable[[Tree, Tree], EditSequence] = get_gumtree_edits
+    else:
+        match = lambda first, second: get_apted_edits(first, second, engine = args.engine)
+    all_valid = True
+    with tempfile.TemporaryDirectory(prefix='single-run-conformance-') as out_dir:
+        for first_path, second_path in zip(args.pages[::2], args.pages[1::2]):
+            start = time.perf_counter()
+            two_pass_outputs: Outputs = two_pass(first_path, second_path, match, args.parser, out_dir)
+            two_pass_time = time.perf_counter() - start
+            start = time.perf_counter()
+            single_run_outputs: Outputs = single_run(first_path, second_path, match, args.parser)
+            single_run_time = time.perf_counter() - start
+            identical: bool = two_pass_outputs[:2] == single_run_outputs[:2]
+            print(f'{first_path} -> {second_path}: two passes {two_pass_time:.2f}s, '
+                  f'single run {single_run_time:.2f}s, patch cost {two_pass_outputs.patch_cost} '
+                  f'vs {single_run_outputs.patch_cost}, {"identical" if identical else "different"} outputs')
+            for name, outputs in (('two passes', two_pass_outputs), ('single run', single_run_outputs)):
+                if outputs.patch_error is None:
+                    print(f'    {name}: OK, the patch gives the second page')
+                else:
+                    all_valid = False
+                    print(f'    {name}: INVALID, {outputs.patch_error}')
+    sys.exit(0 if all_valid else 1)
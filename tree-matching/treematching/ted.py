@@ -0,0 +1,225 @@
+# MIT License
+
+# Copyright (c) 2019 Shaghayegh Mardani
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import time
+from math import inf
+from typing import List, Tuple, Dict
+
+from node import Node
+from tree import Tree
+from tree_mappings import TreeMappings
+from ted_budget import TedBudgetExceeded
+
+class TreeEditDistance:
+    """In-process Zhang and Shasha tree edit distance between two trees,
+    returning the same kind of mappings as html-apted (see run_apted), so
+    that no JVM has to be started per pair of pages.
+    The cost model is the one of html-apted on the input written by
+    compatible_repr: deleting or inserting a node costs 1; an element can only
+    be mapped to an element with the same tag name (cost 0) and a text to
+    a text (cost 0 if the contents are equal, 1 otherwise).
+    If attributes, renaming costs Node.transform_cost instead, i.e. changed
+    attributes cost 1 as well.
+    Nodes are compared by integer label ids, so the cost of a comparison does
+    not depend on the size of text contents (e.g. inline scripts).
+    Works on plain lists indexed by post order id (like Tree.nodes).
+    Given a deadline (time.monotonic()), raises TedBudgetExceeded once
+    it has passed.
+    """
+    def __init__(self, first: Tree, second: Tree, attributes: bool = False,
+                 deadline: float = None):
+        self.first: Tree = first
+        self.deadline: float = deadline
+        self.second: Tree = second
+        self._size1: int = len(first)
+        self._size2: int = len(second)
+        self._leftmost1: List[int] = list(first.leftmost_leaves)
+        self._leftmost2: List[int] = list(second.leftmost_leaves)
+        # Integer ids of (tag) names and of labels, shared by both trees, so
+        # that costs are only integer comparisons. They are interned from the
+        # fingerprints of the trees, computed once per tree. Texts have
+        # the name '#text' (as in compatible_repr), so that they are never
+        # mapped to an element named 'text' (e.g. in SVG).
+        names: Dict[int, int] = {}
+        labels: Dict[Tuple[int, int, int], int] = {}
+        # a node for each label id, to compute rename costs between labels.
+        self._label_nodes: List[Node] = []
+        self._names1, self._labels1 = self._label_ids(first, names, labels, attributes)
+        self._names2, self._labels2 = self._label_ids(second, names, labels, attributes)
+        # (label id, label id) -> rename cost, for labels with the same name
+        self._rename_costs: Dict[Tuple[int, int], float] = {}
+        # tree distances between subtrees, rows of the first tree
+        self._treedist: List[List[float]] = None
+        self._columns: Dict[int, Tuple] = {}
+
+    def _label_ids(self, tree: Tree, names: Dict[int, int], labels: Dict[Tuple[int, int, int], int],
+                   attributes: bool) -> Tuple[List[int], List[int]]:
+        tag_hashes, attr_hashes, text_hashes = tree.fingerprints()
+        if not attributes:
+            attr_hashes = [0] * len(tag_hashes)
+        nodes: List[Node] = tree.nodes
+        label_nodes: List[Node] = self._label_nodes
+        name_ids: List[int] = [-1]
+        label_ids: List[int] = [-1]
+        for i in range(1, len(tag_hashes)):
+            tag: int = tag_hashes[i]
+            name_id: int = names.get(tag)
+            if name_id is None:
+                name_id = names[tag] = len(names)
+            name_ids.append(name_id)
+            label: Tuple[int, int, int] = (tag, attr_hashes[i], text_hashes[i])
+            label_id: int = labels.get(label)
+            if label_id is None:
+                label_id = labels[label] = len(label_nodes)
+                label_nodes.append(nodes[i])
+            label_ids.append(label_id)
+        return name_ids, label_ids
+
+    def _rename_cost(self, first_label: int, second_label: int) -> float:
+        # only called for different labels with the same name
+        cost: float = self._rename_costs.get((first_label, second_label))
+        if cost is None:
+            cost = self._label_nodes[first_label].transform_cost(self._label_nodes[second_label])
+            self._rename_costs[(first_label, second_label)] = cost
+        return cost
+
+    def _second_columns(self, j: int) -> Tuple[List[int], List[int], List[int], List[bool]]:
+        """Per column of the forest distances of j (nodes of its subtree
+        in post order): labels, names, leftmost leaf offsets and whether
+        the node is on the leftmost path of j. Cached per keyroot."""
+        columns = self._columns.get(j)
+        if columns is None:
+            lj: int = self._leftmost2[j]
+            offsets: List[int] = [leaf - lj for leaf in self._leftmost2[lj:j+1]]
+            columns = (self._labels2[lj:j+1], self._names2[lj:j+1],
+                       offsets, [offset == 0 for offset in offsets])
+            self._columns[j] = columns
+        return columns
+
+    def _forest_distance(self, i: int, j: int, fill: bool) -> List[List[float]]:
+        """Distances between the forests of the leftmost paths of i and j:
+        forest[x][y] for the first x nodes (in post order) of the subtree of i
+        and the first y nodes of the subtree of j. If fill, also records the
+        distances of subtrees (on the leftmost paths) in _treedist."""
+        leftmost1: List[int] = self._leftmost1
+        treedist: List[List[float]] = self._treedist
+        labels2, names2, offsets2, on_path2 = self._second_columns(j)
+        li: int = leftmost1[i]
+        lj: int = self._leftmost2[j]
+        cols: int = j - lj + 2
+        forest: List[List[float]] = [list(range(cols))]
+        for x in range(1, i - li + 2):
+            di: int = li + x - 1
+            previous: List[float] = forest[x-1]
+            subtree_row: List[float] = treedist[di]
+            last: float = x
+            row: List[float] = [last]
+            append = row.append
+            if leftmost1[di] != li:
+                # di is not on the leftmost path of i: the subtree of di is
+                # either deleted/inserted or mapped as a whole to a subtree.
+                before1: List[float] = forest[leftmost1[di] - li]
+                for up, offset, subtree in zip(previous[1:], offsets2, subtree_row[lj:j+1]):
+                    distance: float = (up if up < last else last) + 1
+                    matched: float = before1[offset] + subtree
+                    last = matched if matched < distance else distance
+                    append(last)
+            else:
+                label: int = self._labels1[di]
+                name: int = self._names1[di]
+                diagonal: float = previous[0]
+                for y in range(1, cols):
+                    up: float = previous[y]
+                    distance = (up if up < last else last) + 1
+                    if on_path2[y-1]:
+                        if labels2[y-1] == label:
+                            matched = diagonal
+                        elif names2[y-1] == name:
+                            matched = diagonal + self._rename_cost(label, labels2[y-1])
+                        else:
+                            matched = inf
+                        if matched < distance:
+                            distance = matched
+                        if fill:
+                            subtree_row[lj + y - 1] = distance
+                    else:
+                        matched = forest[0][offsets2[y-1]] + subtree_row[lj + y - 1]
+                        if matched < distance:
+                            distance = matched
+                    diagonal = up
+                    last = distance
+                    append(distance)
+            forest.append(row)
+        return forest
+
+    def _check_deadline(self) -> None:
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise TedBudgetExceeded(f'TED of {self._size1} x {self._size2} nodes ran out of time')
+
+    def distance(self) -> float:
+        if self._treedist is None:
+            self._treedist = [[0] * (self._size2 + 1) for _ in range(self._size1 + 1)]
+            keyroots2: List[int] = self.second.LR_keyroots_ids()
+            try:
+                for i in self.first.LR_keyroots_ids():
+                    for j in keyroots2:
+                        self._check_deadline()
+                        self._forest_distance(i, j, True)
+            except TedBudgetExceeded:
+                self._treedist = None # incomplete
+                raise
+        return self._treedist[self._size1][self._size2]
+
+    def mappings(self) -> TreeMappings:
+        """Returns an optimal mapping, in the same format as get_apted_mappings."""
+        result = TreeMappings()
+        result.distance = self.distance()
+        leftmost1: List[int] = self._leftmost1
+        leftmost2: List[int] = self._leftmost2
+        stack: List[Tuple[int, int]] = [(self._size1, self._size2)]
+        while stack:
+            i, j = stack.pop()
+            self._check_deadline()
+            forest: List[List[float]] = self._forest_distance(i, j, False)
+            li: int = leftmost1[i]
+            lj: int = leftmost2[j]
+            x: int = i - li + 1
+            y: int = j - lj + 1
+            while x > 0 or y > 0:
+                di: int = li + x - 1
+                dj: int = lj + y - 1
+                if x > 0 and forest[x][y] == forest[x-1][y] + 1:
+                    result.append(di, 0)
+                    x -= 1
+                elif y > 0 and forest[x][y] == forest[x][y-1] + 1:
+                    result.append(0, dj)
+                    y -= 1
+                elif leftmost1[di] == li and leftmost2[dj] == lj:
+                    result.append(di, dj)
+                    x -= 1
+                    y -= 1
+                else:
+                    # the subtrees of di and dj are mapped to each other
+                    stack.append((di, dj))
+                    x = leftmost1[di] - li
+                    y = leftmost2[dj] - lj
+        result.reverse()
+        return result
@@ -0,0 +1,73 @@
+# MIT License
+
+# Copyright (c) 2019 Shaghayegh Mardani
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import time
+from typing import Dict, NamedTuple
+
+from tree import Tree
+
+class TedBudgetExceeded(Exception):
+    """The tree edit distance would exceed, or has exceeded, its time or
+    memory budget (including the JVM running out of heap)."""
+
+class TedCost(NamedTuple):
+    cells: int # of the forest distances of Zhang and Shasha
+    seconds: float
+    memory: int # bytes
+
+# Rough per engine costs, measured with benchmark_ted.py: seconds per forest
+# distance cell, and bytes per pair of nodes (the tree distances). APTED
+# computes at most as many cells as Zhang and Shasha, usually far fewer.
+SECONDS_PER_CELL: Dict[str, float] = {'apted': 2e-8, 'python': 4e-7}
+BYTES_PER_NODE_PAIR: Dict[str, int] = {'apted': 16, 'python': 48}
+# JVM startup, unless a worker is used
+JVM_STARTUP_SECONDS: float = 0.5
+
+def keyroot_cells(tree: Tree) -> int:
+    """Sum of the subtree sizes of the LR_keyroots of the tree. The number of
+    cells computed by Zhang and Shasha is the product for both trees."""
+    leftmost = tree.leftmost_leaves
+    return sum(keyroot - leftmost[keyroot] + 1 for keyroot in tree.LR_keyroots_ids())
+
+def estimate_ted_cost(first: Tree, second: Tree, engine: str) -> TedCost:
+    """Predicts the time and memory of the tree edit distance between the
+    two trees with the given engine (see run_apted.TED_ENGINES), from their
+    numbers of nodes and their keyroots."""
+    cells: int = keyroot_cells(first) * keyroot_cells(second)
+    seconds: float = cells * SECONDS_PER_CELL[engine]
+    if engine == 'apted':
+        seconds += JVM_STARTUP_SECONDS
+    memory: int = (len(first) + 1) * (len(second) + 1) * BYTES_PER_NODE_PAIR[engine]
+    return TedCost(cells, seconds, memory)
+
+def check_ted_budget(first: Tree, second: Tree, engine: str,
+                     deadline: float = None, memory_budget: int = None) -> TedCost:
+    """Raises TedBudgetExceeded if the estimated cost does not fit in the
+    budgets: a deadline (time.monotonic()) and a number of bytes."""
+    cost: TedCost = estimate_ted_cost(first, second, engine)
+    if deadline is not None and time.monotonic() + cost.seconds > deadline:
+        raise TedBudgetExceeded(f'TED of {len(first)} x {len(second)} nodes ({cost.cells} cells) '
+                                f'would take about {cost.seconds:.1f} s')
+    if memory_budget is not None and cost.memory > memory_budget:
+        raise TedBudgetExceeded(f'TED of {len(first)} x {len(second)} nodes '
+                                f'would need about {cost.memory / 2**20:.0f} MiB')
+    return cost
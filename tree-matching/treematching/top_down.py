@@ -0,0 +1,125 @@
+# MIT License
+
+# Copyright (c) 2019 Shaghayegh Mardani
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from collections import defaultdict
+from typing import List, Tuple, Dict
+
+from node import Node, Element
+from tree import Tree
+from traversal import postorder
+from anchoring import ordered_pairs
+from tree_mappings import TreeMappings
+
+def pairs_by_key(first_nodes: List[Node], second_nodes: List[Node], key) -> List[Tuple[Node, Node]]:
+    """Pairs the k-th node of first_nodes having some key (a function of
+    a node) with the k-th node of second_nodes having the same key, if any."""
+    by_key: Dict = defaultdict(list)
+    for node in reversed(second_nodes):
+        by_key[key(node)].append(node)
+    pairs: List[Tuple[Node, Node]] = []
+    for node in first_nodes:
+        same_key: List[Node] = by_key.get(key(node))
+        if same_key:
+            pairs.append((node, same_key.pop()))
+    return pairs
+
+class TopDownMatcher:
+    """Greedy top-down matching of two trees, in O(n log n) time and O(n)
+    memory, used when the tree edit distance would exceed its budgets (see
+    ted_budget). Starting from the roots, the children of each pair of
+    matched elements are matched in two passes:
+    1) identical subtrees (same subtree hash), matched node by node;
+    2) in each gap between them, the remaining children with the same name
+    (elements, which are then matched recursively) or texts.
+    Crossing candidates are dropped (see ordered_pairs) and every matched
+    node has a matched parent, so the result is a valid tree mapping, in the
+    same format as the tree edit distance. It is usually larger though: e.g.
+    a wrapped or unwrapped subtree is deleted and inserted as a whole.
+    The costs (reported as the distance) are those of TreeEditDistance.
+    """
+    def __init__(self, first: Tree, second: Tree, attributes: bool = False):
+        self.first: Tree = first
+        self.second: Tree = second
+        self.attributes: bool = attributes
+        # post id of the second tree matched with each node of the first tree
+        self._partners: List[int] = [0] * (len(first) + 1)
+        self._distance: float = 0
+
+    def _match(self, source: Node, target: Node) -> None:
+        self._partners[source.post_id] = target.post_id
+        if isinstance(source, Element):
+            if self.attributes:
+                self._distance += source.transform_cost(target)
+        elif source.content != target.content:
+            self._distance += 1
+
+    def _match_children(self, source: Element, target: Element) -> List[Tuple[Node, Node]]:
+        """Matches the children of source and target, and returns the
+        pairs of elements to descend into."""
+        identical: List[Tuple[Node, Node]] = ordered_pairs(
+            pairs_by_key(source.children, target.children, lambda node: node.subtree_hash()))
+        for first_node, second_node in identical:
+            for first_child, second_child in zip(postorder(first_node), postorder(second_node)):
+                self._match(first_child, second_child)
+        matched: List[Tuple[Node, Node]] = []
+        # gaps between identical subtrees, with sentinels at both ends
+        bounds: List[Tuple[int, int]] = [(-1, -1)] + \
+            [(first_node.id.last_child_index(), second_node.id.last_child_index())
+             for first_node, second_node in identical] + \
+            [(len(source.children), len(target.children))]
+        for (first_start, second_start), (first_end, second_end) in zip(bounds, bounds[1:]):
+            similar: List[Tuple[Node, Node]] = ordered_pairs(pairs_by_key(
+                source.children[first_start+1:first_end], target.children[second_start+1:second_end],
+                lambda node: node.name if isinstance(node, Element) else None))
+            for first_node, second_node in similar:
+                self._match(first_node, second_node)
+                if isinstance(first_node, Element):
+                    matched.append((first_node, second_node))
+        return matched
+
+    def mappings(self) -> TreeMappings:
+        """Returns the mappings, including deleted and inserted nodes, and
+        their cost as distance."""
+        first_root: Node = self.first.root
+        second_root: Node = self.second.root
+        if isinstance(first_root, Element) == isinstance(second_root, Element) and \
+           first_root.name == second_root.name:
+            self._match(first_root, second_root)
+            stack: List[Tuple[Node, Node]] = [(first_root, second_root)] \
+                if isinstance(first_root, Element) else []
+            while stack:
+                stack.extend(self._match_children(*stack.pop()))
+        result = TreeMappings()
+        matched: bytearray = bytearray(len(self.second) + 1)
+        for first_id in range(1, len(self.first) + 1):
+            second_id: int = self._partners[first_id]
+            result.append(first_id, second_id)
+            if second_id:
+                matched[second_id] = 1
+            else:
+                self._distance += 1
+        for second_id in range(1, len(self.second) + 1):
+            if not matched[second_id]:
+                result.append(0, second_id)
+                self._distance += 1
+        result.distance = self._distance
+        return result
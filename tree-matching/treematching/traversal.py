@@ -0,0 +1,72 @@
+# MIT License
+
+# Copyright (c) 2019 Shaghayegh Mardani
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from typing import Callable, Iterator, Sequence, Tuple
+
+# Shared iterative traversals used by all the tree walks, so that deeply
+# nested pages do not hit the recursion limit. They work on any tree given
+# a function returning the (ordered) children of a node: by default the
+# children of an Element (or none for a Text), but also e.g. soup tags.
+
+def node_children(node) -> Sequence:
+    """Children of the given Node (a Text has none)."""
+    return getattr(node, 'children', ())
+
+def preorder(root, get_children: Callable = node_children) -> Iterator:
+    """Yields root and all of its descendants in pre order.
+    Children of a node are looked up right after the node is yielded.
+    """
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        children = get_children(node)
+        if children:
+            stack.extend(reversed(children))
+
+def postorder(root, get_children: Callable = node_children) -> Iterator:
+    """Yields all of the descendants of root and then root in post order."""
+    stack = [(root, iter(get_children(root)))]
+    while stack:
+        node, children = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            yield node
+        else:
+            stack.append((child, iter(get_children(child))))
+
+def walk(root, get_children: Callable = node_children) -> Iterator[Tuple[object, bool]]:
+    """Yields (node, False) when entering a node and (node, True) when leaving
+    it, i.e. after its whole subtree has been visited. Used by walks which
+    write something both before and after the children (e.g. HTML tags).
+    """
+    yield root, False
+    stack = [(root, iter(get_children(root)))]
+    while stack:
+        node, children = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            yield node, True
+        else:
+            yield child, False
+            stack.append((child, iter(get_children(child))))
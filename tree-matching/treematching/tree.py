@@ -22,12 +22,15 @@
 
 import sys, logging
 import copy
+from array import array
 from collections import deque, Counter
-from typing import List, Dict, Union
+from typing import List, Tuple, Union
 
 from node_path_ids import NodeID, PathID
 from node import Node, Element
 from path import Path
+from traversal import walk
+from tree_builder import parse_html
 from metrics import find_counter_intersection
 
 logging.basicConfig(stream=sys.stderr, level=logging.DEBUG)
@@ -48,9 +51,11 @@ class Tree:
         self.root.set_post_order_id(next_index = 1, nodes = self.nodes)
 
         # Needed for Zhang and Shasha TED algorithm.
-        self.leftmost_leaves: List[Node] = None
+        # leftmost_leaves[i] is the post_id of the leftmost leaf of node i.
+        self.leftmost_leaves: array = None
         self._cache_leftmost_leaves()
-
+        # (tag hashes, attrs hashes, text hashes), see fingerprints
+        self._fingerprints: Tuple[array, array, array] = None
 
     @classmethod
     def from_soup_object(cls, file_name, soup_obj, tindex = 0):
@@ -58,6 +63,14 @@ class Tree:
         root: Element = Node.from_soup_tag(soup_obj.contents[0], 0)
         return cls(file_name, root, tindex) # calls Tree constructor
 
+    @classmethod
+    def from_file(cls, html_file, tindex = 0, parser = 'html5lib'):
+        """Builds the tree straight from the parser events (same result as
+        from_soup_object on HTMLStrip.from_file, without the soup).
+        parser is one of tree_builder.PARSER_BACKENDS."""
+        root: Element = parse_html(html_file, parser)
+        return cls(html_file.name, root, tindex)
+
     def __len__(self) -> int:
         return self.root.post_id
 
@@ -67,13 +80,43 @@ class Tree:
         return tree_copy
 
     def _cache_leftmost_leaves(self) -> None:
-        self.leftmost_leaves = [None for i in range(len(self)+1)]
-        queue: List[Node] = [self.root]
-        while queue:
-            current: Node = queue.pop(0)
-            self.leftmost_leaves[current.post_id] = current.leftmost_leaf()
-            if isinstance(current, Element):
-                queue.extend(current.children)
+        """One pass over the nodes in post order: children precede their
+        parent, hence the leftmost leaf of a node is already known by the
+        time we reach it."""
+        self.leftmost_leaves = array('i', [0])
+        for i in range(1, len(self.nodes)):
+            node: Node = self.nodes[i]
+            if isinstance(node, Element) and len(node.children) > 0:
+                self.leftmost_leaves.append(self.leftmost_leaves[node.children[0].post_id])
+            else:
+                self.leftmost_leaves.append(i) # a leaf is its own leftmost leaf
+
+    def fingerprints(self) -> Tuple[array, array, array]:
+        """Returns (tag hashes, attrs hashes, text hashes) indexed by post id,
+        computed once per tree. They can be compared between two trees: nodes
+        with equal fingerprints have the same name, the same attributes
+        (values compared as lists, order of attrs ignored) and the same text
+        content. Texts have the tag hash of '#text' (so they never equal an
+        element named 'text') and elements a text hash of 0.
+        """
+        if self._fingerprints is None:
+            tag_hashes: array = array('q', [0])
+            attr_hashes: array = array('q', [0])
+            text_hashes: array = array('q', [0])
+            text_tag: int = hash('#text')
+            for node in self.nodes[1:]:
+                if isinstance(node, Element):
+                    tag_hashes.append(hash(node.name))
+                    attr_hashes.append(hash(frozenset(
+                        (key, value if isinstance(value, str) else tuple(value))
+                        for key, value in node.attrs.items())))
+                    text_hashes.append(0)
+                else:
+                    tag_hashes.append(text_tag)
+                    attr_hashes.append(0)
+                    text_hashes.append(hash(node.content))
+            self._fingerprints = (tag_hashes, attr_hashes, text_hashes)
+        return self._fingerprints
 
     def find_node_by_post_id(self, id: int) -> Node:
         if (id < 0 or id > len(self.nodes)):
@@ -83,12 +126,13 @@ class Tree:
     def find_node_by_cpid(self, cpid: NodeID) -> Node:
         current: Node = None
         current_children: List[Node] = [self.root]
-        for i, child_index in enumerate(cpid._root_path):
+        path: Tuple[int, ...] = cpid._root_path
+        for i, child_index in enumerate(path):
             current = current_children[child_index]
             if isinstance(current, Element):
                 current_children = current.children
             else: # Text
-                if i != len(cpid._root_path)-1:
+                if i != len(path)-1:
                     raise ValueError('Invalid child_path_id (%s) for tree %s', cpid, self.name)
         return current
 
@@ -96,17 +140,17 @@ class Tree:
         """Finds LR_keyroot ids in this tree.
         If a node is in LR_keyroots then either that node is root or it has a left sibling.
         Returns a list of ids sorted in increasing order.
+        Among all nodes sharing a leftmost leaf, the keyroot is the one with
+        the highest post id; scanning right to left, it is the first one seen.
         """
-        #l_id_dict: mapping leftmost_leaf post_id (l()) to the maximum post_id (among nodes with the same leftmost leaf)
-        l_id_dict: Dict[int, int] = {}
-        # iterating list of leftmost leaves (except index 0 which is None) in reversed order
-        for i in reversed(range(1, len(self)+1)):
-            found_id = l_id_dict.get(self.leftmost_leaves[i].post_id, -1)
-            if found_id == -1:
-                l_id_dict[self.leftmost_leaves[i].post_id] = i
-
-        keys = list(l_id_dict.values())
-        keys.sort() #sort returns None, therefore cannot use list def and sort in one line
+        seen: bytearray = bytearray(len(self) + 1)
+        keys: List[int] = []
+        for i in range(len(self), 0, -1):
+            leaf: int = self.leftmost_leaves[i]
+            if not seen[leaf]:
+                seen[leaf] = 1
+                keys.append(i)
+        keys.reverse()
         return keys
 
     def get_intersection_paths(self, first_paths: List[Path], second_paths: List[Path]) -> int:
@@ -166,19 +210,22 @@ class Tree:
         return self.root.num_of_nodes()
 
     def __str__(self):
-        """Prints the structure of tree recursively."""
-        return self.print_tree_recursive(self.root, 0)
+        """Prints the structure of tree."""
+        return self.print_tree(self.root)
 
     def print_html_in_file(self, out_file_name):
         with open(out_file_name, 'w') as out_file:
             self.root.print_html(out_file)
 
-    def print_tree_recursive(self, current_node, level):
-        result = f'{"  |"*(level)}--{str(current_node)}\n'
-        if isinstance(current_node, Element):
-            for child in current_node.children:
-                result += self.print_tree_recursive(child, level+1)
-        return result
+    def print_tree(self, current_node, level = 0):
+        lines: List[str] = []
+        for node, leaving in walk(current_node):
+            if leaving:
+                level -= 1
+            else:
+                lines.append(f'{"  |"*(level)}--{str(node)}\n')
+                level += 1
+        return ''.join(lines)
 
     def merge_path_w_tree(self, current_path: Path):
         """This works based on the assumption that given path starts from root,
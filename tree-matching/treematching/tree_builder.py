@@ -0,0 +1,393 @@
+# MIT License
+
+# Copyright (c) 2019 Shaghayegh Mardani
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import html5lib
+from html5lib.constants import namespaces, prefixes
+from html5lib.treebuilders import base as treebuilder_base
+import re, sys
+from typing import List, Dict, Union
+
+from node import Node, Element, Text, EMPTY_ATTRS, EMPTY_CHILDREN
+
+# Same as BeautifulSoup 4.6 (html5lib builder): values of these attributes are
+# split on whitespace into a list of strings, e.g. class="foo bar" ->
+# ['foo', 'bar'].  Like bs4, leading/trailing whitespace yields '' entries.
+_LIST_ATTRIBUTES: Dict[str, frozenset] = {
+    '*': frozenset(['class', 'accesskey', 'dropzone']),
+    'a': frozenset(['rel', 'rev']),
+    'link': frozenset(['rel', 'rev']),
+    'td': frozenset(['headers']),
+    'th': frozenset(['headers']),
+    'form': frozenset(['accept-charset']),
+    'object': frozenset(['archive']),
+    'area': frozenset(['rel']),
+    'icon': frozenset(['sizes']),
+    'iframe': frozenset(['sandbox']),
+    'output': frozenset(['for']),
+}
+_WHITESPACE = re.compile(r'\s+')
+
+# Parser backends understood by parse_html(). html5lib is the reference
+# (pure Python, spec compliant); the others are C parsers producing lxml trees.
+PARSER_BACKENDS = ('html5lib', 'lxml', 'html5-parser')
+
+# Tags printed as <tag/> by BeautifulSoup when they have no children.
+_EMPTY_ELEMENT_TAGS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen',
+    'link', 'menuitem', 'meta', 'param', 'source', 'track', 'wbr',
+    'basefont', 'bgsound', 'command', 'frame', 'image', 'isindex', 'nextid',
+    'spacer'])
+# Text content of these tags is printed without escaping.
+_CDATA_CONTAINING_TAGS = frozenset(['script', 'style'])
+
+# Placeholder for a (stripped) comment among the children of an element.
+# It is only kept until the end of parsing, so that text nodes on both sides
+# of a comment are not joined together.
+_COMMENT = object()
+
+
+def _is_list_attribute(tag_name: str, attr_name: str) -> bool:
+    return attr_name in _LIST_ATTRIBUTES['*'] or \
+        attr_name in _LIST_ATTRIBUTES.get(tag_name, ())
+
+
+def _index_of(children: List, child) -> int:
+    for i, current in enumerate(children):
+        if current is child:
+            return i
+    raise ValueError('Given node is not a child of this node.')
+
+
+def _detach(element: Element) -> None:
+    if element.parent is not None:
+        siblings: List[Node] = element.parent.children
+        del siblings[_index_of(siblings, element)]
+        element.parent = None
+
+
+class _AttrList:
+    """html5lib view of the attributes of an Element.
+    Like BeautifulSoup's AttrList, newly set values of multi-valued attributes
+    are split into lists, and two instances never compare equal.
+    """
+    def __init__(self, element: Element):
+        self.element: Element = element
+
+    def __iter__(self):
+        return iter(list(self.element.attrs.items()))
+
+    def __setitem__(self, name: str, value: Union[List[str], str]) -> None:
+        if isinstance(value, str) and \
+           _is_list_attribute(self.element.name, name):
+            value = _WHITESPACE.split(value)
+        self.element.attrs[sys.intern(name)] = value
+
+    def __getitem__(self, name: str) -> Union[List[str], str]:
+        return self.element.attrs[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.element.attrs
+
+    def __len__(self) -> int:
+        return len(self.element.attrs)
+
+    def items(self):
+        return list(self.element.attrs.items())
+
+    def keys(self):
+        return list(self.element.attrs.keys())
+
+
+class _ElementAdapter(treebuilder_base.Node):
+    """Wraps an Element, so that html5lib can build our tree directly.
+    Children are kept in element.children, and element.parent always refers
+    to the actual parent while parsing. self.parent is html5lib's own
+    bookkeeping, which (as in BeautifulSoup) is not reset on removal.
+    """
+    def __init__(self, name: str, namespace: str):
+        treebuilder_base.Node.__init__(self, name)
+        self.namespace: str = namespace
+        self.element: Element = Element(name, 0, None, {}, [])
+
+    def getNameTuple(self):
+        if self.namespace is None:
+            return namespaces['html'], self.name
+        return self.namespace, self.name
+
+    nameTuple = property(getNameTuple)
+
+    def getAttributes(self) -> _AttrList:
+        return _AttrList(self.element)
+
+    def setAttributes(self, attributes: Dict) -> None:
+        if attributes is None or len(attributes) == 0:
+            return
+        # Namespaced attribute names come as (prefix, name, namespace) tuples.
+        for name, value in list(attributes.items()):
+            if isinstance(name, tuple):
+                prefix, local_name = name[0], name[1]
+                if local_name is None:
+                    new_name = prefix
+                elif not prefix:
+                    new_name = local_name
+                else:
+                    new_name = prefix + ':' + local_name
+                del attributes[name]
+                attributes[new_name] = value
+        attrs = self.element.attrs
+        for name, value in attributes.items():
+            if isinstance(value, str) and _is_list_attribute(self.name, name):
+                value = _WHITESPACE.split(value)
+            attrs[sys.intern(name)] = value
+
+    attributes = property(getAttributes, setAttributes)
+
+    def appendChild(self, node: '_ElementAdapter') -> None:
+        if node is _COMMENT:
+            self.element.children.append(_COMMENT)
+            return
+        node.parent = self
+        _detach(node.element)
+        node.element.parent = self.element
+        self.element.children.append(node.element)
+
+    def insertText(self, data: str, insertBefore: '_ElementAdapter' = None) -> None:
+        children: List = self.element.children
+        if insertBefore is None:
+            if children and type(children[-1]) is Text:
+                children[-1].content += data
+            else:
+                children.append(Text(0, self.element, data))
+        else:
+            index: int = _index_of(children, insertBefore.element)
+            # Note: as in BeautifulSoup, index-1 is the last child if index=0.
+            if children and type(children[index-1]) is Text:
+                children[index-1].content += data
+            else:
+                children.insert(index, Text(0, self.element, data))
+
+    def insertBefore(self, node: '_ElementAdapter', refNode: '_ElementAdapter') -> None:
+        _detach(node.element)
+        children: List = self.element.children
+        children.insert(_index_of(children, refNode.element), node.element)
+        node.element.parent = self.element
+        node.parent = self
+
+    def removeChild(self, node: '_ElementAdapter') -> None:
+        _detach(node.element)
+
+    def reparentChildren(self, newParent: '_ElementAdapter') -> None:
+        moved: List = self.element.children
+        for child in moved:
+            if isinstance(child, Element):
+                child.parent = newParent.element
+        newParent.element.children.extend(moved)
+        self.element.children = []
+
+    def hasContent(self) -> bool:
+        return len(self.element.children) > 0
+
+    def cloneNode(self) -> '_ElementAdapter':
+        clone = _ElementAdapter(self.name, self.namespace)
+        clone.element.attrs = dict(self.element.attrs)
+        return clone
+
+
+class TreeBuilder(treebuilder_base.TreeBuilder):
+    """html5lib tree builder which creates Element/Text nodes directly,
+    while applying what HTMLStrip does on a soup tree: the doctype and
+    comments are dropped as soon as they are parsed, <meta> tags and
+    whitespace-only texts when the document is complete.
+    The result is the same as Node.from_soup_tag() on a prepared and
+    stripped soup (HTMLStrip.from_file), without building the soup.
+    """
+    documentClass = lambda self: _ElementAdapter('[document]', None)
+    elementClass = _ElementAdapter
+    commentClass = lambda self, data: _COMMENT
+
+    def insertDoctype(self, token: Dict) -> None:
+        pass
+
+    def getDocument(self) -> Element:
+        for child in self.document.element.children:
+            if isinstance(child, Element):
+                root: Element = child
+                break
+        else:
+            raise ValueError('Could not find the top-most <html> node.')
+        root.update_parent(None, 0)
+        _strip_subtree(root)
+        return root
+
+    def getFragment(self):
+        raise NotImplementedError
+
+
+def _strip_children(node: Element) -> List[Element]:
+    """Removes comments, <meta>s and whitespace-only texts from the children of
+    the given node, and sets the parent and index of the remaining ones.
+    Returns the remaining child elements.
+    """
+    kept: List[Node] = []
+    elements: List[Element] = []
+    for child in node.children:
+        if child is _COMMENT:
+            continue
+        if isinstance(child, Text):
+            if child.content.isspace():
+                continue
+        elif child.name == 'meta':
+            continue
+        else:
+            elements.append(child)
+        child.update_parent(node, len(kept))
+        kept.append(child)
+    node.children = kept or EMPTY_CHILDREN
+    node.mark_children_changed()
+    return elements
+
+
+def _strip_subtree(root: Element) -> None:
+    stack: List[Element] = [root]
+    while stack:
+        node: Element = stack.pop()
+        if not node.attrs:
+            node.attrs = EMPTY_ATTRS
+        elements: List[Element] = _strip_children(node)
+        if node.name == 'noscript':
+            # <noscript> only has one Text child with the (stripped)
+            # markup of its original children.
+            inner: List[Element] = elements
+            while inner:
+                inner.extend(_strip_children(inner.pop()))
+            if len(node.children) > 0:
+                content_str: str = ''.join(_soup_markup(child, top_level = True)
+                                           for child in node.children)
+                node.children = [Text(0, node, content_str)]
+                node.mark_children_changed()
+        else:
+            stack.extend(elements)
+
+
+def _escape(text: str) -> str:
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _quoted_attribute_value(value: str) -> str:
+    quote_with: str = '"'
+    if '"' in value:
+        if "'" in value:
+            value = value.replace('"', '&quot;')
+        else:
+            quote_with = "'"
+    return quote_with + value + quote_with
+
+
+def _soup_markup(node: Node, top_level: bool = False) -> str:
+    """Returns the same markup as str() of the equivalent soup element
+    (minimal formatter), which is what <noscript> contents used to be."""
+    if isinstance(node, Text):
+        return node.content if top_level else _escape(node.content)
+    pieces: List[str] = []
+    # stack of nodes to open, or closing tags (str) to write
+    stack: List[Union[Node, str]] = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, str):
+            pieces.append(current)
+        elif isinstance(current, Text):
+            if current.parent.name in _CDATA_CONTAINING_TAGS:
+                pieces.append(current.content)
+            else:
+                pieces.append(_escape(current.content))
+        else:
+            attrs: List[str] = []
+            for key, value in sorted(current.attrs.items()):
+                if not isinstance(value, str):
+                    value = ' '.join(value)
+                attrs.append(key + '=' + _quoted_attribute_value(_escape(value)))
+            attrs_str: str = ' ' + ' '.join(attrs) if attrs else ''
+            if len(current.children) == 0 and \
+               current.name in _EMPTY_ELEMENT_TAGS:
+                pieces.append(f'<{current.name}{attrs_str}/>')
+            else:
+                pieces.append(f'<{current.name}{attrs_str}>')
+                stack.append(f'</{current.name}>')
+                stack.extend(reversed(current.children))
+    return ''.join(pieces)
+
+
+def _lxml_attribute_name(name: str) -> str:
+    # '{namespace}local' -> 'prefix:local', as html5lib names them.
+    if name[0] != '{':
+        return name
+    namespace, local_name = name[1:].split('}', 1)
+    prefix: str = prefixes.get(namespace)
+    if prefix is None or prefix == local_name:
+        return local_name
+    return prefix + ':' + local_name
+
+
+def _from_lxml(lxml_root) -> Element:
+    """Converts an lxml (HTML) tree into Element/Text nodes, and strips it the
+    same way as the html5lib TreeBuilder does."""
+    root = Element(lxml_root.tag, 0, None, {}, [])
+    stack: List = [(lxml_root, root)]
+    while stack:
+        lxml_node, node = stack.pop()
+        for name, value in lxml_node.attrib.items():
+            name = sys.intern(_lxml_attribute_name(name))
+            if _is_list_attribute(node.name, name):
+                value = _WHITESPACE.split(value)
+            node.attrs[name] = value
+        children: List = node.children
+        if lxml_node.text:
+            children.append(Text(0, node, lxml_node.text))
+        for lxml_child in lxml_node:
+            # comments, processing instructions and entities have no str tag
+            if isinstance(lxml_child.tag, str):
+                child = Element(lxml_child.tag, 0, node, {}, [])
+                children.append(child)
+                stack.append((lxml_child, child))
+            else:
+                children.append(_COMMENT)
+            if lxml_child.tail:
+                children.append(Text(0, node, lxml_child.tail))
+    _strip_subtree(root)
+    return root
+
+
+def parse_html(html_file, parser: str = 'html5lib') -> Element:
+    """Parses the given (open) HTML file with the given parser backend (one of
+    PARSER_BACKENDS) and returns the root <html> node.
+    lxml and html5-parser are optional dependencies, imported on first use."""
+    html_file.seek(0)
+    markup: str = html_file.read()
+    if parser == 'html5lib':
+        return html5lib.HTMLParser(tree = TreeBuilder).parse(markup)
+    elif parser == 'lxml':
+        import lxml.html
+        return _from_lxml(lxml.html.document_fromstring(markup))
+    elif parser == 'html5-parser':
+        import html5_parser
+        return _from_lxml(html5_parser.parse(markup, keep_doctype = False))
+    raise ValueError(f'Unknown parser backend: {parser}')
@@ -0,0 +1,87 @@
+# MIT License
+
+# Copyright (c) 2019 Shaghayegh Mardani
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from array import array
+from typing import Iterable, Iterator, Tuple
+
+class TreeMappings:
+    """Mappings between the nodes of two trees, as pairs of post ids where
+    0 stands for a deleted (second is 0) or an inserted (first is 0) node.
+    Stored as two parallel integer arrays; iterating yields the pairs.
+    """
+    __slots__ = ('first_ids', 'second_ids', 'distance')
+
+    def __init__(self):
+        self.first_ids: array = array('i')
+        self.second_ids: array = array('i')
+        # reported by the matcher, if any
+        self.distance: float = None
+
+    def append(self, first_id: int, second_id: int) -> None:
+        self.first_ids.append(first_id)
+        self.second_ids.append(second_id)
+
+    def reverse(self) -> None:
+        self.first_ids.reverse()
+        self.second_ids.reverse()
+
+    def __len__(self) -> int:
+        return len(self.first_ids)
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        return zip(self.first_ids, self.second_ids)
+
+    @classmethod
+    def parse(cls, lines: Iterable[bytes], first_size: int, second_size: int) -> 'TreeMappings':
+        """Parses the output of html-apted line by line: the distance, then
+        one "first_id->second_id" line per mapping. Raises a ValueError unless
+        every node of both trees (of the given sizes) is mapped exactly once."""
+        mappings = cls()
+        first_seen: bytearray = bytearray(first_size + 1)
+        second_seen: bytearray = bytearray(second_size + 1)
+        lines = iter(lines)
+        first_line: bytes = next(lines, b'')
+        try:
+            mappings.distance = float(first_line)
+        except ValueError:
+            raise ValueError(f'Unexpected first line of html-apted output: {first_line[:200]!r}')
+        for number, line in enumerate(lines, 2):
+            if not line.strip():
+                continue
+            first_id, arrow, second_id = line.partition(b'->')
+            try:
+                first_id, second_id = int(first_id), int(second_id)
+            except ValueError:
+                first_id = second_id = -1
+            if not arrow or not 0 <= first_id <= first_size or not 0 <= second_id <= second_size \
+               or first_id == second_id == 0:
+                raise ValueError(f'Invalid mapping at line {number}: {line[:200]!r}')
+            if first_seen[first_id] or second_seen[second_id]:
+                raise ValueError(f'Node mapped twice at line {number}: {line[:200]!r}')
+            # index 0 (insert/delete) may repeat
+            first_seen[first_id] = first_id != 0
+            second_seen[second_id] = second_id != 0
+            mappings.append(first_id, second_id)
+        if first_seen.count(1) != first_size or second_seen.count(1) != second_size:
+            raise ValueError('Some of the nodes are not mapped: '
+                             f'{first_size - first_seen.count(1)} of the first tree, '
+                             f'{second_size - second_seen.count(1)} of the second tree')
+        return mappings